@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2023, CloudBlue LLC
+# All rights reserved.
+#
+"""
+Micro-benchmark of the currency conversion of a column of values:
+
+    python benchmarks/currency_conversion.py [number of values]
+
+It compares the previous per-value conversion (building the quantizer on
+every call), the row by row transformation and the batch API. Each one is
+timed as the best of five runs.
+"""
+import json
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+from connect_transformations.currency_conversion.utils import convert_currency_values
+from connect_transformations.transformations import StandardTransformationsApplication
+
+
+def build_app(rates_file):
+    app = StandardTransformationsApplication(
+        MagicMock(),
+        MagicMock(),
+        {'EXCHANGE_RATES_FILE': rates_file},
+    )
+    app.transformation_request = {
+        'transformation': {
+            'settings': [{
+                'from': {'column': 'C1', 'currency': 'USD'},
+                'to': {'column': 'EUR', 'currency': 'EUR'},
+            }],
+            'columns': {
+                'input': [{'id': 'C1', 'name': 'Price', 'nullable': False}],
+            },
+        },
+    }
+    return app
+
+
+def measure(name, fn, count, repeat=5):
+    elapsed = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        run = time.perf_counter() - start
+        elapsed = run if elapsed is None else min(elapsed, run)
+    print(f'{name:<30} {elapsed:8.3f}s {count / elapsed:14,.0f} values/s')
+    return elapsed
+
+
+def main(count):
+    values = [f'{index % 10000}.{index % 97:02d}' for index in range(count)]
+    rate = Decimal(0.92343)
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json') as rates_file:
+        json.dump({'base': 'USD', 'rates': {'EUR': 0.92343}}, rates_file)
+        rates_file.flush()
+        app = build_app(rates_file.name)
+
+        # The column conversions run first, before the row by row ones fill
+        # the heap with response objects.
+        baseline = measure(
+            'per value (previous)',
+            lambda: [(Decimal(value) * rate).quantize(Decimal('.00001')) for value in values],
+            count,
+        )
+        batch = measure(
+            'convert_currency_values',
+            lambda: convert_currency_values(values, rate),
+            count,
+        )
+        measure(
+            'currency_conversion per row',
+            lambda: [app.currency_conversion({'Price': value}) for value in values],
+            count,
+        )
+        measure(
+            'currency_conversion_rows',
+            lambda: app.currency_conversion_rows([{'Price': value} for value in values]),
+            count,
+        )
+    print(f'Batch API speedup over the previous per value conversion: {baseline / batch:.2f}x')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
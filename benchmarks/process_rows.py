@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2023, CloudBlue LLC
+# All rights reserved.
+#
+"""
+Micro-benchmark of the row by row and batch modes of `process_rows`:
+
+    python benchmarks/process_rows.py [number of rows] [chunk size]
+
+Each mode is timed as the best of five alternated runs.
+"""
+import asyncio
+import sys
+import time
+from unittest.mock import MagicMock
+
+from connect_transformations.transformations import StandardTransformationsApplication
+
+
+TRANSFORMATIONS = {
+    'copy_columns': (
+        {
+            'settings': [
+                {'from': 'Name', 'to': 'Customer'},
+                {'from': 'Email', 'to': 'Contact'},
+            ],
+            'columns': {'input': [], 'output': []},
+        },
+        lambda index: {'Name': f'Customer {index}', 'Email': f'user{index}@example.com'},
+    ),
+    'split_column': (
+        {
+            'settings': {
+                'from': 'Name',
+                'regex': {
+                    'pattern': '(?P<first_name>\\w+) (?P<last_name>\\w+)',
+                    'groups': {
+                        '1': {'name': 'First Name', 'type': 'string'},
+                        '2': {'name': 'Last Name', 'type': 'string'},
+                    },
+                },
+            },
+            'columns': {
+                'input': [{'name': 'Name', 'nullable': False}],
+                'output': [
+                    {'name': 'First Name', 'type': 'string'},
+                    {'name': 'Last Name', 'type': 'string'},
+                ],
+            },
+        },
+        lambda index: {'Name': f'Customer {index}'},
+    ),
+}
+
+
+def build_app(transformation):
+    app = StandardTransformationsApplication(MagicMock(), MagicMock(), MagicMock())
+    app.transformation_request = {'transformation': transformation}
+    return app
+
+
+async def measure(method_name, rows, chunk_size, batch):
+    app = build_app(TRANSFORMATIONS[method_name][0])
+    start = time.perf_counter()
+    for offset in range(0, len(rows), chunk_size):
+        await app.process_rows(method_name, rows[offset:offset + chunk_size], batch=batch)
+    return len(rows) / (time.perf_counter() - start)
+
+
+async def main(count, chunk_size, repeat=5):
+    for method_name, (_, build_row) in TRANSFORMATIONS.items():
+        rows = [build_row(index) for index in range(count)]
+        per_row = batch = 0
+        # Alternate the modes and keep the best run of each to reduce noise.
+        for _ in range(repeat):
+            per_row = max(per_row, await measure(method_name, rows, chunk_size, batch=False))
+            batch = max(batch, await measure(method_name, rows, chunk_size, batch=True))
+        print(
+            f'{method_name:<15} row by row {per_row:12,.0f} rows/s   '
+            f'batch {batch:12,.0f} rows/s   ({batch / per_row:.2f}x)',
+        )
+
+
+if __name__ == '__main__':
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000,
+    ))
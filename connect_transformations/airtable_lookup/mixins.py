@@ -3,10 +3,10 @@
 # Copyright (c) 2023, CloudBlue LLC
 # All rights reserved.
 #
-import time
+import asyncio
+import threading
 from typing import Dict, List
 
-import requests
 from connect.eaas.core.decorators import router, transformation
 from connect.eaas.core.responses import RowTransformationResponse
 from fastapi.responses import JSONResponse
@@ -19,55 +19,51 @@ from connect_transformations.airtable_lookup.models import (
     Configuration,
 )
 from connect_transformations.airtable_lookup.utils import (
+    AIRTABLE_SNAPSHOTS_NAMESPACE,
+    DEFAULT_AIRTABLE_SNAPSHOT_TTL,
+    AirTableIndex,
     get_airtable_data,
+    get_airtable_snapshot_key,
+    load_airtable_index,
     validate_airtable_lookup,
 )
 from connect_transformations.models import Error, ValidationResult
-from connect_transformations.utils import is_input_column_nullable
+from connect_transformations.storage import get_persistent_store
+from connect_transformations.utils import get_numeric_config
 
 
 class AirTableLookupTransformationMixin:
 
-    def preload_lookup_data_for_airtable(self, trfn_settings):  # noqa: CCR001
-        with self.lock():
+    def preload_lookup_data_for_airtable(self, trfn_settings):
+        """
+        Fill `self.airtable_data` from the local snapshot of the table if it is
+        younger than AIRTABLE_SNAPSHOT_TTL, otherwise start streaming the table
+        in a background thread. Lookups can be answered as soon as the page
+        containing their key has been indexed.
+        """
+        if hasattr(self, 'airtable_data'):
+            return
+        with self.lock('airtable_lookup'):
             if hasattr(self, 'airtable_data'):
                 return
-
-            self.airtable_data = {}
-
-            page_count = 0
-            params = {}
-            mapped_columns = [mapping['from'] for mapping in trfn_settings['mapping']]
-            lookup_column = trfn_settings['map_by']['airtable_column']
-            while True:
-                response = requests.get(
-                    'https://api.airtable.com/v0/'
-                    f'{trfn_settings["base_id"]}/{trfn_settings["table_id"]}',
-                    headers={
-                        'Authorization': f'Bearer {trfn_settings["api_key"]}',
-                    },
-                    params=params,
-                )
-                response.raise_for_status()
-                data = response.json()
-
-                for record in data.get('records', []):
-                    lookup_value = None
-                    looked_up_data = {}
-                    for field_name, field_value in record['fields'].items():
-                        if field_name == lookup_column:
-                            lookup_value = field_value
-                            continue
-                        if field_name in mapped_columns:
-                            looked_up_data[field_name] = field_value
-                    self.airtable_data[lookup_value] = looked_up_data
-
-                if 'offset' not in data:
-                    break
-                params['offset'] = data['offset']
-                if page_count % 5 == 0:
-                    time.sleep(1)
-                page_count += 1
+            index = AirTableIndex()
+            store = get_persistent_store(self.config, self.logger)
+            snapshot = store.get(
+                AIRTABLE_SNAPSHOTS_NAMESPACE,
+                get_airtable_snapshot_key(trfn_settings),
+                max_age=get_numeric_config(
+                    self.config, 'AIRTABLE_SNAPSHOT_TTL', DEFAULT_AIRTABLE_SNAPSHOT_TTL,
+                ),
+            )
+            if snapshot is not None:
+                index.load_snapshot(snapshot)
+            else:
+                threading.Thread(
+                    target=asyncio.run,
+                    args=(load_airtable_index(index, trfn_settings, store),),
+                    daemon=True,
+                ).start()
+            self.airtable_data = index
 
     @transformation(
         name='Lookup data from AirTable',
@@ -81,23 +77,19 @@ class AirTableLookupTransformationMixin:
             self,
             row: Dict,
     ):
-        trfn_settings = self.transformation_request['transformation']['settings']
+        trfn_settings = self.plan.settings
 
-        try:
-            self.preload_lookup_data_for_airtable(trfn_settings)
-        except Exception as e:
-            return RowTransformationResponse.fail(output=str(e))
+        self.preload_lookup_data_for_airtable(trfn_settings)
 
         map_by = trfn_settings['map_by']
-        input_column = self.transformation_request['transformation']['columns']['input']
 
-        if is_input_column_nullable(
-            input_column,
-            map_by['input_column'],
-        ) and not row[map_by['input_column']]:
+        if self.plan.is_nullable(map_by['input_column']) and not row[map_by['input_column']]:
             return RowTransformationResponse.skip()
 
-        record = self.airtable_data.get(row[map_by['input_column']])
+        try:
+            record = self.airtable_data.get(row[map_by['input_column']])
+        except Exception as e:
+            return RowTransformationResponse.fail(output=str(e))
         if not record:
             return RowTransformationResponse.skip()
 
@@ -3,6 +3,11 @@
 # Copyright (c) 2023, CloudBlue LLC
 # All rights reserved.
 #
+import asyncio
+import hashlib
+import threading
+import time
+
 import httpx
 
 from connect_transformations.airtable_lookup.exceptions import AirTableError
@@ -14,11 +19,168 @@ from connect_transformations.utils import (
 )
 
 
+AIRTABLE_API_URL = 'https://api.airtable.com/v0/'
+AIRTABLE_REQUESTS_PER_SECOND = 5
+AIRTABLE_PAGE_SIZE = 100
+AIRTABLE_SNAPSHOTS_NAMESPACE = 'airtable_snapshots'
+DEFAULT_AIRTABLE_SNAPSHOT_TTL = 3600
+
+
+class TokenBucket:
+    """
+    Asynchronous token bucket limiting the calls to `rate` per second, with
+    bursts of up to `capacity` calls.
+    """
+
+    def __init__(self, rate, capacity=None, timer=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.timer = timer
+        self.updated_at = timer()
+
+    async def acquire(self):
+        while True:
+            now = self.timer()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AirTableIndex:
+    """
+    Index of the AirTable records by the value of the lookup field, filled
+    page by page while the table is being downloaded. Lookups of values that
+    are already indexed are answered immediately; the others wait until the
+    value shows up or the last page has been loaded.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.loaded = False
+        self.error = None
+        self._condition = threading.Condition()
+
+    def add_records(self, records, lookup_column, mapped_columns):
+        page = {}
+        for record in records:
+            fields = record.get('fields', {})
+            page[fields.get(lookup_column)] = {
+                name: value for name, value in fields.items()
+                if name in mapped_columns
+            }
+        with self._condition:
+            self.data.update(page)
+            self._condition.notify_all()
+
+    def load_snapshot(self, items):
+        with self._condition:
+            self.data.update((key, record) for key, record in items)
+        self.finish()
+
+    def snapshot(self):
+        with self._condition:
+            return [[key, record] for key, record in self.data.items()]
+
+    def finish(self, error=None):
+        with self._condition:
+            self.loaded = True
+            self.error = error
+            self._condition.notify_all()
+
+    def get(self, key):
+        record = self.data.get(key)
+        if record is not None or self.loaded:
+            return self._result(record)
+        with self._condition:
+            self._condition.wait_for(lambda: self.loaded or key in self.data)
+            return self._result(self.data.get(key))
+
+    def _result(self, record):
+        if record is None and self.error:
+            raise self.error
+        return record
+
+
+async def iterate_airtable_pages(base_id, table_id, token, fields, limiter=None):
+    """
+    Yield the pages of records of the given table, requesting only the given
+    fields and at most AIRTABLE_REQUESTS_PER_SECOND pages per second.
+    """
+    limiter = limiter or TokenBucket(AIRTABLE_REQUESTS_PER_SECOND)
+    params = {'fields[]': list(fields), 'pageSize': AIRTABLE_PAGE_SIZE}
+    async with httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(retries=3)) as client:
+        while True:
+            await limiter.acquire()
+            response = await client.get(
+                f'{AIRTABLE_API_URL}{base_id}/{table_id}',
+                headers={'Authorization': f'Bearer {token}'},
+                params=params,
+            )
+            response.raise_for_status()
+            data = response.json()
+            yield data.get('records', [])
+
+            if 'offset' not in data:
+                break
+            params['offset'] = data['offset']
+
+
+def get_airtable_fields(trfn_settings):
+    lookup_column = trfn_settings['map_by']['airtable_column']
+    mapped_columns = {mapping['from'] for mapping in trfn_settings['mapping']}
+    return lookup_column, mapped_columns
+
+
+def get_airtable_snapshot_key(trfn_settings):
+    """
+    Return the key of the table snapshot. It includes a hash of the API key so
+    a snapshot is only served to the installations that can read the table.
+    """
+    lookup_column, mapped_columns = get_airtable_fields(trfn_settings)
+    fields = ','.join(sorted(mapped_columns))
+    api_key_hash = hashlib.sha256(str(trfn_settings['api_key']).encode()).hexdigest()
+    return (
+        f'{api_key_hash}:{trfn_settings["base_id"]}:{trfn_settings["table_id"]}:'
+        f'{lookup_column}:{fields}'
+    )
+
+
+async def load_airtable_index(index, trfn_settings, store=None):
+    """
+    Stream the table into the index and, once it is complete, save it
+    as a snapshot into the given persistent store.
+    """
+    lookup_column, mapped_columns = get_airtable_fields(trfn_settings)
+    try:
+        async for records in iterate_airtable_pages(
+            trfn_settings['base_id'],
+            trfn_settings['table_id'],
+            trfn_settings['api_key'],
+            [lookup_column, *sorted(mapped_columns - {lookup_column})],
+        ):
+            index.add_records(records, lookup_column, mapped_columns)
+    except Exception as e:
+        index.finish(error=e)
+        return
+
+    if store:
+        store.put(
+            AIRTABLE_SNAPSHOTS_NAMESPACE,
+            get_airtable_snapshot_key(trfn_settings),
+            index.snapshot(),
+        )
+    index.finish()
+
+
 async def get_airtable_data(api_url, token, params=None):
     async with httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(retries=3)) as client:
         try:
             response = await client.get(
-                f'https://api.airtable.com/v0/{api_url}',
+                f'{AIRTABLE_API_URL}{api_url}',
                 headers={'Authorization': f'Bearer {token}'},
                 params=params,
             )
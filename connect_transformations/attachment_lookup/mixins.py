@@ -3,7 +3,8 @@
 # Copyright (c) 2023, CloudBlue LLC
 # All rights reserved.
 #
-from tempfile import NamedTemporaryFile
+import csv
+import time
 from typing import Dict, List
 
 from connect.client import AsyncConnectClient, ClientError
@@ -11,73 +12,65 @@ from connect.eaas.core.decorators import router, transformation
 from connect.eaas.core.inject.asynchronous import get_installation_client
 from connect.eaas.core.responses import RowTransformationResponse
 from fastapi import Depends
-from openpyxl import load_workbook
 
 from connect_transformations.attachment_lookup.exceptions import AttachmentError
 from connect_transformations.attachment_lookup.models import Configuration, StreamAttachment
-from connect_transformations.attachment_lookup.utils import validate_attachment_lookup
+from connect_transformations.attachment_lookup.utils import (
+    get_attachment_path,
+    get_attachments_query,
+    load_lookup_table,
+    validate_attachment_lookup,
+)
 from connect_transformations.models import Error, ValidationResult
-from connect_transformations.utils import is_input_column_nullable
 
 
 class AttachmentLookupTransformationMixin:
 
     def preload_attachment_for_lookup(self):
-        with self.lock():
-            if hasattr(self, 'excel_attachments_data'):
-                return
-
-            self.excel_attachments_data = {}
-
-            settings = self.transformation_request['transformation']['settings']
-            map_by = [item['attachment_column'] for item in self.map_by_settings]
-            sheet = settings.get('sheet')
-            mapping = [col['from'] for col in settings['mapping']]
-
-            file_url = settings['file']
-            input_file = NamedTemporaryFile(suffix='.xlsx')
-            wb = None
-
-            try:
-                url = file_url.split('/public/v1/')[-1]
-                url = url[1:] if url[0] == '/' else url
-                content = self.installation_client.get(url)
-                input_file.write(content)
-
-                wb = load_workbook(input_file, read_only=True)
-                if not sheet:
-                    sheet = wb.sheetnames[0]
-                ws = wb[sheet]
-                lookup_columns = {}
-                for row in ws.rows:
-                    if not lookup_columns:
-                        lookup_columns = {
-                            cell.value: cell.column - 1
-                            for cell in row
-                            if cell.value in map_by or cell.value in mapping
-                        }
-                    else:
-                        key = ', '.join([str(row[lookup_columns[item]].value) for item in map_by])
-                        self.excel_attachments_data[key] = {
-                            col: row[lookup_columns[col]].value for col in mapping
-                        }
-            except ClientError as e:
-                raise AttachmentError(f'Error during downloading attachment: {e}')
-            except (KeyError, ValueError) as e:
-                raise AttachmentError(f'Invalid column: {e}')
-            except Exception as e:
-                raise e
-            finally:
-                if wb:  # pragma: no branch
-                    wb.close()
-                input_file.close()
+        """
+        Download and index the attachment once. A failure is kept and raised
+        again for the following rows instead of retrying the download.
+        """
+        if not hasattr(self, 'excel_attachments_data'):
+            with self.lock('attachment_lookup'):
+                if not hasattr(self, 'excel_attachments_data'):
+                    self.load_attachment_for_lookup()
+        if self.excel_attachments_error:
+            raise self.excel_attachments_error
+
+    def load_attachment_for_lookup(self):
+        settings = self.plan.settings
+        map_by = [item['attachment_column'] for item in self.plan.map_by]
+        mapping = [col['from'] for col in settings['mapping']]
+
+        start = time.monotonic()
+        data, error = None, None
+        try:
+            content = self.installation_client.get(get_attachment_path(settings['file']))
+            data = load_lookup_table(content, settings.get('sheet'), map_by, mapping)
+        except ClientError as e:
+            error = AttachmentError(f'Error during downloading attachment: {e}')
+        except (KeyError, ValueError) as e:
+            error = AttachmentError(f'Invalid column: {e}')
+        except csv.Error as e:
+            error = AttachmentError(f'Invalid CSV file: {e}')
+        except AttachmentError as e:
+            error = e
+
+        if data is not None:
+            self.logger.info(
+                f'Attachment {settings["file"]} loaded in {time.monotonic() - start:.2f}s: '
+                f'{len(data)} rows indexed.',
+            )
+        self.excel_attachments_error = error
+        self.excel_attachments_data = data
 
     @transformation(
         name='Lookup data from Excel file attached to stream',
         description=(
             'This transformation function allows you to populate data'
-            ' from the attached Excel file by matching input columns values'
-            ' with the attached table values.'
+            ' from the attached Excel, CSV or Parquet file by matching input'
+            ' columns values with the attached table values.'
         ),
         edit_dialog_ui='/static/transformations/attachment_lookup.html',
     )
@@ -89,15 +82,11 @@ class AttachmentLookupTransformationMixin:
             self.preload_attachment_for_lookup()
         except Exception as e:
             return RowTransformationResponse.fail(output=str(e))
-        trfn_settings = self.transformation_request['transformation']['settings']
-        map_by_from = [item['input_column'] for item in self.map_by_settings]
-        input_columns = self.transformation_request['transformation']['columns']['input']
+        trfn_settings = self.plan.settings
+        map_by_from = [item['input_column'] for item in self.plan.map_by]
 
         for item in map_by_from:
-            if is_input_column_nullable(
-                input_columns,
-                item,
-            ) and not row[item]:
+            if self.plan.is_nullable(item) and not row[item]:
                 return RowTransformationResponse.skip()
 
         key = ', '.join([str(row[item]) for item in map_by_from])
@@ -110,19 +99,12 @@ class AttachmentLookupTransformationMixin:
             for mapping in trfn_settings['mapping']
         })
 
-    @property
-    def map_by_settings(self):
-        map_settings = self.transformation_request['transformation']['settings']['map_by']
-        if not isinstance(map_settings, list):
-            return [map_settings]
-        return map_settings
-
 
 class AttachmentLookupWebAppMixin:
 
     @router.get(
         '/attachment_lookup/{stream_id}',
-        summary='Get a list of Excel files attached to the current stream.',
+        summary='Get a list of Excel, CSV and Parquet files attached to the current stream.',
         response_model=List[StreamAttachment],
         responses={
             400: {'model': Error},
@@ -133,11 +115,6 @@ class AttachmentLookupWebAppMixin:
         stream_id: str,
         client: AsyncConnectClient = Depends(get_installation_client),
     ):
-        query = (
-            "((ilike(mime_type,*vnd.openxmlformats-officedocument.spreadsheetml.sheet*)"
-            "|ilike(mime_type,*vnd.ms-excel*));"
-            "ilike(mime_type,*application*))"
-        )
         files = client('media')('folders').collection('streams_attachments')[stream_id].files
         return [
             StreamAttachment(
@@ -145,7 +122,7 @@ class AttachmentLookupWebAppMixin:
                 name=file['name'],
                 file=f'/public/v1/media/folders/streams_attachments/{stream_id}/files/{file["id"]}',
             )
-            async for file in files.filter(query)
+            async for file in files.filter(get_attachments_query())
         ]
 
     @router.post(
@@ -3,6 +3,13 @@
 # Copyright (c) 2023, CloudBlue LLC
 # All rights reserved.
 #
+import csv
+from io import BytesIO, TextIOWrapper
+from itertools import chain, islice
+
+from openpyxl import load_workbook
+
+from connect_transformations.attachment_lookup.exceptions import AttachmentError
 from connect_transformations.utils import (
     build_error_response,
     check_mapping,
@@ -11,6 +18,18 @@ from connect_transformations.utils import (
 )
 
 
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pq = None
+
+
+ROWS_CHUNK_SIZE = 10000
+PARQUET_MAGIC = b'PAR1'
+ZIP_MAGIC = b'PK'
+OLE2_MAGIC = b'\xd0\xcf\x11\xe0'
+
+
 def validate_attachment_lookup(data):
     data = data.dict(by_alias=True)
 
@@ -55,3 +74,195 @@ def validate_attachment_lookup(data):
     return {
         'overview': overview,
     }
+
+
+def get_attachment_path(file_url):
+    url = file_url.split('/public/v1/')[-1]
+    return url[1:] if url[0] == '/' else url
+
+
+def get_column_positions(header, key_columns, value_columns):
+    """
+    Return the positions in the header of the key and value columns.
+    Raise KeyError with the name of the first column not found.
+    """
+    positions = {name: position for position, name in enumerate(header)}
+    return (
+        [positions[name] for name in key_columns],
+        [positions[name] for name in value_columns],
+    )
+
+
+class LookupTable:
+    """
+    Columnar index of an attachment: a dictionary from the key of every row to
+    its position and a list of values per mapped column, instead of a
+    dictionary per row. Rows with a repeated key replace the previous ones.
+    """
+
+    def __init__(self, value_columns):
+        self.value_columns = value_columns
+        self.columns = [[] for _ in value_columns]
+        self.positions = {}
+        self.size = 0
+
+    def extend(self, keys, columns):
+        positions = self.positions
+        for position, key in enumerate(keys, start=self.size):
+            positions[key] = position
+        for column, values in zip(self.columns, columns):
+            column.extend(values)
+        self.size += len(keys)
+
+    def get(self, key):
+        position = self.positions.get(key)
+        if position is None:
+            return None
+        return {
+            name: column[position]
+            for name, column in zip(self.value_columns, self.columns)
+        }
+
+    def __len__(self):
+        return len(self.positions)
+
+
+def build_keys(key_columns):
+    return [', '.join([str(value) for value in values]) for values in zip(*key_columns)]
+
+
+def index_rows(rows, key_positions, value_columns, value_positions, offset=0):
+    """
+    Index the rows by the string values of their key columns joined by commas,
+    keeping only the value columns. Positions are relative to the first
+    column read, `offset`. Rows are transposed in chunks to fill the columns.
+    """
+    table = LookupTable(value_columns)
+    key_positions = [position - offset for position in key_positions]
+    value_positions = [position - offset for position in value_positions]
+    while True:
+        chunk = list(islice(rows, ROWS_CHUNK_SIZE))
+        if not chunk:
+            return table
+        table.extend(
+            build_keys([[row[position] for row in chunk] for position in key_positions]),
+            [[row[position] for row in chunk] for position in value_positions],
+        )
+
+
+def load_excel_lookup_table(content, sheet, key_columns, value_columns):
+    """
+    Load the lookup table from the Excel file content reading, besides the
+    header, only the cells between the first and the last key or value column.
+    """
+    wb = load_workbook(BytesIO(content), read_only=True)
+    try:
+        ws = wb[sheet or wb.sheetnames[0]]
+        header = next(ws.iter_rows(max_row=1, values_only=True), None)
+        first_row = next(ws.iter_rows(min_row=2, max_row=2, values_only=True), None)
+        if header is None or first_row is None:
+            return LookupTable(value_columns)
+
+        key_positions, value_positions = get_column_positions(
+            header, key_columns, value_columns,
+        )
+        columns = key_positions + value_positions
+        first, last = min(columns), max(columns)
+        return index_rows(
+            ws.iter_rows(min_row=2, min_col=first + 1, max_col=last + 1, values_only=True),
+            key_positions,
+            value_columns,
+            value_positions,
+            offset=first,
+        )
+    finally:
+        wb.close()
+
+
+def load_csv_lookup_table(content, sheet, key_columns, value_columns):
+    """
+    Load the lookup table from the CSV file content, all values are strings.
+    """
+    rows = csv.reader(TextIOWrapper(BytesIO(content), encoding='utf-8-sig', newline=''))
+    header = next(rows, None)
+    first_row = next(rows, None)
+    if header is None or first_row is None:
+        return LookupTable(value_columns)
+
+    key_positions, value_positions = get_column_positions(header, key_columns, value_columns)
+    try:
+        return index_rows(
+            chain([first_row], rows), key_positions, value_columns, value_positions,
+        )
+    except IndexError:
+        raise AttachmentError('Invalid CSV file: some rows have fewer columns than the header.')
+
+
+def get_attachments_query():
+    """
+    Return the RQL filter of the attachments that can be used for the lookup.
+    Parquet files are only listed when `pyarrow` is installed.
+    """
+    query = (
+        "((ilike(mime_type,*vnd.openxmlformats-officedocument.spreadsheetml.sheet*)"
+        "|ilike(mime_type,*vnd.ms-excel*));"
+        "ilike(mime_type,*application*))"
+        "|ilike(mime_type,*text/csv*)"
+    )
+    if pq is not None:
+        query += "|ilike(mime_type,*parquet*)"
+    return f'({query})'
+
+
+def load_parquet_lookup_table(content, sheet, key_columns, value_columns):
+    """
+    Load the lookup table from the Parquet file content reading only the key
+    and value columns, one record batch at a time.
+    """
+    if pq is None:
+        raise AttachmentError('Parquet attachments require the `pyarrow` package.')
+
+    parquet_file = pq.ParquetFile(BytesIO(content))
+    get_column_positions(parquet_file.schema_arrow.names, key_columns, value_columns)
+    columns = list(dict.fromkeys(key_columns + value_columns))
+    table = LookupTable(value_columns)
+    for batch in parquet_file.iter_batches(batch_size=ROWS_CHUNK_SIZE, columns=columns):
+        data = batch.to_pydict()
+        table.extend(
+            build_keys([data[name] for name in key_columns]),
+            [data[name] for name in value_columns],
+        )
+    return table
+
+
+LOOKUP_TABLE_LOADERS = {
+    'xlsx': load_excel_lookup_table,
+    'csv': load_csv_lookup_table,
+    'parquet': load_parquet_lookup_table,
+}
+
+
+def get_attachment_format(content):
+    """
+    Return the format of the attachment from its first bytes: Excel files are
+    zip archives (OLE2 documents for the legacy .xls ones) and Parquet files
+    start with `PAR1`, anything else is CSV.
+    """
+    if content.startswith(PARQUET_MAGIC):
+        return 'parquet'
+    if content.startswith(ZIP_MAGIC):
+        return 'xlsx'
+    if content.startswith(OLE2_MAGIC):
+        return 'xls'
+    return 'csv'
+
+
+def load_lookup_table(content, sheet, key_columns, value_columns):
+    attachment_format = get_attachment_format(content)
+    if attachment_format == 'xls':
+        raise AttachmentError(
+            'Legacy Excel (.xls) attachments are not supported, '
+            'save the file as .xlsx or .csv.',
+        )
+    loader = LOOKUP_TABLE_LOADERS[attachment_format]
+    return loader(content, sheet, key_columns, value_columns)
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2023, CloudBlue LLC
+# All rights reserved.
+#
+import asyncio
+import math
+import sys
+import threading
+import time
+
+from cachetools import TLRUCache
+
+
+DEFAULT_CACHE_NAMESPACE = 'default'
+
+DEFAULT_CACHE_MAX_ENTRIES = 10000
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_CACHE_TTL = 3600
+DEFAULT_CACHE_NEGATIVE_TTL = 300
+DEFAULT_CACHE_STATS_INTERVAL = 10000
+
+DEFAULT_PROGRAM_CACHE_MAX_ENTRIES = 1024
+
+
+def approximate_size(value):
+    """
+    Return an approximation of the memory used by the given value, walking
+    into the containers returned by the Connect API (dicts, lists and tuples).
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += approximate_size(key) + approximate_size(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            size += approximate_size(item)
+    return size
+
+
+class NegativeCacheEntry:
+    """
+    Lookup that failed because nothing or too many results were found. Reading
+    it from the cache raises the original error again.
+    """
+
+    def __init__(self, error):
+        self.error = error
+
+
+class CacheNamespace(TLRUCache):
+    """
+    LRU cache bounded both by the number of entries and by their approximate
+    size in bytes, whose entries expire `ttl` seconds after being stored.
+    Negative results (failed lookups and empty results) expire after `negative_ttl`.
+    """
+
+    def __init__(self, max_entries, max_bytes, ttl, negative_ttl=None, timer=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+        super().__init__(max_bytes, self._get_expiration, timer=timer, getsizeof=approximate_size)
+
+    def _get_expiration(self, key, value, now):
+        if value is None or isinstance(value, NegativeCacheEntry):
+            ttl = self.negative_ttl
+        else:
+            ttl = self.ttl
+        return now + ttl if ttl else math.inf
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            while len(self) >= self.max_entries:
+                self.popitem()
+        super().__setitem__(key, value)
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+    def stats(self):
+        return {
+            'entries': len(self),
+            'bytes': self.currsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'coalesced': self.coalesced,
+        }
+
+
+class LookupCache:
+    """
+    Cache shared by the lookup transformations. Every transformation stores its
+    data into its own namespace so a lookup with many distinct keys cannot evict
+    the entries of the others.
+
+    Reads reorder the LRU entries, so both reads and writes hold the lock of
+    their namespace. It is a thread lock held only around the dictionary
+    operations, never across an await, so the cache can be shared by
+    synchronous transformations, coroutines and thread pool runners.
+    """
+
+    def __init__(
+        self,
+        max_entries=DEFAULT_CACHE_MAX_ENTRIES,
+        max_bytes=DEFAULT_CACHE_MAX_BYTES,
+        ttl=DEFAULT_CACHE_TTL,
+        negative_ttl=DEFAULT_CACHE_NEGATIVE_TTL,
+        logger=None,
+        stats_interval=DEFAULT_CACHE_STATS_INTERVAL,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.logger = logger
+        self.stats_interval = stats_interval
+        self._namespaces = {}
+        self._locks = {}
+        self._inflight = {}
+        self._sync_inflight = {}
+
+    def namespace(self, name):
+        try:
+            return self._namespaces[name]
+        except KeyError:
+            self._locks.setdefault(name, threading.RLock())
+            return self._namespaces.setdefault(
+                name,
+                CacheNamespace(self.max_entries, self.max_bytes, self.ttl, self.negative_ttl),
+            )
+
+    def get(self, key, namespace=DEFAULT_CACHE_NAMESPACE):
+        cache = self.namespace(namespace)
+        with self._locks[namespace]:
+            try:
+                value = cache[key]
+                cache.hits += 1
+            except KeyError:
+                cache.misses += 1
+                raise
+            finally:
+                if self.stats_interval and (cache.hits + cache.misses) % self.stats_interval == 0:
+                    self.log_stats(namespace)
+
+        if isinstance(value, NegativeCacheEntry):
+            raise value.error.with_traceback(None)
+        return value
+
+    def put(self, key, value, namespace=DEFAULT_CACHE_NAMESPACE):
+        cache = self.namespace(namespace)
+        with self._locks[namespace]:
+            try:
+                cache[key] = value
+            except ValueError:
+                # The value alone exceeds the namespace size limit, don't cache it.
+                pass
+
+    def get_or_compute(
+        self, key, fn, *args, namespace=DEFAULT_CACHE_NAMESPACE, negative_errors=(),
+    ):
+        """
+        Return the cached value of the key or store and return `fn(*args)`.
+        Threads asking for the same missing key wait for the single call in
+        progress. The `negative_errors` raised by `fn` are cached as well.
+        """
+        try:
+            return self.get(key, namespace)
+        except KeyError:
+            pass
+
+        inflight_key = (namespace, key)
+        with self._locks[namespace]:
+            lock = self._sync_inflight.setdefault(inflight_key, threading.Lock())
+        try:
+            with lock:
+                try:
+                    return self.get(key, namespace)
+                except KeyError:
+                    pass
+                # The result, even a negative one, is stored before releasing
+                # the lock so the threads waiting for it find it in the cache.
+                try:
+                    value = fn(*args)
+                except negative_errors as e:
+                    self.put(key, NegativeCacheEntry(e), namespace)
+                    raise
+                return self._store(key, value, namespace)
+        finally:
+            with self._locks[namespace]:
+                if self._sync_inflight.get(inflight_key) is lock:
+                    del self._sync_inflight[inflight_key]
+
+    async def aget_or_compute(
+        self, key, fn, *args, namespace=DEFAULT_CACHE_NAMESPACE, negative_errors=(), store=True,
+    ):
+        """
+        Asynchronous version of `get_or_compute` where `fn` is a coroutine
+        function and concurrent callers share the call in flight. With
+        `store=False` the function is expected to cache its own result.
+        """
+        try:
+            return self.get(key, namespace)
+        except KeyError:
+            pass
+
+        async def compute():
+            try:
+                value = await fn(*args)
+            except negative_errors as e:
+                self.put(key, NegativeCacheEntry(e), namespace)
+                raise
+            return self._store(key, value, namespace) if store else value
+
+        return await self.coalesce(key, compute, namespace=namespace)
+
+    def _store(self, key, value, namespace):
+        self.put(key, value, namespace)
+        return value
+
+    async def coalesce(self, key, fn, *args, namespace=DEFAULT_CACHE_NAMESPACE):
+        """
+        Await `fn(*args)` making concurrent callers for the same key wait
+        for the single call already in flight instead of repeating it.
+        Calls are shared between the coroutines of the same event loop.
+        """
+        loop = asyncio.get_running_loop()
+        inflight_key = (loop, namespace, key)
+        future = self._inflight.get(inflight_key)
+        if future:
+            self.namespace(namespace).coalesced += 1
+            return await asyncio.shield(future)
+
+        future = loop.create_future()
+        self._inflight[inflight_key] = future
+        try:
+            result = await fn(*args)
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody else is waiting for it.
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[inflight_key]
+
+    def stats(self):
+        return {name: cache.stats() for name, cache in self._namespaces.items()}
+
+    def log_stats(self, namespace=None):
+        if not self.logger:
+            return
+        names = [namespace] if namespace else list(self._namespaces.keys())
+        for name in names:
+            stats = self._namespaces[name].stats()
+            self.logger.info(
+                f'Lookup cache "{name}": {stats["entries"]} entries, {stats["bytes"]} bytes, '
+                f'{stats["hits"]} hits, {stats["misses"]} misses, {stats["evictions"]} evictions, '
+                f'{stats["coalesced"]} coalesced calls.',
+            )
+
+
+class ProgramCache:
+    """
+    Process-wide cache of compiled programs (jq or native formulas), shared by
+    the transformations and the web application so the same expression with
+    the same context is compiled only once.
+    """
+
+    def __init__(self, max_entries=DEFAULT_PROGRAM_CACHE_MAX_ENTRIES):
+        self._programs = CacheNamespace(max_entries, DEFAULT_CACHE_MAX_BYTES, ttl=None)
+        self._lock = threading.Lock()
+
+    def get_or_compile(self, key, compile_program):
+        with self._lock:
+            try:
+                program = self._programs[key]
+            except KeyError:
+                self._programs.misses += 1
+            else:
+                self._programs.hits += 1
+                return program
+
+        program = compile_program()
+        with self._lock:
+            self._programs[key] = program
+        return program
+
+    def clear(self):
+        with self._lock:
+            self._programs.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = self._programs.stats()
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+compiled_programs = ProgramCache()
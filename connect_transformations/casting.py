@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2023, CloudBlue LLC
+# All rights reserved.
+#
+import re
+from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+
+from dateutil.parser import parse as parse_datetime
+
+
+CAST_TYPES = ('string', 'integer', 'decimal', 'boolean', 'datetime')
+
+DATETIME_SAMPLE_SIZE = 20
+
+# Formats tried when the values of a column are not ISO 8601. They only accept
+# values that dateutil reads the same way (month first, four digit years).
+DATETIME_FORMATS = (
+    (r'\d{1,2}/\d{1,2}/\d{4}', '%m/%d/%Y'),
+    (r'\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{2}', '%m/%d/%Y %H:%M'),
+    (r'\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{2}:\d{2}', '%m/%d/%Y %H:%M:%S'),
+    (r'\d{4}/\d{1,2}/\d{1,2}', '%Y/%m/%d'),
+    (r'\d{4}/\d{1,2}/\d{1,2} \d{1,2}:\d{2}:\d{2}', '%Y/%m/%d %H:%M:%S'),
+)
+
+
+@lru_cache(maxsize=None)
+def get_quantizer(precision):
+    return Decimal(f'.{"1".zfill(int(precision))}')
+
+
+def to_decimal(value, precision=None):
+    value = value.replace(',', '.') if isinstance(value, str) else value
+    return Decimal(value).quantize(get_quantizer(precision)) if precision else Decimal(value)
+
+
+def to_boolean(value):
+    if isinstance(value, bool):
+        return value
+    value = value.lower() if isinstance(value, str) else value
+    if value in ['true', '1', 'y', 'yes']:
+        return True
+    elif value in ['false', '0', 'n', 'no']:
+        return False
+
+
+def parse_iso_datetime(value):
+    return datetime.fromisoformat(value)
+
+
+def get_format_parser(pattern, datetime_format):
+    regex = re.compile(pattern)
+
+    def parse(value):
+        if not regex.fullmatch(value):
+            raise ValueError(f'{value} does not match the format {datetime_format}.')
+        return datetime.strptime(value, datetime_format)
+
+    return parse
+
+
+FORMAT_PARSERS = tuple(get_format_parser(*item) for item in DATETIME_FORMATS)
+
+
+def _count_parsed_samples(parser, samples):
+    """
+    Return how many samples the parser reads, or 0 if it reads any of them
+    differently from dateutil.
+    """
+    count = 0
+    for sample in samples:
+        try:
+            value = parser(sample)
+        except (ValueError, OverflowError):
+            continue
+        try:
+            if value != parse_datetime(sample):
+                return 0
+        except (ValueError, OverflowError):
+            return 0
+        count += 1
+    return count
+
+
+def detect_datetime_parser(values):
+    """
+    Return, among the ISO 8601 and the DATETIME_FORMATS parsers, the one that
+    reads most of the given sample values exactly like dateutil, or None.
+    """
+    samples = [value for value in values if isinstance(value, str) and value]
+    best_parser, best_count = None, 0
+    for parser in (parse_iso_datetime, *FORMAT_PARSERS):
+        count = _count_parsed_samples(parser, samples)
+        if count > best_count:
+            best_parser, best_count = parser, count
+    return best_parser
+
+
+def get_datetime_caster(parser=parse_iso_datetime):
+    """
+    Return a function casting values to datetime with the given fast parser,
+    falling back to dateutil for the values it does not accept.
+    """
+    if parser is None:
+        return parse_datetime
+
+    def cast(value):
+        if isinstance(value, str):
+            try:
+                return parser(value)
+            except ValueError:
+                pass
+        return parse_datetime(value)
+
+    return cast
+
+
+_CASTERS = {
+    'string': str,
+    'integer': int,
+    'boolean': to_boolean,
+    'datetime': get_datetime_caster(),
+}
+
+
+def _skip_none(cast_fn):
+    def cast(value):
+        return cast_fn(value) if value is not None else None
+
+    return cast
+
+
+@lru_cache(maxsize=None)
+def get_caster(type, precision=None):
+    """
+    Return the function casting single values to the given type, which
+    keeps None values. Casters are built once per type and precision.
+    """
+    if type == 'decimal':
+        if precision:
+            quantizer = get_quantizer(precision)
+
+            def cast_fn(value):
+                value = value.replace(',', '.') if isinstance(value, str) else value
+                return Decimal(value).quantize(quantizer)
+        else:
+            cast_fn = to_decimal
+    else:
+        cast_fn = _CASTERS[type]
+    return _skip_none(cast_fn)
+
+
+def cast_column(values, type, precision=None):
+    """
+    Cast all the values of a column. The parser of datetime columns is chosen
+    from their first DATETIME_SAMPLE_SIZE values, dateutil being used only
+    for the values in other formats.
+    """
+    values = list(values)
+    if type == 'datetime':
+        parser = detect_datetime_parser(values[:DATETIME_SAMPLE_SIZE])
+        cast = _skip_none(get_datetime_caster(parser))
+    else:
+        cast = get_caster(type, precision)
+    return [cast(value) for value in values]
@@ -1,3 +1,6 @@
 SEPARATOR = ';'
 
 MAX_API_CALL_CONNECTION_ERROR_RETRIES = 2
+
+# Max number of values sent in a single `in()` RQL filter by the batched lookups.
+BULK_LOOKUP_CHUNK_SIZE = 100
@@ -3,7 +3,7 @@
 # Copyright (c) 2023, CloudBlue LLC
 # All rights reserved.
 #
-from typing import Dict
+from typing import Dict, List
 
 from connect.eaas.core.decorators import router, transformation
 from connect.eaas.core.responses import RowTransformationResponse
@@ -28,9 +28,7 @@ class CopyColumnTransformationMixin:
         row: Dict,
         row_styles: Dict = None,
     ):
-        trfn_settings = (
-            self.transformation_request['transformation']['settings']
-        )
+        trfn_settings = self.plan.settings
         result = {}
         result_styles = {}
 
@@ -41,6 +39,20 @@ class CopyColumnTransformationMixin:
 
         return RowTransformationResponse.done(result, result_styles)
 
+    def copy_columns_rows(
+        self,
+        rows: List[Dict],
+        rows_styles: List[Dict] = None,
+    ):
+        columns = [(setting['to'], setting['from']) for setting in self.plan.settings]
+        return [
+            RowTransformationResponse.done(
+                {to: row[from_] for to, from_ in columns},
+                {to: row_styles[from_] for to, from_ in columns} if row_styles else {},
+            )
+            for row, row_styles in zip(rows, rows_styles or [None] * len(rows))
+        ]
+
 
 class CopyColumnWebAppMixin:
 
@@ -3,9 +3,8 @@
 # Copyright (c) 2023, CloudBlue LLC
 # All rights reserved.
 #
-from decimal import Decimal
 from functools import cached_property
-from typing import List
+from typing import Dict, List
 
 import httpx
 from connect.eaas.core.decorators import router, transformation
@@ -15,11 +14,19 @@ from fastapi import Depends
 
 from connect_transformations.currency_conversion.models import Configuration, Currency
 from connect_transformations.currency_conversion.utils import (
-    load_currency_rate,
+    DEFAULT_RATES_MAX_STALE,
+    DEFAULT_RATES_TTL,
+    convert_currency_value,
+    convert_currency_values,
+    currency_rates,
+    get_cross_rate,
+    get_rate_date,
+    get_rates_provider,
     validate_currency_conversion,
 )
 from connect_transformations.models import Error, ValidationResult
-from connect_transformations.utils import is_input_column_nullable
+from connect_transformations.storage import get_persistent_store
+from connect_transformations.utils import get_numeric_config
 
 
 class CurrencyConverterTransformationMixin:
@@ -31,20 +38,55 @@ class CurrencyConverterTransformationMixin:
         key = (currency_from, currency_to)
 
         if key not in self._currency_rates:
-            with self.lock():
-                if key not in self._currency_rates:
-                    self._currency_rates[key] = load_currency_rate(
-                        currency_from,
-                        currency_to,
-                        self.config.get('EXCHANGE_API_KEY'),
-                    )
+            table = currency_rates.get_table(
+                self.currency_rates_provider,
+                ttl=get_numeric_config(self.config, 'EXCHANGE_RATES_TTL', DEFAULT_RATES_TTL),
+                max_stale=get_numeric_config(
+                    self.config,
+                    'EXCHANGE_RATES_MAX_STALE',
+                    DEFAULT_RATES_MAX_STALE,
+                ),
+                logger=self.logger,
+            )
+            self._currency_rates[key] = get_cross_rate(table, currency_from, currency_to)
 
         return self._currency_rates[key]
 
+    def get_historical_currency_rate(self, currency_from, currency_to, date):
+        if not hasattr(self, '_currency_rates'):
+            self._currency_rates = {}
+
+        key = (currency_from, currency_to, date)
+
+        if key not in self._currency_rates:
+            table = currency_rates.get_historical_table(
+                self.currency_rates_provider,
+                date,
+                store=get_persistent_store(self.config, self.logger),
+            )
+            self._currency_rates[key] = get_cross_rate(table, currency_from, currency_to)
+
+        return self._currency_rates[key]
+
+    def get_conversion_rate(self, conv_settings, row):
+        rate_date = conv_settings.get('rate_date') or {}
+        row_value = None
+        if rate_date.get('column'):
+            row_value = row[self.plan.input_columns_by_id[rate_date['column']]['name']]
+        date = get_rate_date(
+            rate_date,
+            self.transformation_request.get('batch', {}).get('context', {}),
+            row_value,
+        )
+        currency_from = conv_settings['from']['currency']
+        currency_to = conv_settings['to']['currency']
+        if date is None:
+            return self.get_currency_rate(currency_from, currency_to)
+        return self.get_historical_currency_rate(currency_from, currency_to, date)
+
     @cached_property
-    def input_columns(self):
-        input_columns = self.transformation_request['transformation']['columns']['input']
-        return {c['id']: c for c in input_columns}
+    def currency_rates_provider(self):
+        return get_rates_provider(self.config)
 
     @transformation(
         name='Convert currency',
@@ -58,33 +100,138 @@ class CurrencyConverterTransformationMixin:
         self,
         row,
     ):
-        return_values = {}
-        settings = self.transformation_request['transformation']['settings']
-        if not isinstance(settings, (tuple, list)):
-            settings = [settings]
+        self.precompile_currency_conversion()
 
-        for conv_settings in settings:
-            col_name = self.input_columns[conv_settings['from']['column']]['name']
+        return_values = {}
+        for index, step in enumerate(self.currency_conversion_steps):
+            conv_settings, col_name, to_column, nullable, rate_by_row = step
             value = row[col_name]
-            currency_from = conv_settings['from']['currency']
-            currency_to = conv_settings['to']['currency']
-
-            if (not value) and is_input_column_nullable(
-                self.transformation_request['transformation']['columns']['input'],
-                col_name,
-            ):
+            if (not value) and nullable:
                 return RowTransformationResponse.skip()
 
             try:
-                return_values[conv_settings['to']['column']] = (
-                    Decimal(value) * self.get_currency_rate(currency_from, currency_to)
-                ).quantize(
-                    Decimal('.00001'),
-                )
+                if rate_by_row:
+                    rate = self.get_conversion_rate(conv_settings, row)
+                else:
+                    rate = self.get_step_conversion_rate(index)
+                return_values[to_column] = convert_currency_value(value, rate)
             except Exception as e:
                 return RowTransformationResponse.fail(output=str(e))
         return RowTransformationResponse.done(return_values)
 
+    def currency_conversion_rows(
+        self,
+        rows: List[Dict],
+    ):
+        """
+        Convert the rows column by column: the rate of each conversion is
+        resolved once (unless it depends on a date column) and the values of
+        the column are converted in a single pass.
+        """
+        self.precompile_currency_conversion()
+
+        results = [{} for _ in rows]
+        responses = [None] * len(rows)
+        for index, step in enumerate(self.currency_conversion_steps):
+            pending = [
+                row_index for row_index, response in enumerate(responses) if response is None
+            ]
+            self.convert_currency_column(index, step, rows, pending, results, responses)
+
+        return [
+            response or RowTransformationResponse.done(result)
+            for response, result in zip(responses, results)
+        ]
+
+    def get_step_conversion_rate(self, index):
+        """
+        Return the rate of a conversion step that does not depend on the
+        rows, resolving it only once.
+        """
+        try:
+            return self._step_conversion_rates[index]
+        except KeyError:
+            rate = self.get_conversion_rate(self.currency_conversion_steps[index][0], {})
+            self._step_conversion_rates[index] = rate
+            return rate
+
+    def get_column_conversion_rate(self, index, step, values):
+        """
+        Return the rate shared by the rows of the column, or None if it depends
+        on a date column, and the error raised resolving it. The rate is not
+        resolved if all the values are empty and nullable, those rows are
+        skipped even when the rate is not available.
+        """
+        nullable, rate_by_row = step[3:]
+        if rate_by_row or not any(value or not nullable for value in values):
+            return None, None
+        try:
+            return self.get_step_conversion_rate(index), None
+        except Exception as e:
+            return None, e
+
+    def convert_currency_column(self, index, step, rows, pending, results, responses):
+        conv_settings, col_name, to_column, nullable, rate_by_row = step
+        values = [rows[row_index][col_name] for row_index in pending]
+
+        rate, rate_error = self.get_column_conversion_rate(index, step, values)
+
+        if rate is not None and all(values) and self.convert_currency_column_values(
+            values, rate, to_column, pending, results,
+        ):
+            return
+
+        for row_index, value in zip(pending, values):
+            if (not value) and nullable:
+                responses[row_index] = RowTransformationResponse.skip()
+                continue
+            try:
+                if rate_error:
+                    raise rate_error
+                results[row_index][to_column] = convert_currency_value(
+                    value,
+                    rate if rate is not None else self.get_conversion_rate(
+                        conv_settings,
+                        rows[row_index],
+                    ),
+                )
+            except Exception as e:
+                responses[row_index] = RowTransformationResponse.fail(output=str(e))
+
+    def convert_currency_column_values(self, values, rate, to_column, pending, results):
+        """
+        Convert all the values in a single pass. Return False if any of them
+        fails, to let the row by row conversion find the values that fail.
+        """
+        try:
+            converted = convert_currency_values(values, rate)
+        except Exception:
+            return False
+        for row_index, value in zip(pending, converted):
+            results[row_index][to_column] = value
+        return True
+
+    def precompile_currency_conversion(self):
+        if hasattr(self, 'currency_conversion_steps'):
+            return
+
+        with self.lock('currency_conversion'):
+            if hasattr(self, 'currency_conversion_steps'):
+                return
+
+            steps = []
+            for conv_settings in self.plan.settings_list:
+                col_name = self.plan.input_columns_by_id[conv_settings['from']['column']]['name']
+                steps.append((
+                    conv_settings,
+                    col_name,
+                    conv_settings['to']['column'],
+                    self.plan.is_nullable(col_name),
+                    (conv_settings.get('rate_date') or {}).get('source') == 'column',
+                ))
+            self._step_conversion_rates = {}
+            self.currency_conversion_steps = steps
+
 
 class CurrencyConversionWebAppMixin:
 
@@ -15,9 +15,15 @@ class CurrencyColumn(BaseModel):
     currency: Optional[str]
 
 
+class RateDate(BaseModel):
+    source: Optional[str]
+    column: Optional[str]
+
+
 class Settings(BaseModel):
     from_: Optional[CurrencyColumn]
     to: Optional[CurrencyColumn]
+    rate_date: Optional[RateDate]
 
     class Config:
         fields = {
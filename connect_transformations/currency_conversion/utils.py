@@ -3,10 +3,15 @@
 # Copyright (c) 2023, CloudBlue LLC
 # All rights reserved.
 #
+import json
+import threading
+import time
+from datetime import datetime
 from decimal import Decimal
 
 import requests
 
+from connect_transformations.casting import get_caster
 from connect_transformations.currency_conversion.exceptions import CurrencyConversionError
 from connect_transformations.utils import (
     build_error_response,
@@ -15,6 +20,14 @@ from connect_transformations.utils import (
 )
 
 
+DEFAULT_RATES_BASE = 'USD'
+DEFAULT_RATES_TTL = 3600
+DEFAULT_RATES_MAX_STALE = 86400
+HISTORICAL_RATES_NAMESPACE = 'historical_currency_rates'
+CONVERSION_QUANTIZER = Decimal('.00001')
+RATE_DATE_SOURCES = ('latest', 'period_start', 'period_end', 'column')
+
+
 def validate_currency_conversion(data):
     data = data.dict(by_alias=True)
 
@@ -60,6 +73,11 @@ def validate_currency_conversion(data):
                 'columns.input',
             )
 
+        rate_date = row.get('rate_date') or {}
+        error = validate_rate_date(rate_date, available_input_columns)
+        if error:
+            return error
+
         if overview:
             overview += '\n'
 
@@ -69,37 +87,301 @@ def validate_currency_conversion(data):
             dst=row['to']['column'],
             dst_curr=row['to']['currency'],
         )
+        overview += build_rate_date_overview(rate_date, available_input_columns)
 
     return {
         'overview': overview,
     }
 
 
-def load_currency_rate(currency_from, currency_to, api_key):
-    try:
-        url = 'https://openexchangerates.org/api/latest.json'
-        params = {
-            'symbols': currency_to,
-            'base': currency_from,
-        }
+class OpenExchangeRatesProvider:
+    """
+    Load the table with the latest rates of all currencies for the given base
+    from the Open Exchange Rates API.
+    """
 
-        response = requests.get(
-            url,
-            params={**params, 'app_id': api_key},
-        )
-        response.raise_for_status()
-        data = response.json()
+    url = 'https://openexchangerates.org/api/latest.json'
+    historical_url = 'https://openexchangerates.org/api/historical/{date}.json'
+
+    def __init__(self, api_key, base=DEFAULT_RATES_BASE):
+        self.api_key = api_key
+        self.base = base
+
+    @property
+    def key(self):
+        return ('openexchangerates', self.base, self.api_key)
+
+    @property
+    def name(self):
+        return f'openexchangerates:{self.base}'
+
+    def load(self):
+        return self._load(self.url)
+
+    def load_historical(self, date):
+        return self._load(self.historical_url.format(date=date))
+
+    def _load(self, url):
+        params = {'base': self.base}
+        try:
+            response = requests.get(
+                url,
+                params={**params, 'app_id': self.api_key},
+            )
+            response.raise_for_status()
+            data = response.json()
+        except requests.RequestException as exc:
+            safe_exc = str(exc).split('?', 1)[0]
+            raise CurrencyConversionError(
+                f'An error occurred while requesting {url} with '
+                f'params {params}: {safe_exc}',
+            )
 
         if not data.get('rates'):
             raise CurrencyConversionError(
                 f'Unexpected response calling {url}'
                 f' with params {params}',
             )
+        return build_rates_table(data)
+
 
-        return Decimal(data['rates'][currency_to])
-    except requests.RequestException as exc:
-        safe_exc = str(exc).split('?', 1)[0]
-        raise CurrencyConversionError(
-            f'An error occurred while requesting {url} with '
-            f'params {params}: {safe_exc}',
+class LocalRatesProvider:
+    """
+    Load the rates table from a local JSON file with the same structure as the
+    `latest.json` response of Open Exchange Rates. Meant for tests and local
+    development, set the EXCHANGE_RATES_FILE environment variable to use it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @property
+    def key(self):
+        return ('local', self.path)
+
+    @property
+    def name(self):
+        return f'local:{self.path}'
+
+    def load_historical(self, date):
+        return self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CurrencyConversionError(f'Cannot load the rates from {self.path}: {e}')
+        return build_rates_table(data)
+
+
+def build_rates_table(data):
+    rates = {code: Decimal(rate) for code, rate in data['rates'].items()}
+    base = data.get('base', DEFAULT_RATES_BASE)
+    rates[base] = Decimal(1)
+    return {'base': base, 'rates': rates}
+
+
+def get_rates_provider(config):
+    if not isinstance(config, dict):
+        config = {}
+    if config.get('EXCHANGE_RATES_FILE'):
+        return LocalRatesProvider(config['EXCHANGE_RATES_FILE'])
+    return OpenExchangeRatesProvider(
+        config.get('EXCHANGE_API_KEY'),
+        config.get('EXCHANGE_RATES_BASE') or DEFAULT_RATES_BASE,
+    )
+
+
+def validate_rate_date(rate_date, available_input_columns):
+    source = rate_date.get('source') or 'latest'
+    if source not in RATE_DATE_SOURCES:
+        return build_error_response(
+            'The `rate_date` source must be one of: ' + ', '.join(RATE_DATE_SOURCES),
         )
+    if source == 'column' and rate_date.get('column') not in available_input_columns:
+        return build_error_response(
+            'The settings contains an invalid `rate_date` column name'
+            f' "{rate_date.get("column")}" that does not exist on '
+            'columns.input',
+        )
+
+
+def build_rate_date_overview(rate_date, available_input_columns):
+    source = rate_date.get('source') or 'latest'
+    if source == 'column':
+        return f'Rate date: column {available_input_columns[rate_date["column"]]["name"]}\n'
+    if source != 'latest':
+        return f'Rate date: {source.replace("_", " ")}\n'
+    return ''
+
+
+def get_rate_date(rate_date, batch_context, row_value=None):
+    """
+    Return the date (YYYY-MM-DD) of the rates to use according to the
+    `rate_date` settings, or None to use the latest rates.
+    """
+    source = (rate_date or {}).get('source') or 'latest'
+    if source == 'latest':
+        return None
+    if source == 'column':
+        value = row_value
+    else:
+        value = batch_context.get('period', {}).get(source.split('_')[1])
+    if not value:
+        raise CurrencyConversionError(f'There is no date to get the rates ({source}).')
+    if not isinstance(value, datetime):
+        value = get_caster('datetime')(str(value))
+    return value.date().isoformat()
+
+
+def convert_currency_value(value, rate):
+    return (Decimal(value) * rate).quantize(CONVERSION_QUANTIZER)
+
+
+def convert_currency_values(values, rate):
+    """
+    Convert a whole column of values with the same rate. Empty values are
+    returned as None.
+    """
+    quantizer = CONVERSION_QUANTIZER
+    if None not in values and '' not in values:
+        return [(value * rate).quantize(quantizer) for value in map(Decimal, values)]
+    return [
+        (Decimal(value) * rate).quantize(quantizer)
+        if value is not None and value != '' else None
+        for value in values
+    ]
+
+
+def get_cross_rate(table, currency_from, currency_to):
+    """
+    Return the rate to convert from `currency_from` to `currency_to` using the
+    rates of both currencies for the common base of the table.
+    """
+    rates = table['rates']
+    for currency in (currency_from, currency_to):
+        if currency not in rates:
+            raise CurrencyConversionError(
+                f'The rate for {currency} is not available for base {table["base"]}.',
+            )
+    if currency_from == table['base']:
+        return rates[currency_to]
+    return rates[currency_to] / rates[currency_from]
+
+
+class RatesTableCache:
+    """
+    Process-wide cache of the rates tables by provider. Tables older than the
+    TTL are still returned while a background thread refreshes them, unless
+    they are older than the TTL plus the allowed staleness, then they are
+    loaded again before returning.
+
+    Tables are downloaded holding only the lock of their own provider or
+    date, the shared lock is held just to swap the cached entries.
+    """
+
+    def __init__(self, timer=time.monotonic):
+        self.timer = timer
+        self._tables = {}
+        self._historical_tables = {}
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+        self._load_locks = {}
+        self._lock = threading.Lock()
+
+    def get_table(
+        self,
+        provider,
+        ttl=DEFAULT_RATES_TTL,
+        max_stale=DEFAULT_RATES_MAX_STALE,
+        logger=None,
+    ):
+        entry = self._tables.get(provider.key)
+        if entry:
+            age = self.timer() - entry[0]
+            if age < ttl:
+                return entry[1]
+            if age < ttl + max_stale:
+                self._refresh_in_background(provider, logger)
+                return entry[1]
+
+        with self._get_load_lock(('latest', provider.key)):
+            entry = self._tables.get(provider.key)
+            if not entry or self.timer() - entry[0] >= ttl + max_stale:
+                entry = self._load(provider)
+        return entry[1]
+
+    def _get_load_lock(self, key):
+        with self._lock:
+            return self._load_locks.setdefault(key, threading.Lock())
+
+    def _load(self, provider):
+        entry = (self.timer(), provider.load())
+        with self._lock:
+            self._tables[provider.key] = entry
+        return entry
+
+    def _refresh_in_background(self, provider, logger):
+        with self._refreshing_lock:
+            if provider.key in self._refreshing:
+                return
+            self._refreshing.add(provider.key)
+
+        def refresh():
+            try:
+                self._load(provider)
+            except Exception:
+                if logger:
+                    logger.exception('Cannot refresh the currency rates, keeping the stale ones.')
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.discard(provider.key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def get_historical_table(self, provider, date, store=None):
+        """
+        Return the rates table for the given date (YYYY-MM-DD). Historical
+        rates do not change, so they are kept for the whole process and in
+        the persistent store if given, to not load them again on later runs.
+        """
+        key = (provider.name, date)
+        table = self._historical_tables.get(key)
+        if table is None:
+            with self._get_load_lock(('historical', key)):
+                table = self._historical_tables.get(key)
+                if table is None:
+                    table = self._load_historical(provider, date, store)
+                    with self._lock:
+                        self._historical_tables[key] = table
+        return table
+
+    def _load_historical(self, provider, date, store):
+        store_key = f'{provider.name}:{date}'
+        stored = store.get(HISTORICAL_RATES_NAMESPACE, store_key) if store else None
+        if stored:
+            return {
+                'base': stored['base'],
+                'rates': {code: Decimal(rate) for code, rate in stored['rates'].items()},
+            }
+
+        table = provider.load_historical(date)
+        if store:
+            store.put(
+                HISTORICAL_RATES_NAMESPACE,
+                store_key,
+                {
+                    'base': table['base'],
+                    'rates': {code: str(rate) for code, rate in table['rates'].items()},
+                },
+            )
+        return table
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+            self._historical_tables.clear()
+
+
+currency_rates = RatesTableCache()
@@ -5,33 +5,40 @@
 #
 from typing import Dict
 
-import jq
 from connect.eaas.core.decorators import router, transformation
 from connect.eaas.core.responses import RowTransformationResponse
 
 from connect_transformations.filter_row.models import Configuration
-from connect_transformations.filter_row.utils import validate_filter_row
+from connect_transformations.filter_row.utils import compile_conditions, validate_filter_row
 from connect_transformations.models import Error, ValidationResult
 
 
 class FilterRowTransformationMixin:
 
-    def precompile_filter_expression(self):
-        with self.lock():
-            if hasattr(self, 'filter_row_expression'):
+    def precompile_filter_values(self):
+        if hasattr(self, 'filter_row_values'):
+            return
+
+        with self.lock('filter_row'):
+            if hasattr(self, 'filter_row_values'):
                 return
 
-            trfn_settings = self.transformation_request['transformation']['settings']
-            comparison = "==" if trfn_settings["match_condition"] else "!="
-            operation = 'or' if trfn_settings["match_condition"] else 'and'
-            column = trfn_settings["from"]
-            filter_expression = f'."{column}" {comparison} "{trfn_settings["value"]}"'
+            trfn_settings = self.plan.settings
+            self.filter_row_values = frozenset([
+                trfn_settings['value'],
+                *(condition['value'] for condition in trfn_settings['additional_values']),
+            ])
+
+    def precompile_filter_conditions(self):
+        if hasattr(self, 'filter_row_predicate'):
+            return
+
+        with self.lock('filter_row'):
+            if hasattr(self, 'filter_row_predicate'):
+                return
 
-            for condition in trfn_settings['additional_values']:
-                filter_expression += (
-                    f' {operation} ."{column}" {comparison} "{condition["value"]}"'
-                )
-            self.filter_row_expression = jq.compile(filter_expression)
+            trfn_settings = self.plan.settings
+            self.filter_row_predicate = compile_conditions(trfn_settings['conditions'])
 
     @transformation(
         name='Delete rows by condition',
@@ -45,13 +52,22 @@ class FilterRowTransformationMixin:
         self,
         row: Dict,
     ):
-        trfn_settings = (
-            self.transformation_request['transformation']['settings']
-        )
-        if trfn_settings.get('additional_values'):
-            self.precompile_filter_expression()
+        trfn_settings = self.plan.settings
+        if trfn_settings.get('conditions'):
+            self.precompile_filter_conditions()
+
+            if self.filter_row_predicate(row):
+                return RowTransformationResponse.done({})
+
+        elif trfn_settings.get('additional_values'):
+            self.precompile_filter_values()
 
-            if self.filter_row_expression.input(row).first():
+            try:
+                found = row[trfn_settings['from']] in self.filter_row_values
+            except TypeError:
+                # Unhashable values cannot be equal to any of the settings values.
+                found = False
+            if found == trfn_settings['match_condition']:
                 return RowTransformationResponse.done({trfn_settings['from']: None})
 
         elif (
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Any, List, Optional
 
 from pydantic import BaseModel
 
@@ -10,11 +10,22 @@ class AdditionalValues(BaseModel):
     value: Optional[str]
 
 
+class Condition(BaseModel):
+    column: Optional[str]
+    operator: Optional[str]
+    value: Optional[Any]
+    conditions: Optional[List['Condition']]
+
+
+Condition.update_forward_refs()
+
+
 class Settings(BaseModel):
     from_: Optional[str]
     value: Optional[str]
     match_condition: Optional[bool]
     additional_values: Optional[List[AdditionalValues]]
+    conditions: Optional[Condition]
 
     class Config:
         fields = {
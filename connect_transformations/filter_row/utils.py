@@ -3,6 +3,12 @@
 # Copyright (c) 2023, CloudBlue LLC
 # All rights reserved.
 #
+import json
+import operator
+import re
+from decimal import Decimal, InvalidOperation
+
+from connect_transformations.exceptions import BaseTransformationException
 from connect_transformations.utils import (
     build_error_response,
     does_not_contain_required_keys,
@@ -10,6 +16,198 @@ from connect_transformations.utils import (
 )
 
 
+COMPARISON_OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+LOGICAL_OPERATORS = ('and', 'or')
+
+
+class InvalidFilterCondition(BaseTransformationException):
+    pass
+
+
+def _to_number(value):
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        number = Decimal(value.strip().replace(',', '.') if isinstance(value, str) else str(value))
+    except (InvalidOperation, ValueError):
+        return None
+    return number if number.is_finite() else None
+
+
+def _to_text(value):
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+def _is_null(value):
+    return value is None or value == ''
+
+
+def _compile_comparison(column, name, value):
+    compare = COMPARISON_OPERATORS[name]
+    expected = _to_number(value)
+    if expected is None:
+        if name not in ('==', '!='):
+            raise InvalidFilterCondition(
+                f'The `{name}` condition on column "{column}" requires a numeric value.',
+            )
+        expected_text = _to_text(value)
+        return lambda row: compare(_to_text(row.get(column)), expected_text)
+
+    if name == '!=':
+        def predicate(row):
+            number = _to_number(row.get(column))
+            return number is None or number != expected
+    else:
+        def predicate(row):
+            number = _to_number(row.get(column))
+            return number is not None and compare(number, expected)
+
+    return predicate
+
+
+def _compile_between(column, name, value):
+    bounds = [_to_number(bound) for bound in value] if isinstance(value, list) else []
+    if len(bounds) != 2 or None in bounds or bounds[0] > bounds[1]:
+        raise InvalidFilterCondition(
+            f'The `between` condition on column "{column}" requires a list with '
+            'the lower and the upper numeric bounds.',
+        )
+    low, high = bounds
+
+    def predicate(row):
+        number = _to_number(row.get(column))
+        return number is not None and low <= number <= high
+
+    return predicate
+
+
+def _compile_regex(column, name, value):
+    if not isinstance(value, str):
+        raise InvalidFilterCondition(
+            f'The `regex` condition on column "{column}" requires a regular expression.',
+        )
+    try:
+        search = re.compile(value).search
+    except re.error as e:
+        raise InvalidFilterCondition(
+            f'The `regex` condition on column "{column}" has an invalid regular expression: {e}.',
+        )
+
+    def predicate(row):
+        row_value = row.get(column)
+        return row_value is not None and search(_to_text(row_value)) is not None
+
+    return predicate
+
+
+def _compile_in(column, name, value):
+    if not isinstance(value, list):
+        raise InvalidFilterCondition(
+            f'The `{name}` condition on column "{column}" requires a list of values.',
+        )
+    values = frozenset(_to_text(item) for item in value)
+    if name == 'in':
+        return lambda row: _to_text(row.get(column)) in values
+    return lambda row: _to_text(row.get(column)) not in values
+
+
+def _compile_null_check(column, name, value):
+    if name == 'is_null':
+        return lambda row: _is_null(row.get(column))
+    return lambda row: not _is_null(row.get(column))
+
+
+CONDITION_COMPILERS = {
+    **{name: _compile_comparison for name in COMPARISON_OPERATORS},
+    'between': _compile_between,
+    'regex': _compile_regex,
+    'in': _compile_in,
+    'not_in': _compile_in,
+    'is_null': _compile_null_check,
+    'is_not_null': _compile_null_check,
+}
+
+
+def compile_conditions(node):
+    """
+    Compile a tree of conditions into a single predicate taking a row and
+    returning whether the row must be kept. Leaves look like
+    `{"column": "Price", "operator": "between", "value": [10, 20]}` and groups
+    like `{"operator": "and", "conditions": [...]}`.
+    """
+    if not isinstance(node, dict):
+        raise InvalidFilterCondition('Each condition must be an object.')
+
+    name = node.get('operator')
+    if name in LOGICAL_OPERATORS:
+        conditions = node.get('conditions')
+        if not conditions or not isinstance(conditions, list):
+            raise InvalidFilterCondition(
+                f'The `{name}` condition requires a non empty list of `conditions`.',
+            )
+        predicates = tuple(compile_conditions(condition) for condition in conditions)
+        if len(predicates) == 1:
+            return predicates[0]
+        if name == 'and':
+            return lambda row: all(predicate(row) for predicate in predicates)
+        return lambda row: any(predicate(row) for predicate in predicates)
+
+    if name not in CONDITION_COMPILERS:
+        raise InvalidFilterCondition(f'Unknown condition operator `{name}`.')
+    column = node.get('column')
+    if not column or not isinstance(column, str):
+        raise InvalidFilterCondition(f'The `{name}` condition requires a `column`.')
+    return CONDITION_COMPILERS[name](column, name, node.get('value'))
+
+
+def get_condition_columns(node):
+    if node.get('operator') in LOGICAL_OPERATORS:
+        for condition in node['conditions']:
+            yield from get_condition_columns(condition)
+    else:
+        yield node['column']
+
+
+def describe_conditions(node, nested=False):
+    name = node['operator']
+    if name in LOGICAL_OPERATORS:
+        description = f' {name.upper()} '.join(
+            describe_conditions(condition, nested=True) for condition in node['conditions']
+        )
+        return f'({description})' if nested and len(node['conditions']) > 1 else description
+
+    column = f'"{node["column"]}"'
+    value = node.get('value')
+    if name in ('is_null', 'is_not_null'):
+        return f'{column} {name.replace("_", " ")}'
+    if name == 'between':
+        return f'{column} between {value[0]} and {value[1]}'
+    return f'{column} {name.replace("_", " ")} {json.dumps(value)}'
+
+
+def validate_filter_conditions(conditions, input_columns):
+    try:
+        compile_conditions(conditions)
+    except InvalidFilterCondition as e:
+        return build_error_response(str(e))
+
+    available_input_columns = {column['name'] for column in input_columns}
+    for column in get_condition_columns(conditions):
+        if column not in available_input_columns:
+            return build_error_response(
+                f'The column "{column}" used in the conditions does not exist.',
+            )
+
+    return {'overview': f'We Keep Row If {describe_conditions(conditions)}'}
+
+
 def validate_filter_row(data):
     data = data.dict(by_alias=True)
 
@@ -18,6 +216,9 @@ def validate_filter_row(data):
 
     settings = data['settings']
 
+    if settings.get('conditions'):
+        return validate_filter_conditions(settings['conditions'], data['columns']['input'])
+
     if (
         does_not_contain_required_keys(
             settings,
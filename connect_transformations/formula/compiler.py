@@ -0,0 +1,568 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2023, CloudBlue LLC
+# All rights reserved.
+#
+import math
+import operator
+import re
+
+
+TOKEN_REGEX = re.compile(
+    r'\s*(?:'
+    r'(?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?)'
+    r'|(?P<string>"(?:[^"\\\x00-\x1f]|\\[^(])*")'
+    r'|(?P<field>\.[a-zA-Z_][a-zA-Z0-9_]*)'
+    r'|(?P<variable>\$[a-zA-Z_][a-zA-Z0-9_]*)'
+    r'|(?P<ident>[a-zA-Z_][a-zA-Z0-9_]*)'
+    r'|(?P<op>==|!=|<=|>=|//|[-+*/<>|();:\[\].])'
+    r')',
+)
+JSON_NUMBER_REGEX = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?')
+STRING_ESCAPES = {
+    '"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t',
+}
+KEYWORDS = {
+    'if', 'then', 'elif', 'else', 'end', 'and', 'or', 'def', 'as', 'reduce', 'foreach',
+    'try', 'catch', 'label', 'import', 'include', '__loc__',
+}
+
+
+class UnsupportedFormula(Exception):
+    """
+    The formula uses jq features the native compiler does not handle.
+    """
+
+
+class FallbackToJq(Exception):
+    """
+    The input values fall out of the types the native program handles the
+    same way jq does (or jq would raise an error), so jq must evaluate it.
+    """
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise FallbackToJq()
+    value = float(value)
+    if not math.isfinite(value):
+        raise FallbackToJq()
+    return value
+
+
+def _checked(value):
+    if not math.isfinite(value):
+        raise FallbackToJq()
+    return value
+
+
+def _truthy(value):
+    return value is not None and value is not False
+
+
+def _kind(value):
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, (int, float)):
+        return 'number'
+    if isinstance(value, str):
+        return 'string'
+    raise FallbackToJq()
+
+
+def _equal(a, b):
+    kind = _kind(a)
+    if kind != _kind(b):
+        return False
+    if kind == 'number':
+        return _number(a) == _number(b)
+    return a == b
+
+
+def _ordered(compare_values):
+    def compare(a, b):
+        kind = _kind(a)
+        if kind != _kind(b) or kind not in ('number', 'string'):
+            raise FallbackToJq()
+        if kind == 'number':
+            return compare_values(_number(a), _number(b))
+        return compare_values(a, b)
+
+    return compare
+
+
+COMPARISONS = {
+    '==': _equal,
+    '!=': lambda a, b: not _equal(a, b),
+    '<': _ordered(operator.lt),
+    '<=': _ordered(operator.le),
+    '>': _ordered(operator.gt),
+    '>=': _ordered(operator.ge),
+}
+
+
+def _add(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if isinstance(a, str) and isinstance(b, str):
+        return a + b
+    return _checked(_number(a) + _number(b))
+
+
+def _subtract(a, b):
+    return _checked(_number(a) - _number(b))
+
+
+def _multiply(a, b):
+    return _checked(_number(a) * _number(b))
+
+
+def _divide(a, b):
+    divisor = _number(b)
+    if divisor == 0:
+        raise FallbackToJq()
+    return _checked(_number(a) / divisor)
+
+
+ARITHMETIC = {'+': _add, '-': _subtract, '*': _multiply, '/': _divide}
+
+
+def _index(value, key):
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        return value.get(key)
+    raise FallbackToJq()
+
+
+def _round(value):
+    # C round(): halfway cases are rounded away from zero.
+    value = _number(value)
+    if value < 0:
+        return -_round(-value)
+    floor = math.floor(value)
+    return float(floor + 1 if value - floor >= 0.5 else floor)
+
+
+def _round_to(number, precision):
+    multiplier = _pow(10.0, math.floor(_number(precision)))
+    return _divide(_round(_multiply(number, multiplier)), multiplier)
+
+
+def _pow(base, exponent):
+    try:
+        return _checked(math.pow(_number(base), _number(exponent)))
+    except (OverflowError, ValueError):
+        raise FallbackToJq()
+
+
+def _tonumber(value):
+    if isinstance(value, str):
+        if not JSON_NUMBER_REGEX.fullmatch(value):
+            raise FallbackToJq()
+        return _number(float(value))
+    return _number(value)
+
+
+def _gross_profit(list_price, cogs):
+    return _subtract(list_price, cogs)
+
+
+def _margin(list_price, cogs):
+    return _multiply(_divide(_gross_profit(list_price, cogs), list_price), 100.0)
+
+
+def _markup(list_price, cogs):
+    return _multiply(_divide(_gross_profit(list_price, cogs), cogs), 100.0)
+
+
+def _floor(value):
+    return float(math.floor(_number(value)))
+
+
+# Builtins and functions of `formula/functions` by (name, arity). Functions
+# receive the input value followed by the values of their arguments.
+FUNCTIONS = {
+    ('not', 0): lambda value: not _truthy(value),
+    ('floor', 0): _floor,
+    ('round', 0): _round,
+    ('round', 1): lambda value, precision: _round_to(value, precision),
+    ('round', 2): lambda value, number, precision: _round_to(number, precision),
+    ('pow', 2): lambda value, base, exponent: _pow(base, exponent),
+    ('tonumber', 0): _tonumber,
+    ('tonumber', 1): lambda value, argument: _tonumber(argument),
+    ('gross_profit', 2): lambda value, list_price, cogs: _gross_profit(list_price, cogs),
+    ('margin', 2): lambda value, list_price, cogs: _margin(list_price, cogs),
+    ('markup', 2): lambda value, list_price, cogs: _markup(list_price, cogs),
+}
+
+
+def _normalize(value):
+    """
+    Convert the result to the value the jq bindings return: numbers are
+    doubles, returned as int when integral.
+    """
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    value = _number(value)
+    return int(value) if value.is_integer() else value
+
+
+def _unescape(literal):
+    body = literal[1:-1]
+    result = []
+    position = 0
+    while position < len(body):
+        char = body[position]
+        if char != '\\':
+            result.append(char)
+            position += 1
+            continue
+        escape = body[position + 1]
+        if escape in STRING_ESCAPES:
+            result.append(STRING_ESCAPES[escape])
+            position += 2
+        else:
+            raise UnsupportedFormula(literal)
+    return ''.join(result)
+
+
+def tokenize(formula):
+    tokens = []
+    position = 0
+    formula = formula.rstrip()
+    while position < len(formula):
+        match = TOKEN_REGEX.match(formula, position)
+        if not match or match.end() == position:
+            raise UnsupportedFormula(formula)
+        position = match.end()
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+    return tokens
+
+
+class ConstantNode:
+
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self, value):
+        return self.value
+
+
+class FormulaParser:
+    """
+    Recursive descent parser for the subset of jq used by most formulas:
+    literals, field access, `$context`, arithmetic, comparisons, `and`/`or`,
+    `//`, pipes, `if` expressions and the functions in `FUNCTIONS`, plus
+    constant definitions like `def drop_row: "..."`. Every node is compiled
+    into a closure taking the input value. Anything else raises
+    `UnsupportedFormula`, as does anything jq itself would refuse to compile.
+    """
+
+    def __init__(self, formula, variables):
+        self.tokens = tokenize(formula)
+        self.position = 0
+        self.variables = variables
+        self.definitions = {}
+
+    def peek(self, offset=0):
+        if self.position + offset < len(self.tokens):
+            return self.tokens[self.position + offset]
+        return (None, None)
+
+    def accept(self, value):
+        kind, token = self.peek()
+        if kind in ('op', 'ident') and token == value:
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, value):
+        if not self.accept(value):
+            raise UnsupportedFormula(f'Expected {value}')
+
+    def parse(self):
+        while self.peek() == ('ident', 'def'):
+            self.parse_definition()
+        node = self.parse_pipe()
+        if self.position != len(self.tokens):
+            raise UnsupportedFormula('Unexpected token')
+        return node
+
+    def parse_definition(self):
+        self.position += 1
+        kind, name = self.peek()
+        if kind != 'ident' or name in KEYWORDS:
+            raise UnsupportedFormula('Invalid definition')
+        self.position += 1
+        self.expect(':')
+        # Recursive definitions are not supported.
+        self.definitions[name] = None
+        body = self.parse_pipe()
+        self.expect(';')
+        self.definitions[name] = body
+
+    def parse_pipe(self):
+        left = self.parse_alternative()
+        if not self.accept('|'):
+            return left
+        right = self.parse_pipe()
+        return lambda value: right(left(value))
+
+    def parse_alternative(self):
+        left = self.parse_or()
+        if not self.accept('//'):
+            return left
+        right = self.parse_alternative()
+
+        def alternative(value):
+            result = left(value)
+            return result if _truthy(result) else right(value)
+
+        return alternative
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.accept('or'):
+            node = self.or_node(node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_comparison()
+        while self.accept('and'):
+            node = self.and_node(node, self.parse_comparison())
+        return node
+
+    @staticmethod
+    def or_node(left, right):
+        return lambda value: _truthy(left(value)) or _truthy(right(value))
+
+    @staticmethod
+    def and_node(left, right):
+        return lambda value: _truthy(left(value)) and _truthy(right(value))
+
+    def parse_comparison(self):
+        left = self.parse_additive()
+        kind, token = self.peek()
+        if kind != 'op' or token not in COMPARISONS:
+            return left
+        self.position += 1
+        right = self.parse_additive()
+        if self.peek()[1] in COMPARISONS:
+            raise UnsupportedFormula('Comparisons are not associative')
+        compare = COMPARISONS[token]
+        return lambda value: compare(left(value), right(value))
+
+    def parse_additive(self):
+        node = self.parse_multiplicative()
+        while self.peek() in (('op', '+'), ('op', '-')):
+            operation = ARITHMETIC[self.tokens[self.position][1]]
+            self.position += 1
+            node = self.binary_node(operation, node, self.parse_multiplicative())
+        return node
+
+    def parse_multiplicative(self):
+        if self.accept('-'):
+            # Like in jq, the unary minus applies to the whole product.
+            return self.negate_node(self.parse_multiplicative())
+        node = self.parse_postfix()
+        while self.peek() in (('op', '*'), ('op', '/')):
+            operation = ARITHMETIC[self.tokens[self.position][1]]
+            self.position += 1
+            if self.accept('-'):
+                operand = self.negate_node(self.parse_multiplicative())
+                return self.binary_node(operation, node, operand)
+            node = self.binary_node(operation, node, self.parse_postfix())
+        return node
+
+    @staticmethod
+    def binary_node(operation, left, right):
+        if isinstance(left, ConstantNode) and isinstance(right, ConstantNode):
+            # jq folds the operations between number literals at compile time
+            # and refuses to compile a division by zero.
+            if operation is _divide and right.value == 0:
+                raise UnsupportedFormula('Division by zero')
+            try:
+                return ConstantNode(operation(left.value, right.value))
+            except FallbackToJq:
+                pass
+        return lambda value: operation(left(value), right(value))
+
+    @staticmethod
+    def negate_node(node):
+        return lambda value: _checked(-_number(node(value)))
+
+    def parse_postfix(self):
+        node = self.parse_term()
+        while True:
+            kind, token = self.peek()
+            if kind == 'field':
+                node = self.index_node(node, token[1:])
+                self.position += 1
+            elif (kind, token) == ('op', '.') and self.peek(1)[0] == 'string':
+                node = self.index_node(node, _unescape(self.peek(1)[1]))
+                self.position += 2
+            elif (kind, token) == ('op', '['):
+                node = self.index_node(node, self.parse_bracket())
+            else:
+                return node
+
+    def parse_bracket(self):
+        self.expect('[')
+        kind, token = self.peek()
+        if kind != 'string':
+            raise UnsupportedFormula('Only string keys are supported')
+        self.position += 1
+        self.expect(']')
+        return _unescape(token)
+
+    @staticmethod
+    def index_node(node, key):
+        return lambda value: _index(node(value), key)
+
+    def parse_term(self):  # noqa: CCR001
+        kind, token = self.peek()
+        self.position += 1
+        if kind == 'number':
+            return ConstantNode(float(token))
+        if kind == 'string':
+            string = _unescape(token)
+            return lambda value: string
+        if kind == 'field':
+            key = token[1:]
+            return lambda value: _index(value, key)
+        if kind == 'variable':
+            if token[1:] not in self.variables:
+                raise UnsupportedFormula(f'Unknown variable {token}')
+            variable = self.variables[token[1:]]
+            return lambda value: variable
+        if (kind, token) == ('op', '.'):
+            if self.peek()[0] == 'string':
+                key = _unescape(self.peek()[1])
+                self.position += 1
+                return lambda value: _index(value, key)
+            return lambda value: value
+        if (kind, token) == ('op', '('):
+            node = self.parse_pipe()
+            self.expect(')')
+            return node
+        if (kind, token) == ('ident', 'if'):
+            return self.parse_if()
+        if kind == 'ident':
+            return self.parse_call(token)
+        raise UnsupportedFormula('Unexpected token')
+
+    def parse_if(self):
+        condition = self.parse_pipe()
+        self.expect('then')
+        then = self.parse_pipe()
+        if self.accept('elif'):
+            otherwise = self.parse_if()
+        else:
+            self.expect('else')
+            otherwise = self.parse_pipe()
+            self.expect('end')
+
+        def if_node(value):
+            return then(value) if _truthy(condition(value)) else otherwise(value)
+
+        return if_node
+
+    def parse_call(self, name):
+        if name in KEYWORDS:
+            raise UnsupportedFormula(f'Unexpected keyword {name}')
+        constants = {'null': None, 'true': True, 'false': False}
+        if name in constants:
+            constant = constants[name]
+            return lambda value: constant
+
+        arguments = []
+        if self.accept('('):
+            arguments.append(self.parse_pipe())
+            while self.accept(';'):
+                arguments.append(self.parse_pipe())
+            self.expect(')')
+
+        if name in self.definitions:
+            if arguments or self.definitions[name] is None:
+                raise UnsupportedFormula(f'Unsupported call to {name}')
+            return self.definitions[name]
+
+        function = FUNCTIONS.get((name, len(arguments)))
+        if not function:
+            raise UnsupportedFormula(f'Unsupported function {name}/{len(arguments)}')
+        return lambda value: function(value, *(argument(value) for argument in arguments))
+
+
+class NativeProgram:
+    """
+    Program compiled by `compile_native_formula`, exposing the same
+    `input(value).first()` interface as the jq programs. When the input values
+    fall out of the supported types the jq program is compiled and used.
+    """
+
+    def __init__(self, evaluate, jq_factory):
+        self.evaluate = evaluate
+        self.jq_factory = jq_factory
+        self.jq_program = None
+
+    def get_jq_program(self):
+        if self.jq_program is None:
+            self.jq_program = self.jq_factory()
+        return self.jq_program
+
+    def input(self, value):  # noqa: A003
+        return NativeResult(self, value)
+
+
+class NativeResult:
+
+    def __init__(self, program, value):
+        self.program = program
+        self.value = value
+
+    def first(self):
+        try:
+            return _normalize(self.program.evaluate(self.value))
+        except (FallbackToJq, RecursionError):
+            return self.program.get_jq_program().input(self.value).first()
+
+    def all(self):  # noqa: A003
+        return [self.first()]
+
+
+class NativeBatchProgram(NativeProgram):
+    """
+    Batch counterpart of `NativeProgram`, with the same output as the programs
+    returned by `compile_batch_formula`. Rows that need jq are reported as
+    errors, so they are evaluated again one by one.
+    """
+
+    def input(self, value):  # noqa: A003
+        return NativeBatchResult(self, value)
+
+
+class NativeBatchResult(NativeResult):
+
+    def first(self):
+        results = []
+        for row in self.value:
+            try:
+                results.append([_normalize(self.program.evaluate(row))])
+            except (FallbackToJq, RecursionError):
+                results.append({'error': 'Evaluated by jq'})
+        return results
+
+
+def compile_native_formula(formula, variables, jq_factory, batch=False):
+    """
+    Compile the formula into a Python program, raising `UnsupportedFormula`
+    if it falls out of the supported jq subset.
+    """
+    evaluate = FormulaParser(formula, variables).parse()
+    program_class = NativeBatchProgram if batch else NativeProgram
+    return program_class(evaluate, jq_factory)
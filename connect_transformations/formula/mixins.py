@@ -8,46 +8,69 @@ from typing import Dict, List
 from connect.eaas.core.decorators import router, transformation
 from connect.eaas.core.responses import RowTransformationResponse
 
+from connect_transformations.casting import cast_column, get_caster
 from connect_transformations.formula.models import Configuration
 from connect_transformations.formula.utils import (
     DROP_REGEX,
     clear_formula,
+    compile_batch_formula,
     compile_formula,
     extract_input,
     validate_formula,
 )
 from connect_transformations.models import Error, StreamsColumn, ValidationResult
-from connect_transformations.utils import cast_value_to_type
 
 
 class FormulaTransformationMixin:
 
+    def get_clean_formulas(self):
+        trfn_settings = self.plan.settings
+        for expression in trfn_settings['expressions']:
+            formula = expression['formula']
+            if DROP_REGEX.findall(formula):
+                formula = f'def drop_row: "#INSTRUCTION/DELETE_ROW"; {formula}'
+            yield expression['to'], clear_formula(formula)
+
     def precompile(self, row: Dict):
-        with self.lock():
+        if hasattr(self, 'jq_expressions'):
+            return
+
+        with self.lock('formula'):
             if hasattr(self, 'jq_expressions'):
                 return
 
-            self.jq_expressions = {}
-
-            trfn_settings = self.transformation_request['transformation']['settings']
-            for expression in trfn_settings['expressions']:
-                formula = expression['formula']
-                if DROP_REGEX.findall(formula):
-                    formula = f'def drop_row: "#INSTRUCTION/DELETE_ROW"; {formula}'
-                clean_formula = clear_formula(formula)
-                self.jq_expressions[expression['to']] = compile_formula(
+            columns_types = {
+                column['name']: column.get('type') for column in self.plan.input_columns
+            }
+            self.column_converters = [
+                (col_name, str) for col_name in row
+                if columns_types.get(col_name) == 'datetime'
+            ]
+            self.jq_expressions = {
+                to: compile_formula(
                     clean_formula,
                     stream=self.transformation_request['stream'],
                     batch=self.transformation_request['batch'],
                 )
+                for to, clean_formula in self.get_clean_formulas()
+            }
 
-            self.column_converters = []
+    def precompile_batch(self):
+        if hasattr(self, 'jq_batch_expressions'):
+            return
 
-            input_columns = self.transformation_request['transformation']['columns']['input']
-            columns_types = {column['name']: column.get('type') for column in input_columns}
-            for col_name in row:
-                if columns_types.get(col_name) == 'datetime':
-                    self.column_converters.append((col_name, str))
+        with self.lock('formula'):
+            if hasattr(self, 'jq_batch_expressions'):
+                return
+
+            self.jq_batch_expressions = {
+                to: compile_batch_formula(
+                    clean_formula,
+                    stream=self.transformation_request['stream'],
+                    batch=self.transformation_request['batch'],
+                )
+                for to, clean_formula in self.get_clean_formulas()
+            }
 
     @transformation(
         name='Formula',
@@ -67,7 +90,7 @@ class FormulaTransformationMixin:
         except Exception as e:
             return RowTransformationResponse.fail(output=str(e))
 
-        trfn_settings = self.transformation_request['transformation']['settings']
+        trfn_settings = self.plan.settings
 
         for col_name, converter in self.column_converters:
             row[col_name] = converter(row[col_name])
@@ -76,11 +99,7 @@ class FormulaTransformationMixin:
         for expression in trfn_settings['expressions']:
             try:
                 value = self.jq_expressions[expression['to']].input(row).first()
-                column_type = expression.get('type', 'string')
-                parameters = {'value': value, 'type': column_type}
-                if column_type == 'decimal':
-                    parameters['additional_parameters'] = {'precision': expression.get('precision')}
-                result[expression['to']] = cast_value_to_type(**parameters)
+                result[expression['to']] = self.cast_formula_value(expression, value)
             except StopIteration:
                 result[expression['to']] = None
             except Exception as e:
@@ -92,6 +111,79 @@ class FormulaTransformationMixin:
 
         return RowTransformationResponse.done(result)
 
+    def formula_rows(
+        self,
+        rows: List[Dict],
+    ):
+        """
+        Evaluate the formulas against all the given rows feeding each compiled
+        jq program once with the whole list of rows. Rows for which any formula
+        fails are evaluated again one by one through `formula`, so failures and
+        `ignore_errors` are handled per row exactly as in the row by row path.
+        """
+        if not rows:
+            return []
+
+        try:
+            self.precompile(rows[0])
+            self.precompile_batch()
+        except Exception as e:
+            return [RowTransformationResponse.fail(output=str(e)) for _ in rows]
+
+        for row in rows:
+            for col_name, converter in self.column_converters:
+                row[col_name] = converter(row[col_name])
+
+        try:
+            columns = {
+                to: program.input(rows).first()
+                for to, program in self.jq_batch_expressions.items()
+            }
+        except Exception:
+            self.logger.exception('Cannot evaluate the formulas in batch.')
+            return [self.formula(row) for row in rows]
+
+        try:
+            results = self.build_formula_results(columns, len(rows))
+        except Exception:
+            self.logger.exception('Cannot cast the formula results in batch.')
+            return [self.formula(row) for row in rows]
+
+        return [
+            RowTransformationResponse.done(result) if result is not None else self.formula(row)
+            for row, result in zip(rows, results)
+        ]
+
+    def build_formula_results(self, columns, count):
+        """
+        Cast the outputs of the batch programs column by column and return the
+        result of every row, or None for the rows where any formula failed.
+        """
+        failed = {
+            index
+            for outputs in columns.values()
+            for index, output in enumerate(outputs)
+            if isinstance(output, dict)
+        }
+        results = [None if index in failed else {} for index in range(count)]
+        for expression in self.plan.settings['expressions']:
+            values = [
+                output[0] if output and index not in failed else None
+                for index, output in enumerate(columns[expression['to']])
+            ]
+            column_type, precision = self.get_formula_type(expression)
+            for result, value in zip(results, cast_column(values, column_type, precision)):
+                if result is not None:
+                    result[expression['to']] = value
+        return results
+
+    def get_formula_type(self, expression):
+        column_type = expression.get('type', 'string')
+        return column_type, expression.get('precision') if column_type == 'decimal' else None
+
+    def cast_formula_value(self, expression, value):
+        return get_caster(*self.get_formula_type(expression))(value)
+
 
 class FormulaWebAppMixin:
 
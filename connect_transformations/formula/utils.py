@@ -3,6 +3,7 @@
 # Copyright (c) 2023, CloudBlue LLC
 # All rights reserved.
 #
+import json
 import re
 from collections import defaultdict
 from datetime import datetime
@@ -10,9 +11,11 @@ from datetime import datetime
 import jq
 from fastapi.responses import JSONResponse
 
+from connect_transformations.cache import compiled_programs
+from connect_transformations.casting import CAST_TYPES
+from connect_transformations.formula.compiler import UnsupportedFormula, compile_native_formula
 from connect_transformations.formula.functions import all_functions
 from connect_transformations.utils import (
-    _cast_mapping,
     build_error_response,
     deep_convert_type,
     does_not_contain_required_keys,
@@ -54,7 +57,7 @@ def validate_formula(data):  # noqa: CCR001
                 ['to', 'formula', 'type', 'ignore_errors'],
             ) or not isinstance(expression['to'], str)
             or not isinstance(expression['formula'], str)
-            or expression['type'] not in _cast_mapping.keys()
+            or expression['type'] not in CAST_TYPES
             or not isinstance(expression['ignore_errors'], bool)
         ):
             return build_error_response(
@@ -165,12 +168,45 @@ def clear_formula(expression):
 
 
 def compile_formula(expression, stream, batch=None):
-    return jq.compile(
-        all_functions + expression,
-        args=get_context_variables(stream, batch),
+    """
+    Compile the formula into a native Python program when it only uses the
+    jq subset supported by `formula.compiler`, or into a jq program otherwise.
+    """
+    return _compile(expression, get_context_variables(stream, batch))
+
+
+def compile_batch_formula(expression, stream, batch=None):
+    """
+    Compile a formula to be evaluated against a list of rows at once. The
+    program returns, for every row, a list with the first value of the formula
+    (or an empty list) or an object with the `error` raised for that row.
+    """
+    return _compile(expression, get_context_variables(stream, batch), batch_mode=True)
+
+
+def _compile(expression, args, batch_mode=False):
+    expression = expression.strip()
+    key = ('formula', batch_mode, expression, json.dumps(args, sort_keys=True, default=str))
+    return compiled_programs.get_or_compile(
+        key,
+        lambda: _compile_program(expression, args, batch_mode),
     )
 
 
+def _compile_program(expression, args, batch_mode):
+    jq_expression = expression
+    if batch_mode:
+        jq_expression = f'map(try [first({expression})] catch {{"error": .}})'
+
+    def compile_jq():
+        return jq.compile(all_functions + jq_expression, args=args)
+
+    try:
+        return compile_native_formula(expression, args, compile_jq, batch=batch_mode)
+    except UnsupportedFormula:
+        return compile_jq()
+
+
 def get_context_variables(stream, batch):
     context = stream.get('context', {})
 
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2023, CloudBlue LLC
+# All rights reserved.
+#
+import asyncio
+import threading
+import time
+
+
+DEFAULT_LOCK_NAME = 'default'
+
+
+class LockStats:
+    def __init__(self):
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_time = 0.0
+
+    def record(self, wait_start=None):
+        self.acquisitions += 1
+        if wait_start is not None:
+            self.contended += 1
+            self.wait_time += time.perf_counter() - wait_start
+
+    def as_dict(self):
+        return {
+            'acquisitions': self.acquisitions,
+            'contended': self.contended,
+            'wait_time': self.wait_time,
+        }
+
+
+class InstrumentedLock:
+    """
+    Lock counting how many times it was acquired and how many of them, and
+    for how long, the caller had to wait for another holder.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = LockStats()
+
+    def __enter__(self):
+        if self._lock.acquire(blocking=False):
+            self.stats.record()
+        else:
+            wait_start = time.perf_counter()
+            self._lock.acquire()
+            self.stats.record(wait_start)
+        return self
+
+    def __exit__(self, *args):
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+
+class InstrumentedAsyncLock:
+    """
+    asyncio version of InstrumentedLock.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self.stats = LockStats()
+
+    async def __aenter__(self):
+        wait_start = time.perf_counter() if self._lock.locked() else None
+        await self._lock.acquire()
+        self.stats.record(wait_start)
+        return self
+
+    async def __aexit__(self, *args):
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+
+class LockRegistry:
+    """
+    Named locks, one per resource (a preload, a cache namespace...), so that
+    a slow operation only blocks the callers of the same resource.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._async_locks = {}
+        self._registry_lock = threading.Lock()
+
+    def lock(self, name=DEFAULT_LOCK_NAME):
+        return self._get(self._locks, name, InstrumentedLock)
+
+    def alock(self, name=DEFAULT_LOCK_NAME):
+        return self._get(self._async_locks, name, InstrumentedAsyncLock)
+
+    def _get(self, locks, name, factory):
+        lock = locks.get(name)
+        if lock is None:
+            with self._registry_lock:
+                lock = locks.get(name)
+                if lock is None:
+                    lock = locks[name] = factory()
+        return lock
+
+    def stats(self):
+        """
+        Return the acquisitions, contended acquisitions and total wait time in
+        seconds of every lock, keyed by name (async locks are prefixed `async:`).
+        """
+        stats = {name: lock.stats.as_dict() for name, lock in list(self._locks.items())}
+        stats.update({
+            f'async:{name}': lock.stats.as_dict()
+            for name, lock in list(self._async_locks.items())
+        })
+        return stats
@@ -3,7 +3,7 @@
 # Copyright (c) 2023, CloudBlue LLC
 # All rights reserved.
 #
-from typing import Dict
+from typing import Dict, List
 
 from connect.client import AsyncConnectClient
 from connect.eaas.core.decorators import router, transformation
@@ -11,15 +11,25 @@ from connect.eaas.core.inject.asynchronous import get_installation_client
 from connect.eaas.core.responses import RowTransformationResponse
 from fastapi import Depends
 
-from connect_transformations.constants import SEPARATOR
+from connect_transformations.cache import NegativeCacheEntry
+from connect_transformations.constants import BULK_LOOKUP_CHUNK_SIZE, SEPARATOR
 from connect_transformations.lookup_billing_request.exceptions import BillingRequestLookupError
 from connect_transformations.lookup_billing_request.models import (
     Configuration,
     SubscriptionParameter,
 )
-from connect_transformations.lookup_billing_request.utils import validate_lookup_billing_request
+from connect_transformations.lookup_billing_request.utils import (
+    build_requests_timeline,
+    count_updated_between,
+    find_billing_request_in_timeline,
+    get_billing_request_cache_key,
+    validate_lookup_billing_request,
+)
 from connect_transformations.models import Error, ValidationResult
-from connect_transformations.utils import deep_itemgetter, is_input_column_nullable
+from connect_transformations.utils import deep_itemgetter
+
+
+BILLING_REQUESTS_CACHE_NAMESPACE = 'billing_requests'
 
 
 class LookupBillingRequestTransformationMixin:
@@ -40,12 +50,29 @@ class LookupBillingRequestTransformationMixin:
         value = row[self.billing_settings['parameter_column']]
         item_id = row.get(self.billing_settings['item_column'])
 
-        if is_input_column_nullable(
-            self.transformation_request['transformation']['columns']['input'],
-            self.billing_settings['parameter_column'],
-        ) and not value:
+        if self.plan.is_nullable(self.billing_settings['parameter_column']) and not value:
             return RowTransformationResponse.skip()
 
+        try:
+            request = await self.get_billing_request(self.build_billing_lookup(row))
+        except Exception as e:
+            return RowTransformationResponse.fail(output=str(e))
+
+        if not request:
+            return RowTransformationResponse.skip()
+
+        return RowTransformationResponse.done(
+            await self.extract_row_from_billing(request, output_columns, item_id),
+        )
+
+    async def lookup_billing_request_rows(
+        self,
+        rows: List[Dict],
+    ):
+        await self.prefetch_billing_requests(rows)
+        return [await self.lookup_billing_request(row) for row in rows]
+
+    def build_billing_lookup(self, row):
         lookup = {}
         if self.billing_settings.get('asset_type'):
             lookup[f'asset.{self.billing_settings["asset_type"]}'] = row[
@@ -53,18 +80,128 @@ class LookupBillingRequestTransformationMixin:
             ]
 
         lookup['asset.params.id'] = self.billing_settings['parameter']['name']
-        lookup['asset.params.value'] = value
+        lookup['asset.params.value'] = row[self.billing_settings['parameter_column']]
+        return lookup
 
+    async def prefetch_billing_requests(self, rows):
+        """
+        Resolve the lookups of all the given rows from a timeline built with
+        two bulk queries per chunk of parameter values (approved FF requests and
+        billing requests) and a single query for the approved requests of any
+        asset in the batch window, and put the results into the cache, so
+        `lookup_billing_request` answers each row without calling the API.
+        """
+        pending = self.get_pending_billing_lookups(rows)
+        values = list(pending.keys())
+        candidates = []
+        for start in range(0, len(values), BULK_LOOKUP_CHUNK_SIZE):
+            chunk = values[start:start + BULK_LOOKUP_CHUNK_SIZE]
+            ff_timeline, billing_timeline = await self.retrieve_billing_timeline(chunk)
+            for value in chunk:
+                for k, lookup in pending[value].items():
+                    candidates.append((
+                        k,
+                        lookup,
+                        *find_billing_request_in_timeline(lookup, ff_timeline, billing_timeline),
+                    ))
+
+        approved_updates = await self.retrieve_approved_updates([
+            (ff_req, billing_request)
+            for _, _, ff_req, billing_request in candidates
+            if billing_request
+        ])
+        for k, lookup, ff_req, billing_request in candidates:
+            await self.acache_put(
+                k,
+                self.resolve_billing_lookup(lookup, ff_req, billing_request, approved_updates),
+                BILLING_REQUESTS_CACHE_NAMESPACE,
+            )
+
+    def resolve_billing_lookup(self, lookup, ff_req, billing_request, approved_updates):
+        if billing_request and count_updated_between(
+            approved_updates, ff_req, billing_request,
+        ) <= 1:
+            return self.combine_billing_request(ff_req, billing_request)
         try:
-            request = await self.get_billing_request(lookup)
-        except Exception as e:
-            return RowTransformationResponse.fail(output=str(e))
+            return self.billing_request_not_found(lookup)
+        except BillingRequestLookupError as e:
+            return NegativeCacheEntry(e)
 
-        if not request:
-            return RowTransformationResponse.skip()
+    async def retrieve_approved_updates(self, pairs):
+        """
+        Return the sorted update dates of the approved requests, of any asset,
+        updated between the earliest FF request and the latest billing request
+        creation of the given pairs, fetched with a single query.
+        """
+        if not pairs:
+            return []
+        return sorted([
+            item['updated'] async for item in self.installation_client.requests.filter(
+                status='approved',
+                updated__gt=min(ff_req['updated'] for ff_req, _ in pairs),
+                updated__lt=max(
+                    billing_request['events']['created']['at'] for _, billing_request in pairs
+                ),
+            ).select(
+                '-activation_key',
+                '-template',
+            )
+        ])
 
-        return RowTransformationResponse.done(
-            await self.extract_row_from_billing(request, output_columns, item_id),
+    def get_pending_billing_lookups(self, rows):
+        """
+        Return the not cached lookups of the given rows grouped by parameter value.
+        """
+        pending = {}
+        for row in rows:
+            if not row[self.billing_settings['parameter_column']]:
+                continue
+            lookup = self.build_billing_lookup(row)
+            k = get_billing_request_cache_key(lookup)
+            try:
+                self.cache_get(k, BILLING_REQUESTS_CACHE_NAMESPACE)
+            except BillingRequestLookupError:
+                pass
+            except KeyError:
+                pending.setdefault(str(lookup['asset.params.value']), {})[k] = lookup
+        return pending
+
+    async def retrieve_billing_timeline(self, values):
+        """
+        Return the timelines of approved FF requests and billing requests of the
+        given parameter values grouped by value.
+        """
+        lookup = {
+            'asset.params.id': self.billing_settings['parameter']['name'],
+            'asset.params.value__in': values,
+        }
+        additional_filters, additional_ff_filters = self.get_billing_period_filters()
+
+        ff_requests = [
+            item async for item in self.installation_client.requests.filter(
+                status='approved',
+                **lookup,
+                **additional_ff_filters,
+            ).select(
+                '-activation_key',
+                '-template',
+            ).order_by('-updated')
+        ]
+        if not ff_requests:
+            return {}, {}
+
+        additional_filters['events.created.at__gt'] = min(r['updated'] for r in ff_requests)
+        billing_requests = [
+            item async for item in self.installation_client('subscriptions').requests.filter(
+                **lookup,
+                **additional_filters,
+            ).order_by('events.created.at')
+        ]
+
+        param_name = self.billing_settings['parameter']['name']
+        return (
+            build_requests_timeline(ff_requests, param_name),
+            build_requests_timeline(billing_requests, param_name),
         )
 
     async def extract_row_from_billing(self, request, output_columns, item_id):
@@ -108,20 +245,20 @@ class LookupBillingRequestTransformationMixin:
                     row[col_name] += f'{SEPARATOR}{item_value}' if row[col_name] else item_value
 
     async def get_billing_request(self, lookup):
-        k = 'billing-'
-        for key, value in lookup.items():
-            k = k + f'{key}-{value}'
-        try:
-            return self.cache_get(k)
-        except KeyError:
-            pass
-
-        result = await self.retrieve_billing_requests(lookup)
-
-        await self.acache_put(k, result)
-        return result
+        k = get_billing_request_cache_key(lookup)
+        return await self.acache_get_or_compute(
+            k,
+            self.retrieve_billing_requests,
+            lookup,
+            namespace=BILLING_REQUESTS_CACHE_NAMESPACE,
+            negative_errors=(BillingRequestLookupError,),
+        )
 
-    async def retrieve_billing_requests(self, lookup):
+    def get_billing_period_filters(self):
+        """
+        Return the filters limiting the billing and the FF requests to the
+        batch period.
+        """
         batch_context = self.transformation_request['batch']['context']
         period_end = batch_context.get('period', {}).get('end')
         additional_filters = {}
@@ -129,6 +266,10 @@ class LookupBillingRequestTransformationMixin:
         if period_end:
             additional_filters['events.created.at__lt'] = period_end
             additional_ff_filters['updated__lt'] = period_end
+        return additional_filters, additional_ff_filters
+
+    async def retrieve_billing_requests(self, lookup):
+        additional_filters, additional_ff_filters = self.get_billing_period_filters()
 
         # get latest approved FF request for given lookup
         ff_req = await self.installation_client.requests.filter(
@@ -140,9 +281,7 @@ class LookupBillingRequestTransformationMixin:
             '-template',
         ).order_by('-updated').first()
         if not ff_req:
-            if self.billing_settings.get('action_if_not_found') == 'fail':
-                raise BillingRequestLookupError(f'No result found for the filter {lookup}')
-            return
+            return self.billing_request_not_found(lookup)
 
         # get first billing request after FF request
         additional_filters['events.created.at__gt'] = ff_req['updated']
@@ -151,29 +290,46 @@ class LookupBillingRequestTransformationMixin:
             **additional_filters,
         ).order_by('events.created.at').first()
         if not billing_request:
-            if self.billing_settings.get('action_if_not_found') == 'fail':
-                raise BillingRequestLookupError(f'No result found for the filter {lookup}')
-            return
+            return self.billing_request_not_found(lookup)
 
         # check that there are no approved request between
+        if await self.has_approved_requests_between(ff_req, billing_request):
+            return self.billing_request_not_found(lookup)
+
+        return self.combine_billing_request(ff_req, billing_request)
+
+    async def has_approved_requests_between(self, ff_req, billing_request):
+        """
+        Check whether more than one approved request, of any asset, was updated
+        between the FF request and the billing request creation.
+        """
+        _, additional_ff_filters = self.get_billing_period_filters()
         additional_ff_filters['updated__gt'] = ff_req['updated']
         additional_ff_filters['updated__lt'] = billing_request['events']['created']['at']
         ff_req_count = await self.installation_client.requests.filter(
             status='approved',
             **additional_ff_filters,
         ).count()
-        if ff_req_count > 1:
-            if self.billing_settings.get('action_if_not_found') == 'fail':
-                raise BillingRequestLookupError(f'No result found for the filter {lookup}')
-            return
+        return ff_req_count > 1
+
+    def billing_request_not_found(self, lookup):
+        if self.billing_settings.get('action_if_not_found') == 'fail':
+            raise BillingRequestLookupError(f'No result found for the filter {lookup}')
 
-        billing_request['asset']['params'] = ff_req['asset']['params']
-        billing_request['asset']['items'] = ff_req['asset']['items']
-        return billing_request
+    @staticmethod
+    def combine_billing_request(ff_req, billing_request):
+        return {
+            **billing_request,
+            'asset': {
+                **billing_request['asset'],
+                'params': ff_req['asset']['params'],
+                'items': ff_req['asset']['items'],
+            },
+        }
 
     @property
     def billing_settings(self):
-        return self.transformation_request['transformation']['settings']
+        return self.plan.settings
 
 
 class LookupBillingRequestWebAppMixin:
@@ -3,6 +3,9 @@
 # Copyright (c) 2023, CloudBlue LLC
 # All rights reserved.
 #
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
 from connect_transformations.utils import (
     build_error_response,
     does_not_contain_required_keys,
@@ -117,3 +120,81 @@ def validate_lookup_billing_request(data):  # noqa: CCR001
     return {
         'overview': overview,
     }
+
+
+def get_billing_request_cache_key(lookup):
+    k = 'billing-'
+    for key, value in lookup.items():
+        k = k + f'{key}-{value}'
+    return k
+
+
+def request_matches_lookup(request, lookup):
+    """
+    Check in memory the same conditions the `lookup` filter checks on the API.
+    """
+    asset = request['asset']
+    for key in ('asset.id', 'asset.external_id'):
+        if key in lookup and str(asset.get(key.split('.')[-1])) != str(lookup[key]):
+            return False
+    return any(
+        lookup['asset.params.id'] in (param.get('id'), param.get('name'))
+        and str(param.get('value')) == str(lookup['asset.params.value'])
+        for param in asset.get('params', [])
+    )
+
+
+def build_requests_timeline(requests, param_name):
+    """
+    Group the given requests by the value of the `param_name` asset parameter,
+    keeping the order in which they are given.
+    """
+    timeline = defaultdict(list)
+    for request in requests:
+        values = {
+            str(param.get('value')) for param in request['asset'].get('params', [])
+            if param_name in (param.get('id'), param.get('name'))
+        }
+        for value in values:
+            timeline[value].append(request)
+    return timeline
+
+
+def find_billing_request_in_timeline(lookup, ff_timeline, billing_timeline):
+    """
+    Apply the first `retrieve_billing_requests` selection rules to the
+    requests already fetched for the lookup parameter value:
+
+    * the latest approved FF request,
+    * the first billing request created after it.
+
+    Return the FF request and the billing request, None for the ones not found.
+    The rule on the approved requests in between is checked by the caller.
+    """
+    value = str(lookup['asset.params.value'])
+    ff_requests = [r for r in ff_timeline.get(value, []) if request_matches_lookup(r, lookup)]
+    if not ff_requests:
+        return None, None
+    ff_req = max(ff_requests, key=lambda r: r['updated'])
+
+    billing_request = next(
+        (
+            r for r in billing_timeline.get(value, [])
+            if r['events']['created']['at'] > ff_req['updated']
+            and request_matches_lookup(r, lookup)
+        ),
+        None,
+    )
+    return ff_req, billing_request
+
+
+def count_updated_between(updated_values, ff_req, billing_request):
+    """
+    Count the sorted update dates after the FF request update and before the
+    billing request creation.
+    """
+    return max(
+        0,
+        bisect_left(updated_values, billing_request['events']['created']['at'])
+        - bisect_right(updated_values, ff_req['updated']),
+    )
@@ -3,6 +3,7 @@
 # Copyright (c) 2023, CloudBlue LLC
 # All rights reserved.
 #
+from collections import defaultdict
 from typing import Dict
 
 from connect.client import AsyncConnectClient
@@ -18,10 +19,16 @@ from connect_transformations.lookup_ff_request.utils import (
     FF_REQ_COMMON_FILTERS,
     FF_REQ_SELECT,
     filter_requests_with_changes,
+    get_ff_request_index_key,
+    get_stream_product_ids,
+    iterate_requests,
     validate_lookup_ff_request,
 )
 from connect_transformations.models import Error, ValidationResult
-from connect_transformations.utils import deep_itemgetter, is_input_column_nullable
+from connect_transformations.utils import deep_itemgetter
+
+
+FF_REQUESTS_CACHE_NAMESPACE = 'ff_requests'
 
 
 class LookupFFRequestTransformationMixin:
@@ -42,10 +49,7 @@ class LookupFFRequestTransformationMixin:
         value = row[self.settings['parameter_column']]
         item_id = row.get(self.settings['item_column'])
 
-        if is_input_column_nullable(
-            self.transformation_request['transformation']['columns']['input'],
-            self.settings['parameter_column'],
-        ) and not value:
+        if self.plan.is_nullable(self.settings['parameter_column']) and not value:
             return RowTransformationResponse.skip()
 
         lookup = {}
@@ -120,30 +124,77 @@ class LookupFFRequestTransformationMixin:
         k = ''
         for key, value in lookup.items():
             k = k + f'{key}-{value}'
-        try:
-            return self.cache_get(k)
-        except KeyError:
-            pass
-
-        result = await self.retrieve_ff_requests(lookup)
-
-        await self.acache_put(k, result)
-        return result
+        return await self.acache_get_or_compute(
+            k,
+            self.retrieve_ff_requests,
+            lookup,
+            namespace=FF_REQUESTS_CACHE_NAMESPACE,
+            negative_errors=(FFRequestLookupError,),
+        )
 
-    async def retrieve_ff_requests(self, lookup):
+    def get_ff_period_filters(self):
         batch_context = self.transformation_request['batch']['context']
         period_end = batch_context.get('period', {}).get('end')
         additional_filters = {}
         if period_end:
             additional_filters['updated__lt'] = period_end
-
-        ff_reqs = self.installation_client.requests.filter(
+        return additional_filters
+
+    async def get_ff_requests_index(self):
+        if not hasattr(self, 'ff_requests_index'):
+            self.ff_requests_index = await self.acoalesce(
+                'ff_requests_index',
+                self.load_ff_requests_index,
+                namespace=FF_REQUESTS_CACHE_NAMESPACE,
+            )
+        return self.ff_requests_index
+
+    async def load_ff_requests_index(self):
+        """
+        Stream once all the approved FF requests of the stream products up to
+        the batch period end and index them by the value of the lookup asset
+        parameter (and asset ID or external ID if the lookup uses it).
+        """
+        param_name = self.settings['parameter']['name']
+        filters = {
             **FF_REQ_COMMON_FILTERS,
-            **lookup,
-            **additional_filters,
+            'asset.params.name': param_name,
+            **self.get_ff_period_filters(),
+        }
+        product_ids = get_stream_product_ids(self.transformation_request.get('stream', {}))
+        if product_ids:
+            filters['asset.product.id__in'] = product_ids
+
+        asset_type = self.settings.get('asset_type')
+        index = defaultdict(list)
+        async for request in self.installation_client.requests.filter(
+            **filters,
         ).select(
             *FF_REQ_SELECT,
-        ).order_by('-updated')
+        ).order_by('-updated'):
+            for param in request['asset'].get('params', []):
+                if param['name'] != param_name:
+                    continue
+                key = (param_name, str(param.get('value')))
+                if asset_type:
+                    key += (str(request['asset'].get(asset_type)),)
+                index[key].append(request)
+        return index
+
+    async def retrieve_ff_requests(self, lookup):
+        if self.settings.get('prefetch_requests'):
+            index = await self.get_ff_requests_index()
+            ff_reqs = iterate_requests(
+                index.get(get_ff_request_index_key(lookup, self.settings.get('asset_type')), []),
+            )
+        else:
+            ff_reqs = self.installation_client.requests.filter(
+                **FF_REQ_COMMON_FILTERS,
+                **lookup,
+                **self.get_ff_period_filters(),
+            ).select(
+                *FF_REQ_SELECT,
+            ).order_by('-updated')
 
         result = None
 
@@ -165,7 +216,7 @@ class LookupFFRequestTransformationMixin:
 
     @property
     def settings(self):
-        return self.transformation_request['transformation']['settings']
+        return self.plan.settings
 
 
 class LookupFFRequestWebAppMixin:
@@ -30,6 +30,7 @@ class Settings(BaseModel):
     action_if_not_found: Optional[str]
     action_if_multiple: Optional[str]
     output_config: Optional[Dict[str, OutputConfig]]
+    prefetch_requests: Optional[bool]
 
 
 class Configuration(BaseModel):
@@ -116,6 +116,9 @@ def validate_lookup_ff_request(data):  # noqa: CCR001
         + '\n'
     )
 
+    if data['settings'].get('prefetch_requests'):
+        overview += 'Prefetch all approved requests = Yes\n'
+
     total = len(data["columns"]["output"])
     overview += f'And populate {total} column{"s" if total > 1 else ""}'
 
@@ -145,3 +148,23 @@ async def filter_requests_with_changes(requests):
 
     if (not has_non_empty) and first_request:
         yield first_request
+
+
+async def iterate_requests(requests):
+    for request in requests:
+        yield request
+
+
+def get_stream_product_ids(stream):
+    context = stream.get('context') or {}
+    products = context.get('products') or []
+    if context.get('product'):
+        products = [context['product'], *products]
+    return [product['id'] if isinstance(product, dict) else product for product in products]
+
+
+def get_ff_request_index_key(lookup, asset_type=None):
+    key = (lookup['asset.params.name'], str(lookup['asset.params.value']))
+    if asset_type:
+        key += (str(lookup[f'asset.{asset_type}']),)
+    return key
@@ -9,6 +9,7 @@ from connect.client import ClientError
 from connect.eaas.core.decorators import router, transformation
 from connect.eaas.core.responses import RowTransformationResponse
 
+from connect_transformations.cache import NegativeCacheEntry
 from connect_transformations.lookup_product_items.exceptions import ProductLookupError
 from connect_transformations.lookup_product_items.models import Configuration
 from connect_transformations.lookup_product_items.utils import (
@@ -18,7 +19,11 @@ from connect_transformations.lookup_product_items.utils import (
     validate_lookup_product_item,
 )
 from connect_transformations.models import Error, ValidationResult
-from connect_transformations.utils import is_input_column_nullable
+
+
+PRODUCTS_CACHE_NAMESPACE = 'products'
+PRODUCT_ITEMS_CACHE_NAMESPACE = 'product_items'
+PRODUCT_ITEMS_CATALOGUES_CACHE_NAMESPACE = 'product_items_catalogues'
 
 
 class LookupProductItemsTransformationMixin:
@@ -34,7 +39,7 @@ class LookupProductItemsTransformationMixin:
             self,
             row: Dict,
     ):
-        trfn_settings = self.transformation_request['transformation']['settings']
+        trfn_settings = self.plan.settings
         product_id, from_column, leave_empty = extract_settings(trfn_settings, row)
 
         if self._should_skip_row(trfn_settings, from_column, row):
@@ -55,27 +60,23 @@ class LookupProductItemsTransformationMixin:
 
     def _should_skip_row(self, trfn_settings, from_column, row):
         return (
-            is_input_column_nullable(
-                self.transformation_request['transformation']['columns']['input'],
-                from_column,
-            )
+            self.plan.is_nullable(from_column)
             and not row[trfn_settings['from']]
         )
 
     async def retrieve_product(self, product_id, leave_empty):
         try:
-            return self.cache_get(product_id)
-        except KeyError:
-            pass
-        try:
-            product = await self.installation_client.products[product_id].get()
-            await self.acache_put(product_id, product)
-            return product
+            return await self.acache_get_or_compute(
+                product_id, self.fetch_product, product_id, namespace=PRODUCTS_CACHE_NAMESPACE,
+            )
         except Exception as e:
             if leave_empty:
                 return
             raise ProductLookupError(f'Error retrieving the product {product_id}: {str(e)}')
 
+    async def fetch_product(self, product_id):
+        return await self.installation_client.products[product_id].get()
+
     async def get_product_item_by_filter(self, product, lookup_value):
         filter_expression = f"eq(mpn,{lookup_value})"
         count = await self.installation_client.products[product['id']].items.filter(
@@ -93,35 +94,99 @@ class LookupProductItemsTransformationMixin:
     async def retrieve_product_item(
             self, product, lookup_type, lookup_value, leave_empty,
     ):
-        cache_key = f'{product["id"]}-{lookup_type}-{lookup_value}'
-        try:
-            return self.cache_get(cache_key)
-        except KeyError:
-            pass
-
         if lookup_type not in PRODUCT_ITEM_LOOKUP:
             raise ProductLookupError('Unknown lookup type')
 
-        product_item = None
-        if lookup_type == 'id':
-            try:
-                product_item = await self.installation_client.products[
-                    product['id']
-                ].items[lookup_value].get()
-            except ClientError:
-                pass
-        else:
-            product_item = await self.get_product_item_by_filter(product, lookup_value)
+        cache_key = f'{product["id"]}-{lookup_type}-{lookup_value}'
+        # fetch_product_item decides itself whether its result can be cached.
+        return await self.acache_get_or_compute(
+            cache_key,
+            self.fetch_product_item,
+            product,
+            lookup_type,
+            lookup_value,
+            leave_empty,
+            cache_key,
+            namespace=PRODUCT_ITEMS_CACHE_NAMESPACE,
+            store=False,
+        )
+
+    async def fetch_product_item(self, product, lookup_type, lookup_value, leave_empty, cache_key):
+        try:
+            product_item, cacheable = await self.find_product_item(
+                product, lookup_type, lookup_value,
+            )
+        except ProductLookupError as e:
+            await self.acache_put(cache_key, NegativeCacheEntry(e), PRODUCT_ITEMS_CACHE_NAMESPACE)
+            raise
 
         if product_item is None:
-            if leave_empty:
-                return
-            raise ProductLookupError('Product not found')
+            error = None if leave_empty else ProductLookupError('Product not found')
+            if cacheable:
+                await self.acache_put(
+                    cache_key,
+                    NegativeCacheEntry(error) if error else None,
+                    PRODUCT_ITEMS_CACHE_NAMESPACE,
+                )
+            if error:
+                raise error
+            return
 
         product_item['product'] = product
-        await self.acache_put(cache_key, product_item)
+        await self.acache_put(cache_key, product_item, PRODUCT_ITEMS_CACHE_NAMESPACE)
         return product_item
 
+    async def find_product_item(self, product, lookup_type, lookup_value):
+        """
+        Return the product item (or None if it doesn't exist) and whether
+        the result is stable enough to be cached.
+        """
+        if self.plan.settings.get('prefetch_items'):
+            catalogue = await self.get_product_items_catalogue(product['id'])
+            if lookup_type == 'mpn' and lookup_value in catalogue['duplicated_mpns']:
+                raise ProductLookupError(f'Multiple results found for the filter: {lookup_value}')
+            product_item = catalogue[lookup_type].get(lookup_value)
+            return (dict(product_item) if product_item else None), True
+
+        if lookup_type != 'id':
+            return await self.get_product_item_by_filter(product, lookup_value), True
+
+        try:
+            return await self.installation_client.products[
+                product['id']
+            ].items[lookup_value].get(), True
+        except ClientError as e:
+            # Only a missing item is a stable result worth caching.
+            return None, e.status_code == 404
+
+    async def get_product_items_catalogue(self, product_id):
+        """
+        Return the catalogue of the product, kept on the instance rather than in
+        the size bounded lookup cache, so a large product is paged only once.
+        """
+        if not hasattr(self, 'product_items_catalogues'):
+            self.product_items_catalogues = {}
+        if product_id not in self.product_items_catalogues:
+            self.product_items_catalogues[product_id] = await self.acoalesce(
+                product_id,
+                self.fetch_product_items_catalogue,
+                product_id,
+                namespace=PRODUCT_ITEMS_CATALOGUES_CACHE_NAMESPACE,
+            )
+        return self.product_items_catalogues[product_id]
+
+    async def fetch_product_items_catalogue(self, product_id):
+        """
+        Page all the items of the product once and index them by ID and MPN.
+        """
+        catalogue = {'id': {}, 'mpn': {}, 'duplicated_mpns': set()}
+        async for item in self.installation_client.products[product_id].items.all():
+            catalogue['id'][item['id']] = item
+            if item.get('mpn') in catalogue['mpn']:
+                catalogue['duplicated_mpns'].add(item['mpn'])
+            catalogue['mpn'][item.get('mpn')] = item
+        return catalogue
+
 
 class LookupProductItemsWebAppMixin:
     @router.post(
@@ -13,6 +13,7 @@ class Settings(BaseModel):
     prefix: Optional[str]
     action_if_not_found: Optional[str]
     product_lookup_mode: Optional[str]
+    prefetch_items: Optional[bool]
 
     class Config:
         fields = {
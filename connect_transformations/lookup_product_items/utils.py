@@ -34,6 +34,8 @@ def _build_overview(settings):
         overview += 'With row-specific product IDs \n'
     overview += f'Prefix = "{settings["prefix"]}"\n'
     overview += f'If not found = {settings["action_if_not_found"].replace("_", " ").title()}\n'
+    if settings.get('prefetch_items'):
+        overview += 'Prefetch all product items = Yes\n'
     return overview
 
 
@@ -11,15 +11,28 @@ from connect.eaas.core.inject.asynchronous import get_installation_client
 from connect.eaas.core.responses import RowTransformationResponse
 from fastapi import Depends
 
-from connect_transformations.constants import MAX_API_CALL_CONNECTION_ERROR_RETRIES, SEPARATOR
+from connect_transformations.cache import NegativeCacheEntry
+from connect_transformations.constants import (
+    BULK_LOOKUP_CHUNK_SIZE,
+    MAX_API_CALL_CONNECTION_ERROR_RETRIES,
+    SEPARATOR,
+)
 from connect_transformations.lookup_subscription.exceptions import SubscriptionLookupError
 from connect_transformations.lookup_subscription.models import Configuration, SubscriptionParameter
-from connect_transformations.lookup_subscription.utils import validate_lookup_subscription
+from connect_transformations.lookup_subscription.utils import (
+    get_subscription_cache_key,
+    validate_lookup_subscription,
+)
 from connect_transformations.models import Error, ValidationResult
-from connect_transformations.utils import deep_itemgetter, is_input_column_nullable
+from connect_transformations.utils import deep_itemgetter
 
 
+SUBSCRIPTIONS_CACHE_NAMESPACE = 'subscriptions'
 SUBSCRIPTIONS_ACTIVE_STATUSES = ('active', 'terminating')
+SUBSCRIPTIONS_LOOKUP_STATUSES = (
+    'active', 'terminating', 'suspended',
+    'terminated', 'terminated',
+)
 
 
 class LookupSubscriptionTransformationMixin:
@@ -36,29 +49,16 @@ class LookupSubscriptionTransformationMixin:
         self,
         row: Dict,
     ):
-        lookup_type = self.settings['lookup_type']
         from_column = self.settings['from']
         prefix = self.settings.get('prefix', '')
-        parameter = self.settings.get('parameter', {}).get('name', None)
         output_columns = self.settings.get('output_config')
         value = row[from_column]
 
-        if is_input_column_nullable(
-            self.transformation_request['transformation']['columns']['input'],
-            from_column,
-        ) and not value:
+        if self.plan.is_nullable(from_column) and not value:
             return RowTransformationResponse.skip()
 
-        if lookup_type == 'params__value':
-            lookup = {
-                'params.name': parameter,
-                'params.value': value,
-            }
-        else:
-            lookup = {lookup_type: value}
-
         try:
-            subscription = await self.get_subscription(lookup)
+            subscription = await self.get_subscription(self.build_subscription_lookup(value))
         except Exception as e:
             return RowTransformationResponse.fail(output=str(e))
 
@@ -83,6 +83,99 @@ class LookupSubscriptionTransformationMixin:
             self.extract_row_from_subscription(subscription, output_columns),
         )
 
+    async def lookup_subscription_rows(
+        self,
+        rows: List[Dict],
+    ):
+        await self.prefetch_subscriptions(rows)
+        return [await self.lookup_subscription(row) for row in rows]
+
+    def build_subscription_lookup(self, value):
+        if self.settings['lookup_type'] == 'params__value':
+            return {
+                'params.name': self.settings.get('parameter', {}).get('name', None),
+                'params.value': value,
+            }
+        return {self.settings['lookup_type']: value}
+
+    async def prefetch_subscriptions(self, rows):
+        """
+        Resolve the lookup values of all the given rows with bulk `in()` queries
+        and put the results into the cache, so `lookup_subscription` answers
+        each row without calling the API.
+        """
+        from_column = self.settings['from']
+        pending = {}
+        for row in rows:
+            value = row[from_column]
+            if not value or str(value) in pending:
+                continue
+            lookup = self.build_subscription_lookup(value)
+            try:
+                self.cache_get(
+                    get_subscription_cache_key(lookup),
+                    SUBSCRIPTIONS_CACHE_NAMESPACE,
+                )
+            except SubscriptionLookupError:
+                pass
+            except KeyError:
+                pending[str(value)] = lookup
+
+        values = list(pending.keys())
+        for start in range(0, len(values), BULK_LOOKUP_CHUNK_SIZE):
+            chunk = values[start:start + BULK_LOOKUP_CHUNK_SIZE]
+            found = await self.retrieve_subscriptions_by_values(chunk)
+            for value in chunk:
+                lookup = pending[value]
+                try:
+                    result = self.select_subscription(lookup, found.get(value, []))
+                except SubscriptionLookupError as e:
+                    result = NegativeCacheEntry(e)
+                await self.acache_put(
+                    get_subscription_cache_key(lookup),
+                    result,
+                    SUBSCRIPTIONS_CACHE_NAMESPACE,
+                )
+
+    async def retrieve_subscriptions_by_values(self, values):
+        """
+        Return the subscriptions matching any of the given values grouped
+        by value, keeping the `-events.created.at` ordering in each group.
+        """
+        lookup_type = self.settings['lookup_type']
+        if lookup_type == 'params__value':
+            parameter = self.settings.get('parameter', {}).get('name', None)
+            lookup = {'params.name': parameter, 'params.value__in': values}
+        else:
+            lookup = {f'{lookup_type}__in': values}
+
+        for attempts_left in range(MAX_API_CALL_CONNECTION_ERROR_RETRIES, -1, -1):
+            try:
+                subscriptions = [
+                    item async for item in self.installation_client('subscriptions').assets.filter(
+                        status__in=SUBSCRIPTIONS_LOOKUP_STATUSES,
+                    ).filter(**lookup).order_by('-events.created.at')
+                ]
+                break
+            except ClientError:
+                if not attempts_left:
+                    raise
+                continue
+
+        requested = set(values)
+        result = {}
+        for item in subscriptions:
+            if lookup_type == 'params__value':
+                matched = {
+                    str(param['value']) for param in item.get('params', [])
+                    if param['name'] == parameter
+                }
+            else:
+                matched = {str(item.get(lookup_type))}
+            for value in matched & requested:
+                result.setdefault(value, []).append(item)
+        return result
+
     def extract_row_from_subscription(self, subscription, output_columns):
         row = {}
 
@@ -125,37 +218,34 @@ class LookupSubscriptionTransformationMixin:
                 row[col_name] += f'{SEPARATOR}{item_value}' if row[col_name] else item_value
 
     async def get_subscription(self, lookup):
-        k = ''
-        for key, value in lookup.items():
-            k = k + f'{key}-{value}'
-        try:
-            return self.cache_get(k)
-        except KeyError:
-            pass
+        k = get_subscription_cache_key(lookup)
+        return await self.acache_get_or_compute(
+            k,
+            self.fetch_subscription,
+            lookup,
+            namespace=SUBSCRIPTIONS_CACHE_NAMESPACE,
+            negative_errors=(SubscriptionLookupError,),
+        )
 
+    async def fetch_subscription(self, lookup):
         for attempts_left in range(MAX_API_CALL_CONNECTION_ERROR_RETRIES, -1, -1):
             try:
-                result = await self.retrieve_subscription(lookup)
-                break
+                return await self.retrieve_subscription(lookup)
             except ClientError:
                 if not attempts_left:
                     raise
-                continue
-
-        await self.acache_put(k, result)
-        return result
 
     async def retrieve_subscription(self, lookup):
         subscriptions = self.installation_client('subscriptions').assets.filter(
-            status__in=(
-                'active', 'terminating', 'suspended',
-                'terminated', 'terminated',
-            ),
+            status__in=SUBSCRIPTIONS_LOOKUP_STATUSES,
         ).filter(**lookup).order_by('-events.created.at')
 
+        return self.select_subscription(lookup, [item async for item in subscriptions])
+
+    def select_subscription(self, lookup, subscriptions):
         result = None
 
-        async for item in subscriptions:
+        for item in subscriptions:
             if result is None:
                 result = item
             elif self.settings.get('action_if_multiple') == 'leave_empty':
@@ -181,7 +271,7 @@ class LookupSubscriptionTransformationMixin:
 
     @property
     def settings(self):
-        return self.transformation_request['transformation']['settings']
+        return self.plan.settings
 
 
 class LookupSubscriptionWebAppMixin:
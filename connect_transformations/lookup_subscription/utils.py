@@ -104,3 +104,10 @@ def validate_lookup_subscription(data):
     return {
         'overview': overview,
     }
+
+
+def get_subscription_cache_key(lookup):
+    k = ''
+    for key, value in lookup.items():
+        k = k + f'{key}-{value}'
+    return k
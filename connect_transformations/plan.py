@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2023, CloudBlue LLC
+# All rights reserved.
+#
+from connect_transformations.exceptions import BaseTransformationException
+
+
+class ExecutionPlan:
+    """
+    Everything the row handlers need from the transformation request, computed
+    once per request: the settings, the input and output columns indexed by
+    name and id and the nullable flags of the input columns. Settings that
+    accept both a single item and a list of them are normalized to lists.
+    """
+
+    def __init__(self, transformation):
+        self.transformation = transformation
+        self.settings = transformation['settings']
+        self.settings_list = (
+            self.settings if isinstance(self.settings, list) else [self.settings]
+        )
+        map_by = self.settings.get('map_by') if isinstance(self.settings, dict) else None
+        self.map_by = map_by if isinstance(map_by, list) or map_by is None else [map_by]
+
+        columns = transformation.get('columns') or {}
+        self.input_columns = columns.get('input') or []
+        self.output_columns = columns.get('output') or []
+        self.input_columns_by_name = {column['name']: column for column in self.input_columns}
+        self.input_columns_by_id = {
+            column['id']: column for column in self.input_columns if 'id' in column
+        }
+        self.output_columns_by_name = {
+            column['name']: column for column in self.output_columns if 'name' in column
+        }
+        self.nullable_columns = {
+            column['name']: column.get('nullable') for column in self.input_columns
+        }
+
+    def is_nullable(self, column):
+        try:
+            return self.nullable_columns[column]
+        except KeyError:
+            raise BaseTransformationException(f'The column {column} does not exists.')
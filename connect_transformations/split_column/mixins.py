@@ -4,13 +4,15 @@
 # All rights reserved.
 #
 import re
-from functools import cached_property
-from typing import Dict
+from operator import itemgetter
+from typing import Dict, List
 
 from connect.eaas.core.decorators import router, transformation
+from connect.eaas.core.enums import ResultType
 from connect.eaas.core.responses import RowTransformationResponse
 from fastapi.responses import JSONResponse
 
+from connect_transformations.casting import cast_column, get_caster
 from connect_transformations.models import Error, ValidationResult
 from connect_transformations.split_column.models import (
     CapturingGroup,
@@ -18,7 +20,6 @@ from connect_transformations.split_column.models import (
     Configuration,
 )
 from connect_transformations.split_column.utils import merge_groups, validate_split_column
-from connect_transformations.utils import cast_value_to_type
 
 
 class SplitColumnTransformationMixin:
@@ -35,35 +36,90 @@ class SplitColumnTransformationMixin:
         self,
         row,
     ):
-        trfn_settings = self.transformation_request['transformation']['settings']
-        row_value = row[trfn_settings['from']]
-        pattern = trfn_settings['regex']['pattern']
-        groups = trfn_settings['regex']['groups']
-
-        result = {}
-        match = re.match(pattern, str(row_value)) if row_value else None
-        pattern_groups = match.groups() if match else {}
-
-        for key, group in groups.items():
-            index = int(key) - 1
-            column_name = group['name']
-            column = self.output_columns[column_name]
-
-            column_type = column.get('type', 'string')
-            value = pattern_groups[index] if len(pattern_groups) > index else None
-            parameters = {'value': value, 'type': column_type}
-            precision = column.get('constraints', {}).get('precision')
-            if precision:
-                parameters['additional_parameters'] = {'precision': precision}
-            cast_value = cast_value_to_type(**parameters)
-            result[column_name] = cast_value
-
-        return RowTransformationResponse.done(result)
-
-    @cached_property
-    def output_columns(self):
-        out_columns = self.transformation_request['transformation']['columns']['output']
-        return {c['name']: c for c in out_columns}
+        self.precompile_split_column()
+        return RowTransformationResponse.done(self.extract_split_column_groups(row))
+
+    def split_column_rows(
+        self,
+        rows: List[Dict],
+    ):
+        """
+        Match all the rows first and then fill the output column by column.
+        Groups are strings already, so only the other types are cast, once
+        per column.
+        """
+        self.precompile_split_column()
+        match = self.split_column_pattern.match
+        from_column = self.split_column_from
+        no_groups = self.split_column_no_groups
+        groups = []
+        for row in rows:
+            row_value = row[from_column]
+            row_match = match(str(row_value)) if row_value else None
+            groups.append(row_match.groups() if row_match else no_groups)
+
+        names = []
+        columns = []
+        for index, column_name, column_type, precision, _ in self.split_column_extractors:
+            if index < len(no_groups):
+                values = list(map(itemgetter(index), groups))
+            else:
+                values = [None] * len(rows)
+            if column_type != 'string':
+                values = cast_column(values, column_type, precision)
+            names.append(column_name)
+            columns.append(values)
+
+        if not columns:
+            return [RowTransformationResponse.done({}) for _ in rows]
+        # Building the responses dominates the batch, so the constructor is
+        # called directly instead of through `done`.
+        return [
+            RowTransformationResponse(ResultType.SUCCESS, dict(zip(names, values)))
+            for values in zip(*columns)
+        ]
+
+    def match_split_column(self, row):
+        row_value = row[self.split_column_from]
+        match = self.split_column_pattern.match(str(row_value)) if row_value else None
+        return match.groups() if match else ()
+
+    def extract_split_column_groups(self, row):
+        pattern_groups = self.match_split_column(row)
+        groups_count = len(pattern_groups)
+
+        return {
+            column_name: cast(pattern_groups[index]) if index < groups_count else None
+            for index, column_name, _, _, cast in self.split_column_extractors
+        }
+
+    def precompile_split_column(self):
+        if hasattr(self, 'split_column_extractors'):
+            return
+
+        with self.lock('split_column'):
+            if hasattr(self, 'split_column_extractors'):
+                return
+
+            trfn_settings = self.plan.settings
+            extractors = []
+            for key, group in trfn_settings['regex']['groups'].items():
+                column_name = group['name']
+                column = self.plan.output_columns_by_name[column_name]
+                column_type = column.get('type', 'string')
+                precision = column.get('constraints', {}).get('precision')
+                extractors.append((
+                    int(key) - 1,
+                    column_name,
+                    column_type,
+                    precision,
+                    get_caster(column_type, precision),
+                ))
+
+            self.split_column_from = trfn_settings['from']
+            self.split_column_pattern = re.compile(trfn_settings['regex']['pattern'])
+            self.split_column_no_groups = (None,) * self.split_column_pattern.groups
+            self.split_column_extractors = extractors
 
 
 class SplitColumnWebAppMixin:
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2023, CloudBlue LLC
+# All rights reserved.
+#
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing
+
+
+# The store keeps data of the installations (like their AirTable tables), so
+# it lives in a directory and a file only readable by the current user.
+DEFAULT_STORAGE_PATH = os.path.join(
+    tempfile.gettempdir(),
+    'connect-transformations',
+    'storage.sqlite3',
+)
+STORAGE_DIR_MODE = 0o700
+STORAGE_FILE_MODE = 0o600
+
+
+class PersistentStore:
+    """
+    Key-value store persisted in a SQLite database, used to keep across runs
+    data that does not change once loaded (like historical currency rates).
+    Values are stored as JSON. Storage errors are logged and the store then
+    behaves as if it was empty, so it never makes a transformation fail.
+    """
+
+    def __init__(self, path, logger=None):
+        self.path = path
+        self.logger = logger
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if not self._initialized:
+            # Create the file with restrictive permissions before SQLite does,
+            # its journal files get the same permissions.
+            os.close(os.open(self.path, os.O_RDWR | os.O_CREAT, STORAGE_FILE_MODE))
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            with self._lock, connection:
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS entries ('
+                    'namespace TEXT NOT NULL, '
+                    'key TEXT NOT NULL, '
+                    'value TEXT NOT NULL, '
+                    'updated_at REAL NOT NULL, '
+                    'PRIMARY KEY (namespace, key))',
+                )
+                self._initialized = True
+        return connection
+
+    def get(self, namespace, key, max_age=None):
+        """
+        Return the value stored for the key, or None if there is none or it
+        was stored more than `max_age` seconds ago.
+        """
+        try:
+            with closing(self._connect()) as connection:
+                row = connection.execute(
+                    'SELECT value, updated_at FROM entries WHERE namespace = ? AND key = ?',
+                    (namespace, key),
+                ).fetchone()
+        except (sqlite3.Error, OSError) as e:
+            self._log_error(e)
+            return None
+        if not row or (max_age is not None and time.time() - row[1] >= max_age):
+            return None
+        return json.loads(row[0])
+
+    def put(self, namespace, key, value):
+        try:
+            with closing(self._connect()) as connection, connection:
+                connection.execute(
+                    'INSERT OR REPLACE INTO entries (namespace, key, value, updated_at) '
+                    'VALUES (?, ?, ?, ?)',
+                    (namespace, key, json.dumps(value), time.time()),
+                )
+        except (sqlite3.Error, OSError) as e:
+            self._log_error(e)
+
+    def _log_error(self, error):
+        if self.logger:
+            self.logger.warning(f'Cannot use the persistent store {self.path}: {error}')
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_persistent_store(config, logger=None):
+    """
+    Return the process-wide store for the STORAGE_PATH configuration variable.
+    The directory of the default path is created private to the current user.
+    """
+    path = (config.get('STORAGE_PATH') if isinstance(config, dict) else None)
+    if not path:
+        path = DEFAULT_STORAGE_PATH
+        try:
+            os.makedirs(os.path.dirname(path), mode=STORAGE_DIR_MODE, exist_ok=True)
+        except OSError:
+            # The store logs the error when it is used.
+            pass
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = PersistentStore(path, logger=logger)
+        return _stores[path]
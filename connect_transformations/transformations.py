@@ -4,17 +4,26 @@
 # All rights reserved.
 #
 import asyncio
-import threading
+import inspect
 
-from cachetools import LRUCache
 from connect.eaas.core.extension import TransformationsApplicationBase
 
 from connect_transformations.airtable_lookup.mixins import AirTableLookupTransformationMixin
 from connect_transformations.attachment_lookup.mixins import AttachmentLookupTransformationMixin
+from connect_transformations.cache import (
+    DEFAULT_CACHE_MAX_BYTES,
+    DEFAULT_CACHE_MAX_ENTRIES,
+    DEFAULT_CACHE_NAMESPACE,
+    DEFAULT_CACHE_NEGATIVE_TTL,
+    DEFAULT_CACHE_STATS_INTERVAL,
+    DEFAULT_CACHE_TTL,
+    LookupCache,
+)
 from connect_transformations.copy_columns.mixins import CopyColumnTransformationMixin
 from connect_transformations.currency_conversion.mixins import CurrencyConverterTransformationMixin
 from connect_transformations.filter_row.mixins import FilterRowTransformationMixin
 from connect_transformations.formula.mixins import FormulaTransformationMixin
+from connect_transformations.locks import DEFAULT_LOCK_NAME, LockRegistry
 from connect_transformations.lookup_billing_request.mixins import (
     LookupBillingRequestTransformationMixin,
 )
@@ -24,10 +33,22 @@ from connect_transformations.lookup_product_items.mixins import (
 )
 from connect_transformations.lookup_subscription.mixins import LookupSubscriptionTransformationMixin
 from connect_transformations.manual_transformation.mixins import ManualTransformationMixin
+from connect_transformations.plan import ExecutionPlan
 from connect_transformations.split_column.mixins import SplitColumnTransformationMixin
+from connect_transformations.utils import get_numeric_config
 from connect_transformations.vat_rate.mixins import VATRateForEUCountryTransformationMixin
 
 
+def process_rows_one_by_one(method, rows, rows_styles=None):
+    if rows_styles is None:
+        return [method(row) for row in rows]
+    return [method(row, row_styles=styles) for row, styles in zip(rows, rows_styles)]
+
+
+def accepts_argument(method, name):
+    return name in inspect.signature(method).parameters
+
+
 class StandardTransformationsApplication(
     TransformationsApplicationBase,
     ManualTransformationMixin,
@@ -47,23 +68,104 @@ class StandardTransformationsApplication(
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self._cache = LRUCache(128)
-        self._sync_lock = threading.Lock()
-        self._async_lock = asyncio.Lock()
+        self._cache = LookupCache(
+            max_entries=get_numeric_config(
+                self.config, 'LOOKUP_CACHE_MAX_ENTRIES', DEFAULT_CACHE_MAX_ENTRIES,
+            ),
+            max_bytes=get_numeric_config(
+                self.config, 'LOOKUP_CACHE_MAX_BYTES', DEFAULT_CACHE_MAX_BYTES,
+            ),
+            ttl=get_numeric_config(self.config, 'LOOKUP_CACHE_TTL', DEFAULT_CACHE_TTL),
+            negative_ttl=get_numeric_config(
+                self.config, 'LOOKUP_CACHE_NEGATIVE_TTL', DEFAULT_CACHE_NEGATIVE_TTL,
+            ),
+            logger=self.logger,
+            stats_interval=get_numeric_config(
+                self.config, 'LOOKUP_CACHE_STATS_INTERVAL', DEFAULT_CACHE_STATS_INTERVAL,
+            ),
+        )
+        self._locks = LockRegistry()
+        self._plan = None
+
+    @property
+    def plan(self):
+        """
+        Execution plan of the current transformation request, built on first
+        use and rebuilt only if the request changes.
+        """
+        transformation = self.transformation_request['transformation']
+        plan = self._plan
+        if plan is None or plan.transformation is not transformation:
+            plan = self._plan = ExecutionPlan(transformation)
+        return plan
+
+    async def process_rows(self, method_name, rows, batch=True, rows_styles=None):
+        """
+        Process a chunk of rows with the given transformation and return one
+        RowTransformationResponse per row. Transformations implementing a
+        `<method_name>_rows` variant receive the whole chunk, the others are
+        called row by row. Synchronous transformations run in the default
+        executor, one call per chunk. The styles of the rows, if given, are
+        passed to the transformations accepting them.
+
+        The Connect runner calls the transformations row by row and does not
+        use this method: it is the entry point for a batch runner.
+        """
+        batch_method = getattr(self, f'{method_name}_rows', None) if batch else None
+        if batch_method is not None:
+            args = (batch_method, rows)
+            if rows_styles is not None and accepts_argument(batch_method, 'rows_styles'):
+                args += (rows_styles,)
+        else:
+            method = getattr(self, method_name)
+            if not accepts_argument(method, 'row_styles'):
+                rows_styles = None
+            if asyncio.iscoroutinefunction(method):
+                return [
+                    await response
+                    for response in process_rows_one_by_one(method, rows, rows_styles)
+                ]
+            args = (process_rows_one_by_one, method, rows, rows_styles)
+
+        if asyncio.iscoroutinefunction(args[0]):
+            return await args[0](*args[1:])
+        return await asyncio.get_running_loop().run_in_executor(None, *args)
+
+    def lock(self, name=DEFAULT_LOCK_NAME):
+        """
+        Return the lock of the named resource. Preloads use their own name so
+        a slow download only blocks the rows waiting for the same data.
+        """
+        return self._locks.lock(name)
+
+    def alock(self, name=DEFAULT_LOCK_NAME):
+        return self._locks.alock(name)
+
+    def lock_stats(self):
+        return self._locks.stats()
+
+    def cache_put(self, key, val, namespace=DEFAULT_CACHE_NAMESPACE):
+        self._cache.put(key, val, namespace)
 
-    def lock(self):
-        return self._sync_lock
+    async def acache_put(self, key, val, namespace=DEFAULT_CACHE_NAMESPACE):
+        self._cache.put(key, val, namespace)
 
-    def alock(self):
-        return self._async_lock
+    def cache_get(self, key, namespace=DEFAULT_CACHE_NAMESPACE):
+        return self._cache.get(key, namespace)
 
-    def cache_put(self, key, val):
-        with self.lock():
-            self._cache[key] = val
+    def cache_get_or_compute(
+        self, key, fn, *args, namespace=DEFAULT_CACHE_NAMESPACE, negative_errors=(),
+    ):
+        return self._cache.get_or_compute(
+            key, fn, *args, namespace=namespace, negative_errors=negative_errors,
+        )
 
-    async def acache_put(self, key, val):
-        async with self.alock():
-            self._cache[key] = val
+    async def acache_get_or_compute(
+        self, key, fn, *args, namespace=DEFAULT_CACHE_NAMESPACE, negative_errors=(), store=True,
+    ):
+        return await self._cache.aget_or_compute(
+            key, fn, *args, namespace=namespace, negative_errors=negative_errors, store=store,
+        )
 
-    def cache_get(self, key):
-        return self._cache[key]
+    async def acoalesce(self, key, fn, *args, namespace=DEFAULT_CACHE_NAMESPACE):
+        return await self._cache.coalesce(key, fn, *args, namespace=namespace)
@@ -1,51 +1,21 @@
-from decimal import Decimal
-
-from dateutil.parser import parse as _to_datetime
 from fastapi.responses import JSONResponse
 
-from connect_transformations.exceptions import BaseTransformationException
-
-
-def is_input_column_nullable(input_columns, column):
-    for input_column in input_columns:
-        if input_column['name'] == column:
-            return input_column['nullable']
-    raise BaseTransformationException(f'The column {column} does not exists.')
-
-
-def _to_decimal(value, precision=None):
-    value = value.replace(',', '.') if isinstance(value, str) else value
-    return Decimal(
-        value,
-    ).quantize(
-        Decimal(f'.{"1".zfill(int(precision))}'),
-    ) if precision else Decimal(value)
-
-
-def _to_boolean(value):
-    if isinstance(value, bool):
-        return value
-    value = value.lower() if isinstance(value, str) else value
-    if value in ['true', '1', 'y', 'yes']:
-        return True
-    elif value in ['false', '0', 'n', 'no']:
-        return False
+from connect_transformations.casting import get_caster
 
 
-_cast_mapping = {
-    'string': str,
-    'integer': int,
-    'decimal': _to_decimal,
-    'boolean': _to_boolean,
-    'datetime': _to_datetime,
-}
+def get_numeric_config(config, name, default, cast=int):
+    value = config.get(name) if isinstance(config, dict) else None
+    if value is None or value == '':
+        return default
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return default
 
 
 def cast_value_to_type(value, type, additional_parameters=None):
-    if additional_parameters is None:
-        additional_parameters = {}
-    cast_fn = _cast_mapping[type]
-    return cast_fn(value, **additional_parameters) if value is not None else None
+    precision = (additional_parameters or {}).get('precision')
+    return get_caster(type, precision)(value)
 
 
 def check_mapping(settings, columns, multiple=False):
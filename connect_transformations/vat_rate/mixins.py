@@ -8,7 +8,6 @@ from connect.eaas.core.decorators import router, transformation
 from connect.eaas.core.responses import RowTransformationResponse
 
 from connect_transformations.models import Error, ValidationResult
-from connect_transformations.utils import is_input_column_nullable
 from connect_transformations.vat_rate.exceptions import VATRateError
 from connect_transformations.vat_rate.models import Configuration
 from connect_transformations.vat_rate.utils import validate_vat_rate
@@ -17,12 +16,14 @@ from connect_transformations.vat_rate.utils import validate_vat_rate
 class VATRateForEUCountryTransformationMixin:
 
     def preload_eu_vat_rates(self):
-        with self.lock():
+        if hasattr(self, 'eu_vat_rates'):
+            return
+
+        with self.lock('vat_rates'):
             if hasattr(self, 'eu_vat_rates'):
                 return
 
-            self.eu_vat_rates = {}
-
+            eu_vat_rates = {}
             try:
                 url = 'https://api.apilayer.com/tax_data/rate_list'
                 response = requests.get(
@@ -36,12 +37,14 @@ class VATRateForEUCountryTransformationMixin:
                     if not rate['eu']:
                         continue
                     value = rate['standard_rate']['rate']
-                    self.eu_vat_rates[rate['country_code']] = int(value * 100)
-                    self.eu_vat_rates[rate['country_name']] = int(value * 100)
+                    eu_vat_rates[rate['country_code']] = int(value * 100)
+                    eu_vat_rates[rate['country_name']] = int(value * 100)
             except requests.RequestException as exc:
                 raise VATRateError(
                     f'An error occurred while requesting {url}: {exc}',
                 )
+            finally:
+                self.eu_vat_rates = eu_vat_rates
 
     @transformation(
         name='Get standard VAT rate for EU country',
@@ -58,7 +61,7 @@ class VATRateForEUCountryTransformationMixin:
         self,
         row,
     ):
-        trfn_settings = self.transformation_request['transformation']['settings']
+        trfn_settings = self.plan.settings
         country = row[trfn_settings['from']]
         column_to = trfn_settings['to']
         leave_empty = trfn_settings['action_if_not_found'] == 'leave_empty'
@@ -69,10 +72,7 @@ class VATRateForEUCountryTransformationMixin:
             return RowTransformationResponse.fail(output=str(e))
 
         if (
-            is_input_column_nullable(
-                self.transformation_request['transformation']['columns']['input'],
-                trfn_settings['from'],
-            ) and not country
+            self.plan.is_nullable(trfn_settings['from']) and not country
             or country not in self.eu_vat_rates
             and leave_empty
         ):
@@ -38,3 +38,10 @@ def non_mocked_hosts() -> list:
 def responses():
     with request_responses.RequestsMock() as rsps:
         yield rsps
+
+
+@pytest.fixture(autouse=True)
+def storage_path(tmp_path, monkeypatch):
+    path = str(tmp_path / 'storage.sqlite3')
+    monkeypatch.setattr('connect_transformations.storage.DEFAULT_STORAGE_PATH', path)
+    return path
@@ -3,16 +3,32 @@
 # Copyright (c) 2023, CloudBlue LLC
 # All rights reserved.
 #
+import asyncio
+import threading
+
+import httpx
+import pytest
 from connect.eaas.core.enums import ResultType
-from responses import matchers
 
+from connect_transformations.airtable_lookup.utils import (
+    AirTableIndex,
+    TokenBucket,
+    get_airtable_snapshot_key,
+)
+from connect_transformations.storage import get_persistent_store
 from connect_transformations.transformations import StandardTransformationsApplication
 
 
-def test_airtable_lookup(mocker, responses):
-    responses.add(
-        'GET',
-        'https://api.airtable.com/v0/base_id/table_id',
+def test_airtable_lookup(mocker, httpx_mock):
+    url = 'https://api.airtable.com/v0/base_id/table_id'
+    params = {
+        'fields[]': ['customer_id', 'first name', 'last name'],
+        'pageSize': 100,
+    }
+    httpx_mock.add_response(
+        method='GET',
+        url=httpx.URL(url, params=params),
+        match_headers={'Authorization': 'Bearer token'},
         json={
             'records': [
                 {
@@ -28,13 +44,9 @@ def test_airtable_lookup(mocker, responses):
             'offset': 'second_page_offset',
         },
     )
-
-    params = {'offset': 'second_page_offset'}
-
-    responses.add(
-        'GET',
-        'https://api.airtable.com/v0/base_id/table_id',
-        match=[matchers.query_param_matcher(params)],
+    httpx_mock.add_response(
+        method='GET',
+        url=httpx.URL(url, params={**params, 'offset': 'second_page_offset'}),
         json={
             'records': [
                 {
@@ -88,6 +100,111 @@ def test_airtable_lookup(mocker, responses):
         'Customer last name': 'Last Name',
     }
 
+    response = app.airtable_lookup({'id': '3'})
+    assert response.status == ResultType.SKIP
+    assert app.airtable_data.loaded
+    assert app.airtable_data.data['2'] == {
+        'first name': 'First Name 2',
+        'last name': 'Last Name 2',
+    }
+
+    other_app = StandardTransformationsApplication(m, m, m)
+    other_app.transformation_request = app.transformation_request
+
+    response = other_app.airtable_lookup({'id': '2'})
+    assert response.status == ResultType.SUCCESS
+    assert response.transformed_row == {
+        'Customer first name': 'First Name 2',
+        'Customer last name': 'Last Name 2',
+    }
+    assert len(httpx_mock.get_requests()) == 2
+
+
+def build_snapshot_settings(api_key):
+    return {
+        'api_key': api_key,
+        'base_id': 'base_id',
+        'table_id': 'table_id',
+        'map_by': {'input_column': 'id', 'airtable_column': 'customer_id'},
+        'mapping': [{'from': 'first name', 'to': 'Customer first name'}],
+    }
+
+
+def test_airtable_lookup_snapshot_per_api_key(mocker, httpx_mock):
+    get_persistent_store({}).put(
+        'airtable_snapshots',
+        get_airtable_snapshot_key(build_snapshot_settings('token')),
+        [['1', {'first name': 'Snapshot Name'}]],
+    )
+    httpx_mock.add_response(
+        method='GET',
+        match_headers={'Authorization': 'Bearer other'},
+        json={'records': [{'fields': {'customer_id': '1', 'first name': 'Other Name'}}]},
+    )
+
+    m = mocker.MagicMock()
+    responses = []
+    for api_key in ('token', 'other'):
+        app = StandardTransformationsApplication(m, m, m)
+        app.transformation_request = {
+            'transformation': {
+                'settings': build_snapshot_settings(api_key),
+                'columns': {'input': [{'name': 'id', 'nullable': False}]},
+            },
+        }
+        responses.append(app.airtable_lookup({'id': '1'}))
+
+    assert [response.transformed_row for response in responses] == [
+        {'Customer first name': 'Snapshot Name'},
+        {'Customer first name': 'Other Name'},
+    ]
+    assert len(httpx_mock.get_requests()) == 1
+
+
+def test_airtable_lookup_expired_snapshot(mocker, httpx_mock):
+    store = get_persistent_store({})
+    mocker.patch('connect_transformations.storage.time.time', return_value=0)
+    store.put(
+        'airtable_snapshots',
+        get_airtable_snapshot_key(build_snapshot_settings('token')),
+        [['1', {'first name': 'Old Name'}]],
+    )
+    mocker.patch('connect_transformations.storage.time.time', return_value=3600)
+    httpx_mock.add_response(
+        method='GET',
+        json={'records': [{'fields': {'customer_id': '1', 'first name': 'New Name'}}]},
+    )
+
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.transformation_request = {
+        'transformation': {
+            'settings': {
+                'api_key': 'token',
+                'base_id': 'base_id',
+                'table_id': 'table_id',
+                'map_by': {
+                    'input_column': 'id',
+                    'airtable_column': 'customer_id',
+                },
+                'mapping': [
+                    {
+                        'from': 'first name',
+                        'to': 'Customer first name',
+                    },
+                ],
+            },
+            'columns': {
+                'input': [
+                    {'name': 'id', 'nullable': False},
+                ],
+            },
+        },
+    }
+
+    response = app.airtable_lookup({'id': '1'})
+    assert response.transformed_row == {'Customer first name': 'New Name'}
+
 
 def test_airtable_lookup_skip_nullable(mocker):
     m = mocker.MagicMock()
@@ -155,12 +272,8 @@ def test_airtable_lookup_no_matching_value(mocker):
     assert response.status == ResultType.SKIP
 
 
-def test_airtable_lookup_airtable_api_error(mocker, responses):
-    responses.add(
-        'GET',
-        'https://api.airtable.com/v0/base_id/table_id',
-        status=400,
-    )
+def test_airtable_lookup_airtable_api_error(mocker, httpx_mock):
+    httpx_mock.add_response(method='GET', status_code=400)
 
     m = mocker.MagicMock()
     app = StandardTransformationsApplication(m, m, m)
@@ -191,4 +304,49 @@ def test_airtable_lookup_airtable_api_error(mocker, responses):
 
     response = app.airtable_lookup({'id': 1})
     assert response.status == ResultType.FAIL
-    assert '400 Client Error' in response.output
+    assert '400 Bad Request' in response.output
+
+
+def test_airtable_index_streaming():
+    index = AirTableIndex()
+    index.add_records(
+        [{'fields': {'id': 'a', 'name': 'A', 'other': 'x'}}],
+        'id',
+        {'name'},
+    )
+
+    assert index.get('a') == {'name': 'A'}
+
+    results = []
+    waiting = threading.Thread(target=lambda: results.append(index.get('b')))
+    waiting.start()
+    index.add_records([{'fields': {'id': 'b', 'name': 'B'}}], 'id', {'name'})
+    waiting.join(timeout=5)
+
+    assert results == [{'name': 'B'}]
+
+    index.finish(error=ValueError('Page error'))
+    with pytest.raises(ValueError):
+        index.get('c')
+    assert index.get('a') == {'name': 'A'}
+
+
+def test_token_bucket(mocker):
+    now = [0.0]
+    sleeps = []
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    mocker.patch('connect_transformations.airtable_lookup.utils.asyncio.sleep', sleep)
+    bucket = TokenBucket(5, timer=lambda: now[0])
+
+    async def acquire(count):
+        for _ in range(count):
+            await bucket.acquire()
+
+    asyncio.run(acquire(7))
+
+    assert len(sleeps) == 2
+    assert now[0] == pytest.approx(0.4)
@@ -3,8 +3,17 @@
 # Copyright (c) 2023, CloudBlue LLC
 # All rights reserved.
 #
+from io import BytesIO
+
+import pytest
 from connect.eaas.core.enums import ResultType
+from openpyxl import Workbook
 
+from connect_transformations.attachment_lookup.exceptions import AttachmentError
+from connect_transformations.attachment_lookup.utils import (
+    load_excel_lookup_table,
+    load_lookup_table,
+)
 from connect_transformations.transformations import StandardTransformationsApplication
 
 
@@ -54,6 +63,7 @@ def test_attachment_lookup(mocker, connect_client, responses):
         'Subscription price': 102.14,
         'Subscription ID': 'SUB-123-123-125',
     }
+    assert 'rows indexed' in m.info.call_args[0][0]
 
 
 def test_attachment_lookup_backward_compat(mocker, connect_client, responses):
@@ -195,9 +205,11 @@ def test_attachment_lookup_api_error(mocker, connect_client, responses):
         },
     }
 
-    response = app.attachment_lookup({'id': 3})
-    assert response.status == ResultType.FAIL
-    assert response.output == 'Error during downloading attachment: 400 Bad Request'
+    for _ in range(5):
+        response = app.attachment_lookup({'id': 3})
+        assert response.status == ResultType.FAIL
+        assert response.output == 'Error during downloading attachment: 400 Bad Request'
+    assert len(responses.calls) == 1
 
 
 def test_attachment_lookup_invalid_sheet(mocker, connect_client, responses):
@@ -380,3 +392,116 @@ def test_attachment_lookup_map_invalid_attachment_columns(
     response = app.attachment_lookup({'id': 1})
     assert response.status == ResultType.FAIL
     assert response.output == "Invalid column: 'sub_idd'"
+
+
+def test_load_excel_lookup_table():
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'Data'
+    ws.append(['ignored', 'id', 'region', 'price', 'notes'])
+    ws.append(['x', 1, 'EU', 10.5, 'a'])
+    ws.append(['y', 2, 'US', 11.5, 'b'])
+    ws.append(['z', 2, 'EU', None, 'c'])
+    content = BytesIO()
+    wb.save(content)
+
+    table = load_excel_lookup_table(content.getvalue(), 'Data', ['id', 'region'], ['price'])
+    assert len(table) == 3
+    assert table.get('1, EU') == {'price': 10.5}
+    assert table.get('2, US') == {'price': 11.5}
+    assert table.get('2, EU') == {'price': None}
+    assert table.get('3, EU') is None
+
+    table = load_lookup_table(content.getvalue(), None, ['price'], ['id', 'notes'])
+    assert table.get('None') == {'id': 2, 'notes': 'c'}
+
+
+def test_load_excel_lookup_table_header_only():
+    wb = Workbook()
+    wb.active.append(['id', 'price'])
+    content = BytesIO()
+    wb.save(content)
+
+    assert len(load_excel_lookup_table(content.getvalue(), None, ['id'], ['missing'])) == 0
+
+
+def test_attachment_lookup_csv(mocker, connect_client, responses):
+    connect_client.endpoint = 'https://cnct.example.org/public/v1'
+    responses.add(
+        'GET',
+        f'{connect_client.endpoint}/path/to/MFL-123-123',
+        body=(
+            '\ufeffid,price,sub_id\n1,100.14,SUB-1\n3,102.14,"SUB-3, EU"\n3,103.14,SUB-3\n'
+        ).encode(),
+    )
+
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.installation_client = connect_client
+    app.transformation_request = {
+        'transformation': {
+            'settings': {
+                'file': '/path/to/MFL-123-123',
+                'map_by': [
+                    {
+                        'input_column': 'id',
+                        'attachment_column': 'id',
+                    },
+                ],
+                'mapping': [
+                    {
+                        'from': 'price',
+                        'to': 'Subscription price',
+                    },
+                ],
+            },
+            'columns': {
+                'input': [{'name': 'id', 'nullable': False}],
+            },
+        },
+    }
+
+    response = app.attachment_lookup({'id': 3})
+    assert response.status == ResultType.SUCCESS
+    assert response.transformed_row == {'Subscription price': '103.14'}
+    assert app.attachment_lookup({'id': 2}).status == ResultType.SKIP
+
+
+def test_load_csv_lookup_table_invalid_column():
+    with pytest.raises(KeyError):
+        load_lookup_table(b'id,price\n1,2\n', None, ['id'], ['cost'])
+    assert len(load_lookup_table(b'id,price\n', None, ['id'], ['cost'])) == 0
+
+
+def test_load_csv_lookup_table_short_row():
+    with pytest.raises(AttachmentError) as e:
+        load_lookup_table(b'id,price\n1,2\n3\n', None, ['id'], ['price'])
+    assert str(e.value) == 'Invalid CSV file: some rows have fewer columns than the header.'
+
+
+def test_load_lookup_table_legacy_excel():
+    with pytest.raises(AttachmentError) as e:
+        load_lookup_table(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1data', None, ['id'], ['price'])
+    assert 'Legacy Excel (.xls)' in str(e.value)
+
+
+def test_load_parquet_lookup_table():
+    pa = pytest.importorskip('pyarrow')
+    pq = pytest.importorskip('pyarrow.parquet')
+    content = BytesIO()
+    pq.write_table(
+        pa.table({'id': [1, 2], 'region': ['EU', 'US'], 'price': [10.5, 11.5]}),
+        content,
+    )
+
+    table = load_lookup_table(content.getvalue(), None, ['id'], ['price'])
+    assert table.get('2') == {'price': 11.5}
+    with pytest.raises(KeyError):
+        load_lookup_table(content.getvalue(), None, ['id'], ['cost'])
+
+
+def test_load_parquet_lookup_table_no_pyarrow(mocker):
+    mocker.patch('connect_transformations.attachment_lookup.utils.pq', None)
+
+    with pytest.raises(AttachmentError):
+        load_lookup_table(b'PAR1data', None, ['id'], ['price'])
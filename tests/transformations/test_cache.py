@@ -0,0 +1,318 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from connect_transformations.cache import (
+    CacheNamespace,
+    LookupCache,
+    NegativeCacheEntry,
+    ProgramCache,
+    approximate_size,
+)
+from connect_transformations.transformations import StandardTransformationsApplication
+
+
+def test_approximate_size():
+    assert approximate_size({'a': ['bb', 'cc']}) > approximate_size({'a': []})
+
+
+def test_cache_namespace_max_entries():
+    cache = CacheNamespace(max_entries=2, max_bytes=10 ** 6, ttl=None)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache['a'] == 1
+    cache['c'] = 3
+
+    assert 'b' not in cache
+    assert cache['a'] == 1
+    assert cache['c'] == 3
+    assert cache.evictions == 1
+
+
+def test_cache_namespace_max_bytes():
+    value = 'x' * 100
+    cache = CacheNamespace(max_entries=100, max_bytes=approximate_size(value) * 2, ttl=None)
+    cache['a'] = value
+    cache['b'] = value
+    cache['c'] = value
+
+    assert 'a' not in cache
+    assert len(cache) == 2
+    assert cache.evictions == 1
+
+
+def test_cache_namespace_ttl():
+    now = 0
+    cache = CacheNamespace(max_entries=10, max_bytes=10 ** 6, ttl=10, timer=lambda: now)
+    cache['a'] = 1
+    now = 5
+    assert cache['a'] == 1
+    now = 11
+    assert 'a' not in cache
+
+
+def test_lookup_cache_namespaces(mocker):
+    logger = mocker.MagicMock()
+    cache = LookupCache(max_entries=1, logger=logger, stats_interval=2)
+    cache.put('key', 'subscription', 'subscriptions')
+    cache.put('key', 'product', 'products')
+
+    assert cache.get('key', 'subscriptions') == 'subscription'
+    assert cache.get('key', 'products') == 'product'
+    try:
+        cache.get('missing', 'products')
+    except KeyError:
+        pass
+
+    assert cache.stats()['products'] == {
+        'entries': 1,
+        'bytes': approximate_size('product'),
+        'hits': 1,
+        'misses': 1,
+        'evictions': 0,
+        'coalesced': 0,
+    }
+    logger.info.assert_called_once_with(
+        f'Lookup cache "products": 1 entries, {approximate_size("product")} bytes, '
+        '1 hits, 1 misses, 0 evictions, 0 coalesced calls.',
+    )
+
+
+def test_lookup_cache_value_too_large():
+    cache = LookupCache(max_bytes=10)
+    cache.put('key', 'x' * 100)
+
+    assert cache.stats()['default']['entries'] == 0
+
+
+def test_application_cache_config(mocker):
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(
+        m,
+        m,
+        {
+            'LOOKUP_CACHE_MAX_ENTRIES': '100000',
+            'LOOKUP_CACHE_MAX_BYTES': '',
+            'LOOKUP_CACHE_TTL': 'invalid',
+        },
+    )
+
+    assert app._cache.max_entries == 100000
+    assert app._cache.max_bytes == 64 * 1024 * 1024
+    assert app._cache.ttl == 3600
+
+
+def test_cache_namespace_negative_ttl():
+    now = 0
+    cache = CacheNamespace(
+        max_entries=10, max_bytes=10 ** 6, ttl=100, negative_ttl=10, timer=lambda: now,
+    )
+    cache['missing'] = NegativeCacheEntry(ValueError('No result found'))
+    cache['empty'] = None
+    cache['found'] = 'value'
+
+    now = 11
+    assert 'missing' not in cache
+    assert 'empty' not in cache
+    assert cache['found'] == 'value'
+
+
+def test_lookup_cache_negative_entry():
+    cache = LookupCache()
+    error = ValueError('No result found')
+    cache.put('missing', NegativeCacheEntry(error))
+    cache.put('empty', None)
+
+    with pytest.raises(ValueError) as exc:
+        cache.get('missing')
+    assert exc.value is error
+    assert cache.get('empty') is None
+    assert cache.stats()['default']['hits'] == 2
+
+
+@pytest.mark.asyncio
+async def test_lookup_cache_coalesce():
+    cache = LookupCache()
+    calls = []
+    release = asyncio.Event()
+
+    async def fetch(value):
+        calls.append(value)
+        await release.wait()
+        return value * 2
+
+    tasks = [
+        asyncio.create_task(cache.coalesce('key', fetch, 21, namespace='subscriptions'))
+        for _ in range(5)
+    ]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*tasks) == [42] * 5
+    assert calls == [21]
+    assert cache.stats()['subscriptions']['coalesced'] == 4
+
+    assert await cache.coalesce('key', fetch, 1, namespace='subscriptions') == 2
+    assert calls == [21, 1]
+
+
+@pytest.mark.asyncio
+async def test_lookup_cache_coalesce_error():
+    cache = LookupCache()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        raise ValueError('No result found')
+
+    tasks = [asyncio.create_task(cache.coalesce('key', fetch)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert [str(result) for result in results] == ['No result found'] * 3
+
+
+def test_lookup_cache_get_or_compute_threads():
+    cache = LookupCache()
+    calls = []
+
+    def fetch(value):
+        calls.append(value)
+        time.sleep(0.01)
+        return value * 2
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(
+                cache.get_or_compute('key', fetch, 21, namespace='products'),
+            ),
+        )
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [42] * 5
+    assert calls == [21]
+    assert cache.get('key', 'products') == 42
+
+
+def test_lookup_cache_get_or_compute_negative_errors():
+    cache = LookupCache()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        raise ValueError('No result found')
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            cache.get_or_compute('missing', fetch, negative_errors=(ValueError,))
+    assert calls == [1]
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute('other', fetch)
+    with pytest.raises(KeyError):
+        cache.get('other')
+
+
+def test_lookup_cache_get_or_compute_negative_errors_threads():
+    cache = LookupCache()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.01)
+        raise ValueError('No result found')
+
+    errors = []
+
+    def lookup():
+        try:
+            cache.get_or_compute('missing', fetch, negative_errors=(ValueError,))
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=lookup) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == ['No result found'] * 5
+    assert calls == [1]
+    assert cache._sync_inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_lookup_cache_aget_or_compute():
+    cache = LookupCache()
+    calls = []
+
+    async def fetch(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    results = await asyncio.gather(
+        *[cache.aget_or_compute('key', fetch, 21, namespace='products') for _ in range(5)],
+    )
+
+    assert results == [42] * 5
+    assert calls == [21]
+    assert await cache.aget_or_compute('key', fetch, 1, namespace='products') == 42
+    assert cache.stats()['products']['coalesced'] == 4
+
+
+@pytest.mark.asyncio
+async def test_lookup_cache_aget_or_compute_negative_and_no_store():
+    cache = LookupCache()
+
+    async def fail():
+        raise ValueError('No result found')
+
+    async def fetch():
+        return 'value'
+
+    with pytest.raises(ValueError):
+        await cache.aget_or_compute('missing', fail, negative_errors=(ValueError,))
+    with pytest.raises(ValueError):
+        cache.get('missing')
+
+    assert await cache.aget_or_compute('key', fetch, store=False) == 'value'
+    with pytest.raises(KeyError):
+        cache.get('key')
+
+
+def test_program_cache(mocker):
+    cache = ProgramCache(max_entries=1)
+    compile_program = mocker.MagicMock(side_effect=['program a', 'program b', 'program a'])
+
+    assert cache.get_or_compile('a', compile_program) == 'program a'
+    assert cache.get_or_compile('a', compile_program) == 'program a'
+    assert cache.get_or_compile('b', compile_program) == 'program b'
+    assert cache.get_or_compile('a', compile_program) == 'program a'
+
+    assert compile_program.call_count == 3
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 3
+    assert stats['hit_rate'] == 0.25
+    assert stats['evictions'] == 2
+
+
+def test_program_cache_compile_error():
+    cache = ProgramCache()
+
+    def compile_program():
+        raise ValueError('Invalid expression')
+
+    with pytest.raises(ValueError):
+        cache.get_or_compile('a', compile_program)
+    assert cache.stats()['entries'] == 0
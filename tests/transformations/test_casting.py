@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2023, CloudBlue LLC
+# All rights reserved.
+#
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from dateutil.parser import parse
+
+from connect_transformations.casting import (
+    FORMAT_PARSERS,
+    cast_column,
+    detect_datetime_parser,
+    get_caster,
+    parse_iso_datetime,
+)
+
+
+def test_get_caster():
+    assert get_caster('decimal', 2) is get_caster('decimal', 2)
+    assert get_caster('decimal', 2)('1,234') == Decimal('1.23')
+    assert get_caster('decimal')('1.234') == Decimal('1.234')
+    assert get_caster('integer')(None) is None
+    with pytest.raises(KeyError):
+        get_caster('unknown')
+
+
+@pytest.mark.parametrize(
+    ('value', 'expected'),
+    (
+        ('2022-02-10', datetime(2022, 2, 10)),
+        ('2022-02-10T10:23:54Z', datetime(2022, 2, 10, 10, 23, 54, tzinfo=timezone.utc)),
+        ('2/10/2022 10:23:54', datetime(2022, 2, 10, 10, 23, 54)),
+        ('Feb 10 2022', datetime(2022, 2, 10)),
+    ),
+)
+def test_datetime_caster(value, expected):
+    assert get_caster('datetime')(value) == expected
+
+
+def test_detect_datetime_parser():
+    assert detect_datetime_parser(['2022-02-10', None, '']) is parse_iso_datetime
+    assert detect_datetime_parser(['2/10/2022', '12/31/2022']) is FORMAT_PARSERS[0]
+    assert detect_datetime_parser(['10.2.2022']) is None
+    assert detect_datetime_parser([None]) is None
+
+
+def test_cast_column_datetime(mocker):
+    parse_datetime = mocker.patch(
+        'connect_transformations.casting.parse_datetime',
+        wraps=parse,
+    )
+    values = ['2/10/2022', '12/31/2022', None, 'Jan 5 2023']
+
+    assert cast_column(values, 'datetime') == [
+        datetime(2022, 2, 10),
+        datetime(2022, 12, 31),
+        None,
+        datetime(2023, 1, 5),
+    ]
+    # The two samples checked against the detected format and the value in another one.
+    assert [call.args[0] for call in parse_datetime.call_args_list] == [
+        '2/10/2022',
+        '12/31/2022',
+        'Jan 5 2023',
+    ]
+
+
+def test_cast_column_decimal():
+    assert cast_column(('1.111', None, 2), 'decimal', 2) == [
+        Decimal('1.11'),
+        None,
+        Decimal('2.00'),
+    ]
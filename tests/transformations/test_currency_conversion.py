@@ -3,18 +3,29 @@
 # Copyright (c) 2023, CloudBlue LLC
 # All rights reserved.
 #
+import threading
+import time
 from decimal import Decimal
 
 import pytest
 from connect.eaas.core.enums import ResultType
 from responses import matchers
 
+from connect_transformations.currency_conversion.utils import (
+    RatesTableCache,
+    convert_currency_values,
+    currency_rates,
+)
 from connect_transformations.transformations import StandardTransformationsApplication
 
 
+@pytest.fixture(autouse=True)
+def clear_currency_rates():
+    currency_rates.clear()
+
+
 def test_currency_conversion_first(mocker, responses):
     params = {
-        'symbols': 'EUR',
         'base': 'USD',
         'app_id': '1a2b3c4d5e6f',
     }
@@ -57,7 +68,6 @@ def test_currency_conversion_first(mocker, responses):
 
 def test_currency_conversion_single_backward_compt(mocker, responses):
     params = {
-        'symbols': 'EUR',
         'base': 'USD',
         'app_id': '1a2b3c4d5e6f',
     }
@@ -100,7 +110,6 @@ def test_currency_conversion_single_backward_compt(mocker, responses):
 
 def test_currency_conversion(mocker, responses):
     params = {
-        'symbols': 'EUR',
         'base': 'USD',
         'app_id': '1a2b3c4d5e6f',
     }
@@ -144,7 +153,6 @@ def test_currency_conversion(mocker, responses):
 
 def test_currency_conversion_first_http_error(mocker, responses):
     params = {
-        'symbols': 'EUR',
         'base': 'USD',
         'app_id': '1a2b3c4d5e6f',
     }
@@ -173,7 +181,7 @@ def test_currency_conversion_first_http_error(mocker, responses):
     assert (
         'An error occurred while requesting '
         'https://openexchangerates.org/api/latest.json with params'
-        " {'symbols': 'EUR', 'base': 'USD'}"
+        " {'base': 'USD'}"
     ) in response.output, response.output
     assert 'app_id' not in response.output
 
@@ -225,3 +233,341 @@ def test_currency_conversion_no_input_column_found(mocker):
             },
         )
         assert str(e.value) == 'The column Price does not exists.'
+
+
+def test_currency_conversion_cross_rates(mocker, responses):
+    responses.add(
+        'GET',
+        'https://openexchangerates.org/api/latest.json',
+        match=[matchers.query_param_matcher({'base': 'USD', 'app_id': 'key'})],
+        json={'base': 'USD', 'rates': {'EUR': 0.8, 'GBP': 0.6, 'JPY': 150}},
+    )
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, {'EXCHANGE_API_KEY': 'key'})
+    app.transformation_request = {
+        'transformation': {
+            'settings': [
+                {
+                    'from': {'column': 'C1', 'currency': 'EUR'},
+                    'to': {'column': 'GBP', 'currency': 'GBP'},
+                },
+                {
+                    'from': {'column': 'C1', 'currency': 'EUR'},
+                    'to': {'column': 'USD', 'currency': 'USD'},
+                },
+                {
+                    'from': {'column': 'C1', 'currency': 'EUR'},
+                    'to': {'column': 'JPY', 'currency': 'JPY'},
+                },
+            ],
+            'columns': {
+                'input': [{'id': 'C1', 'name': 'Price', 'nullable': False}],
+            },
+        },
+    }
+
+    response = app.currency_conversion({'Price': '10'})
+
+    assert response.status == ResultType.SUCCESS
+    assert response.transformed_row == {
+        'GBP': (Decimal('10') * Decimal(0.6) / Decimal(0.8)).quantize(Decimal('.00001')),
+        'USD': (Decimal('10') / Decimal(0.8)).quantize(Decimal('.00001')),
+        'JPY': (Decimal('10') * Decimal(150) / Decimal(0.8)).quantize(Decimal('.00001')),
+    }
+    assert len(responses.calls) == 1
+
+
+def test_currency_conversion_local_rates(mocker, tmp_path):
+    rates_file = tmp_path / 'rates.json'
+    rates_file.write_text('{"base": "EUR", "rates": {"USD": 1.25}}')
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, {'EXCHANGE_RATES_FILE': str(rates_file)})
+    app.transformation_request = {
+        'transformation': {
+            'settings': [
+                {
+                    'from': {'column': 'C1', 'currency': 'USD'},
+                    'to': {'column': 'EUR', 'currency': 'EUR'},
+                },
+                {
+                    'from': {'column': 'C1', 'currency': 'USD'},
+                    'to': {'column': 'AUD', 'currency': 'AUD'},
+                },
+            ],
+            'columns': {
+                'input': [{'id': 'C1', 'name': 'Price', 'nullable': False}],
+            },
+        },
+    }
+
+    response = app.currency_conversion({'Price': '10'})
+
+    assert response.status == ResultType.FAIL
+    assert response.output == 'The rate for AUD is not available for base EUR.'
+    assert app.get_currency_rate('USD', 'EUR') == Decimal(1) / Decimal(1.25)
+
+
+def test_rates_table_cache_stale_while_revalidate(mocker):
+    now = 0
+    loaded = threading.Event()
+
+    class FakeProvider:
+        key = 'fake'
+        loads = 0
+
+        def load(self):
+            self.loads += 1
+            loaded.set()
+            return {'base': 'USD', 'rates': {'USD': Decimal(1), 'EUR': Decimal(self.loads)}}
+
+    provider = FakeProvider()
+    cache = RatesTableCache(timer=lambda: now)
+
+    assert cache.get_table(provider, ttl=10, max_stale=100)['rates']['EUR'] == 1
+    loaded.clear()
+
+    now = 20
+    assert cache.get_table(provider, ttl=10, max_stale=100)['rates']['EUR'] == 1
+    assert loaded.wait(5)
+    for _ in range(100):
+        if cache.get_table(provider, ttl=10, max_stale=100)['rates']['EUR'] == 2:
+            break
+        time.sleep(0.01)
+    assert cache.get_table(provider, ttl=10, max_stale=100)['rates']['EUR'] == 2
+
+    now = 200
+    assert cache.get_table(provider, ttl=10, max_stale=100)['rates']['EUR'] == 3
+    assert provider.loads == 3
+
+
+def test_rates_table_cache_loads_do_not_block_other_reads():
+    now = 0
+    release = threading.Event()
+    loading = threading.Event()
+
+    class SlowProvider:
+        key = 'slow'
+        name = 'slow'
+        slow = False
+
+        def load(self):
+            if self.slow:
+                loading.set()
+                release.wait(5)
+            return {'base': 'USD', 'rates': {'USD': Decimal(1)}}
+
+        def load_historical(self, date):
+            if date == '2023-01-01':
+                loading.set()
+                release.wait(5)
+            return {'base': 'USD', 'rates': {'USD': Decimal(1)}}
+
+    provider = SlowProvider()
+    cache = RatesTableCache(timer=lambda: now)
+    table = cache.get_table(provider, ttl=10, max_stale=100)
+
+    now = 20
+    provider.slow = True
+    assert cache.get_table(provider, ttl=10, max_stale=100) is table
+    assert loading.wait(5)
+    start = time.monotonic()
+    assert cache.get_table(provider, ttl=10, max_stale=100) is table
+
+    loading.clear()
+    thread = threading.Thread(
+        target=cache.get_historical_table, args=(provider, '2023-01-01'), daemon=True,
+    )
+    thread.start()
+    assert loading.wait(5)
+    assert cache.get_historical_table(provider, '2023-01-02')['base'] == 'USD'
+    assert time.monotonic() - start < 1
+
+    release.set()
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+def test_currency_conversion_historical_rates(mocker, responses, tmp_path):
+    responses.add(
+        'GET',
+        'https://openexchangerates.org/api/historical/2022-01-31.json',
+        match=[matchers.query_param_matcher({'base': 'USD', 'app_id': 'key'})],
+        json={'base': 'USD', 'rates': {'EUR': 0.89}},
+    )
+    responses.add(
+        'GET',
+        'https://openexchangerates.org/api/historical/2022-02-15.json',
+        match=[matchers.query_param_matcher({'base': 'USD', 'app_id': 'key'})],
+        json={'base': 'USD', 'rates': {'EUR': 0.87}},
+    )
+    m = mocker.MagicMock()
+    config = {'EXCHANGE_API_KEY': 'key', 'STORAGE_PATH': str(tmp_path / 'storage.sqlite3')}
+    transformation_request = {
+        'batch': {
+            'context': {
+                'period': {'start': '2022-01-01T00:00:00', 'end': '2022-01-31T23:59:59'},
+            },
+        },
+        'transformation': {
+            'settings': [
+                {
+                    'from': {'column': 'C1', 'currency': 'USD'},
+                    'to': {'column': 'Period EUR', 'currency': 'EUR'},
+                    'rate_date': {'source': 'period_end'},
+                },
+                {
+                    'from': {'column': 'C1', 'currency': 'USD'},
+                    'to': {'column': 'Row EUR', 'currency': 'EUR'},
+                    'rate_date': {'source': 'column', 'column': 'C2'},
+                },
+            ],
+            'columns': {
+                'input': [
+                    {'id': 'C1', 'name': 'Price', 'nullable': False},
+                    {'id': 'C2', 'name': 'Date', 'nullable': False},
+                ],
+            },
+        },
+    }
+    expected = {
+        'Period EUR': (Decimal('10') * Decimal(0.89)).quantize(Decimal('.00001')),
+        'Row EUR': (Decimal('10') * Decimal(0.87)).quantize(Decimal('.00001')),
+    }
+
+    app = StandardTransformationsApplication(m, m, config)
+    app.transformation_request = transformation_request
+    response = app.currency_conversion({'Price': '10', 'Date': '2022-02-15 10:00:00'})
+
+    assert response.status == ResultType.SUCCESS, response.output
+    assert response.transformed_row == expected
+    assert len(responses.calls) == 2
+
+    currency_rates.clear()
+    app = StandardTransformationsApplication(m, m, config)
+    app.transformation_request = transformation_request
+    response = app.currency_conversion({'Price': '10', 'Date': '2022-02-15'})
+
+    assert response.transformed_row == expected
+    assert len(responses.calls) == 2
+
+
+def test_currency_conversion_historical_rates_no_date(mocker):
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, {'EXCHANGE_API_KEY': 'key'})
+    app.transformation_request = {
+        'batch': {'context': {}},
+        'transformation': {
+            'settings': [{
+                'from': {'column': 'C1', 'currency': 'USD'},
+                'to': {'column': 'EUR', 'currency': 'EUR'},
+                'rate_date': {'source': 'period_start'},
+            }],
+            'columns': {
+                'input': [{'id': 'C1', 'name': 'Price', 'nullable': False}],
+            },
+        },
+    }
+
+    response = app.currency_conversion({'Price': '10'})
+
+    assert response.status == ResultType.FAIL
+    assert response.output == 'There is no date to get the rates (period_start).'
+
+
+def test_currency_conversion_rows(mocker, tmp_path):
+    rates_file = tmp_path / 'rates.json'
+    rates_file.write_text('{"base": "USD", "rates": {"EUR": 0.8, "GBP": 0.6}}')
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, {'EXCHANGE_RATES_FILE': str(rates_file)})
+    app.transformation_request = {
+        'transformation': {
+            'settings': [
+                {
+                    'from': {'column': 'C1', 'currency': 'USD'},
+                    'to': {'column': 'EUR', 'currency': 'EUR'},
+                },
+                {
+                    'from': {'column': 'C2', 'currency': 'USD'},
+                    'to': {'column': 'GBP', 'currency': 'GBP'},
+                },
+            ],
+            'columns': {
+                'input': [
+                    {'id': 'C1', 'name': 'Price', 'nullable': False},
+                    {'id': 'C2', 'name': 'Cost', 'nullable': True},
+                ],
+            },
+        },
+    }
+    rows = [
+        {'Price': '10', 'Cost': '5'},
+        {'Price': 'abc', 'Cost': '5'},
+        {'Price': '2.5', 'Cost': None},
+        {'Price': 4, 'Cost': 1.5},
+    ]
+
+    responses = app.currency_conversion_rows([dict(row) for row in rows])
+
+    assert [response.status for response in responses] == [
+        ResultType.SUCCESS,
+        ResultType.FAIL,
+        ResultType.SKIP,
+        ResultType.SUCCESS,
+    ]
+    assert responses[0].transformed_row == {'EUR': Decimal('8.00000'), 'GBP': Decimal('3.00000')}
+    assert responses[3].transformed_row == {'EUR': Decimal('3.20000'), 'GBP': Decimal('0.90000')}
+    assert [
+        (response.status, response.transformed_row, response.output) for response in responses
+    ] == [
+        (response.status, response.transformed_row, response.output)
+        for response in (app.currency_conversion(row) for row in rows)
+    ]
+
+
+def test_currency_conversion_rows_rate_error(mocker, tmp_path):
+    rates_file = tmp_path / 'rates.json'
+    rates_file.write_text('{"base": "USD", "rates": {"EUR": 0.8}}')
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, {'EXCHANGE_RATES_FILE': str(rates_file)})
+    app.transformation_request = {
+        'transformation': {
+            'settings': [
+                {
+                    'from': {'column': 'C1', 'currency': 'USD'},
+                    'to': {'column': 'GBP', 'currency': 'GBP'},
+                },
+            ],
+            'columns': {
+                'input': [{'id': 'C1', 'name': 'Price', 'nullable': True}],
+            },
+        },
+    }
+    rows = [{'Price': '10'}, {'Price': None}, {'Price': ''}]
+
+    responses = app.currency_conversion_rows([dict(row) for row in rows])
+
+    assert [response.status for response in responses] == [
+        ResultType.FAIL,
+        ResultType.SKIP,
+        ResultType.SKIP,
+    ]
+    assert [
+        (response.status, response.output) for response in responses
+    ] == [
+        (response.status, response.output)
+        for response in (app.currency_conversion(row) for row in rows)
+    ]
+
+    responses = app.currency_conversion_rows([{'Price': None}, {'Price': ''}])
+    assert [response.status for response in responses] == [ResultType.SKIP, ResultType.SKIP]
+
+
+def test_convert_currency_values():
+    rate = Decimal(0.92343)
+
+    assert convert_currency_values(['22.5', 1, None, ''], rate) == [
+        (Decimal('22.5') * rate).quantize(Decimal('.00001')),
+        rate.quantize(Decimal('.00001')),
+        None,
+        None,
+    ]
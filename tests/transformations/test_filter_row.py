@@ -91,3 +91,69 @@ def test_filter_row_new_settings_complex(mocker):
     assert isinstance(response, RowTransformationResponse)
     assert response.status == ResultType.DELETE
     assert response.transformed_row is None
+
+
+def test_filter_row_many_values(mocker):
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.transformation_request = {
+        'transformation': {
+            'settings': {
+                'from': 'SKU',
+                'value': 'SKU-0',
+                'match_condition': True,
+                'additional_values': [
+                    *({'operation': 'or', 'value': f'SKU-{i}'} for i in range(1, 500)),
+                    {'operation': 'or', 'value': 'quoted "value" \\ with backslash'},
+                    {'operation': 'or', 'value': None},
+                ],
+            },
+        },
+    }
+
+    assert app.filter_row({'SKU': 'SKU-499'}).status == ResultType.SUCCESS
+    assert app.filter_row({'SKU': 'quoted "value" \\ with backslash'}).status == (
+        ResultType.SUCCESS
+    )
+    assert app.filter_row({'SKU': None}).status == ResultType.SUCCESS
+    assert app.filter_row({'SKU': 'SKU-500'}).status == ResultType.DELETE
+    assert app.filter_row({'SKU': ['unhashable']}).status == ResultType.DELETE
+
+
+def test_filter_row_conditions(mocker):
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.transformation_request = {
+        'transformation': {
+            'settings': {
+                'conditions': {
+                    'operator': 'and',
+                    'conditions': [
+                        {'column': 'Price', 'operator': 'between', 'value': [10, '20,5']},
+                        {'column': 'Quantity', 'operator': '>', 'value': 0},
+                        {
+                            'operator': 'or',
+                            'conditions': [
+                                {'column': 'SKU', 'operator': 'in', 'value': ['A-1', 'B-2']},
+                                {'column': 'SKU', 'operator': 'regex', 'value': r'^PROMO-\d+$'},
+                                {'column': 'Reseller', 'operator': 'is_null'},
+                            ],
+                        },
+                    ],
+                },
+            },
+        },
+    }
+
+    def filter_row(price, quantity, sku, reseller='R-1'):
+        return app.filter_row({
+            'Price': price, 'Quantity': quantity, 'SKU': sku, 'Reseller': reseller,
+        }).status
+
+    assert filter_row('10', 1, 'A-1') == ResultType.SUCCESS
+    assert filter_row(20.5, '3', 'PROMO-12') == ResultType.SUCCESS
+    assert filter_row(15, 3, 'C-3', '') == ResultType.SUCCESS
+    assert filter_row(21, 3, 'A-1') == ResultType.DELETE
+    assert filter_row('n/a', 3, 'A-1') == ResultType.DELETE
+    assert filter_row(15, 0, 'A-1') == ResultType.DELETE
+    assert filter_row(15, 3, 'PROMO-X') == ResultType.DELETE
@@ -6,10 +6,12 @@
 import datetime
 from decimal import Decimal
 
+import jq
 import pytest
 from connect.eaas.core.enums import ResultType
 
-from connect_transformations.formula.utils import find_all_columns
+from connect_transformations.formula.compiler import NativeProgram
+from connect_transformations.formula.utils import compile_formula, find_all_columns
 from connect_transformations.transformations import StandardTransformationsApplication
 
 
@@ -402,3 +404,163 @@ def test_formula_functions_pricing(mocker, formula, expected):
     response = app.formula({'a': 115.23, 'b': 110})
 
     assert response.transformed_row == {'c': expected}
+
+
+def test_formula_rows(mocker):
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.transformation_request = {
+        'stream': {},
+        'batch': {},
+        'transformation': {
+            'settings': {
+                'expressions': [
+                    {
+                        'to': 'Total',
+                        'formula': '.Price + .Tax',
+                        'ignore_errors': False,
+                        'type': 'integer',
+                    },
+                    {
+                        'to': 'Ratio',
+                        'formula': '.Tax / .Price',
+                        'ignore_errors': True,
+                        'type': 'decimal',
+                        'precision': 2,
+                    },
+                    {
+                        'to': 'Nothing',
+                        'formula': 'empty',
+                        'ignore_errors': False,
+                        'type': 'string',
+                    },
+                ],
+            },
+            'columns': {
+                'input': [
+                    {'name': 'Price', 'nullable': False, 'type': 'integer'},
+                    {'name': 'Tax', 'nullable': False, 'type': 'integer'},
+                ],
+            },
+        },
+    }
+    formula = mocker.spy(app, 'formula')
+
+    responses = app.formula_rows([
+        {'Price': 100, 'Tax': 20},
+        {'Price': 0, 'Tax': 0},
+        {'Price': 'one', 'Tax': 1},
+        {'Price': 50, 'Tax': 10},
+    ])
+
+    assert [response.status for response in responses] == [
+        ResultType.SUCCESS,
+        ResultType.SUCCESS,
+        ResultType.FAIL,
+        ResultType.SUCCESS,
+    ]
+    assert responses[0].transformed_row == {
+        'Total': 120,
+        'Ratio': Decimal('0.20'),
+        'Nothing': None,
+    }
+    assert responses[1].transformed_row == {'Total': 0, 'Ratio': None, 'Nothing': None}
+    assert 'string ("one") and number (1) cannot be added' in responses[2].output
+    assert responses[3].transformed_row == {
+        'Total': 60,
+        'Ratio': Decimal('0.20'),
+        'Nothing': None,
+    }
+    assert formula.call_count == 2
+
+
+def test_formula_rows_empty(mocker):
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+
+    assert app.formula_rows([]) == []
+
+
+@pytest.mark.parametrize('formula,row,expected', (
+    ('.a * .b', {'a': 2, 'b': 3.5}, 7),
+    ('.a / .b', {'a': 1, 'b': 3}, 1 / 3),
+    ('."c d" + .["e"]', {'c d': 'x', 'e': 'y'}, 'xy'),
+    ('.a + .missing', {'a': 1}, 1),
+    ('round(.a; 2)', {'a': 10.567}, 10.57),
+    ('.a | round', {'a': -2.5}, -3),
+    ('.a | round(1)', {'a': 19.47}, 19.5),
+    ('margin(.a; .b) | round(2)', {'a': 115.23, 'b': 110}, 4.54),
+    ('markup(.a; .b)', {'a': 120, 'b': 100}, 20),
+    ('tonumber(.a) * 2', {'a': '1.5'}, 3),
+    ('if .a > 1 then "big" elif .a == 1 then "one" else "small" end', {'a': 1}, 'one'),
+    ('.a == 1 and (.b or false)', {'a': 1.0, 'b': None}, False),
+    ('.a // "default"', {'a': None}, 'default'),
+    ('-1 + 2 * -3', {}, -7),
+    ('$context.period.start', {}, '2023-01-01'),
+    ('def drop_row: "DROP"; if .a then drop_row else .b end', {'a': True}, 'DROP'),
+))
+def test_compile_formula_native(formula, row, expected):
+    program = compile_formula(formula, {'context': {'period': {'start': '2023-01-01'}}})
+
+    assert isinstance(program, NativeProgram)
+    assert program.input(row).first() == expected
+    assert program.get_jq_program().input(row).first() == expected
+
+
+@pytest.mark.parametrize('formula,row', (
+    ('.a + .b', {'a': [1], 'b': [2]}),
+    ('.a * .b', {'a': 'x', 'b': 2}),
+    ('.a < .b', {'a': None, 'b': 1}),
+    ('.a', {'a': {'b': 1.0}}),
+    ('tonumber(.a)', {'a': ' 12 '}),
+))
+def test_compile_formula_native_fallback(formula, row):
+    program = compile_formula(formula, {})
+
+    assert isinstance(program, NativeProgram)
+    assert program.input(row).first() == program.get_jq_program().input(row).first()
+
+
+def test_compile_formula_native_fallback_error():
+    program = compile_formula('.a / .b', {})
+
+    with pytest.raises(ValueError) as e:
+        program.input({'a': 1, 'b': 0}).first()
+
+    assert 'cannot be divided because the divisor is zero' in str(e.value)
+
+
+@pytest.mark.parametrize('formula', (
+    '.a | length',
+    '[.a, .b]',
+    '"\\(.a)"',
+    '.a as $x | $x',
+    '.a[0]',
+))
+def test_compile_formula_unsupported(formula):
+    program = compile_formula(formula, {})
+
+    assert not isinstance(program, NativeProgram)
+
+
+@pytest.mark.parametrize('formula', (
+    '1 < 2 < 3',
+    '1 / 0',
+    'if .a then 1 end',
+    '.a.["b"]',
+    '$missing',
+))
+def test_compile_formula_invalid(formula):
+    with pytest.raises(ValueError):
+        compile_formula(formula, {})
+
+
+def test_compile_formula_cached(mocker):
+    jq_compile = mocker.spy(jq, 'compile')
+    context = {'context': {'period': {'start': '2023-01-01'}}}
+
+    program = compile_formula('.a | length', context)
+
+    assert compile_formula('  .a | length ', context) is program
+    assert compile_formula('.a | length', {'context': {'period': {}}}) is not program
+    assert jq_compile.call_count == 2
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2023, CloudBlue LLC
+# All rights reserved.
+#
+import asyncio
+import threading
+import time
+
+import pytest
+
+from connect_transformations.locks import LockRegistry
+from connect_transformations.transformations import StandardTransformationsApplication
+
+
+def test_lock_registry_contention():
+    locks = LockRegistry()
+
+    def wait():
+        with locks.lock('airtable_lookup'):
+            pass
+
+    with locks.lock('airtable_lookup'):
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        time.sleep(0.1)
+        with locks.lock('formula'):
+            pass
+    waiter.join(5)
+
+    stats = locks.stats()
+    assert locks.lock('airtable_lookup') is locks.lock('airtable_lookup')
+    assert stats['airtable_lookup']['acquisitions'] == 2
+    assert stats['airtable_lookup']['contended'] == 1
+    assert stats['airtable_lookup']['wait_time'] > 0
+    assert stats['formula'] == {'acquisitions': 1, 'contended': 0, 'wait_time': 0.0}
+
+
+@pytest.mark.asyncio
+async def test_lock_registry_async():
+    locks = LockRegistry()
+
+    async def hold():
+        async with locks.alock('products'):
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(hold(), hold())
+
+    assert locks.stats()['async:products']['acquisitions'] == 2
+    assert locks.stats()['async:products']['contended'] == 1
+    assert not locks.alock('products').locked()
+
+
+def test_application_locks(mocker):
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+
+    with app.lock('airtable_lookup'):
+        app.cache_put('key', 'value', 'products')
+
+    assert app.cache_get('key', 'products') == 'value'
+    assert app.lock_stats()['airtable_lookup']['acquisitions'] == 1
+    assert not app.lock('airtable_lookup').locked()
@@ -6,6 +6,7 @@
 import pytest
 from connect.eaas.core.enums import ResultType
 
+from connect_transformations.lookup_billing_request.utils import count_updated_between
 from connect_transformations.transformations import StandardTransformationsApplication
 
 
@@ -366,3 +367,159 @@ async def test_lookup_billing_request_not_found(
     })
     assert response.status == ResultType.FAIL
     assert "No result found for the filter" in response.output
+
+
+@pytest.mark.asyncio
+async def test_lookup_billing_request_rows(
+    mocker,
+    async_connect_client,
+    async_client_mocker_factory,
+):
+    client = async_client_mocker_factory(base_url=async_connect_client.endpoint)
+
+    def ff_request(request_id, asset_id, value, updated):
+        return {
+            'id': request_id,
+            'asset': {
+                'id': asset_id,
+                'params': [{'id': 'param_name', 'name': 'param_name', 'value': value}],
+                'items': [{'id': 'i1', 'mpn': 'm1', 'quantity': 12, 'old_quantity': 10}],
+            },
+            'updated': updated,
+        }
+
+    def billing_request(request_id, asset_id, value, created):
+        return {
+            'id': request_id,
+            'asset': {
+                'id': asset_id,
+                'params': [{'id': 'param_name', 'name': 'param_name', 'value': value}],
+            },
+            'items': [{'id': 'i1', 'mpn': 'm1', 'quantity': 12}],
+            'events': {'created': {'at': created}},
+        }
+
+    client.requests.filter(
+        **{
+            'status': 'approved',
+            'asset.params.id': 'param_name',
+            'asset.params.value__in': ['V1', 'V2', 'V3'],
+            'updated__lt': '2022-01-31T23:59:59',
+        },
+    ).select(
+        '-activation_key',
+        '-template',
+    ).order_by('-updated').mock(return_value=[
+        ff_request('PR-003', 'AS-002', 'V2', '2022-01-20T00:00:00'),
+        ff_request('PR-002', 'AS-001', 'V1', '2022-01-10T00:00:00'),
+        ff_request('PR-001', 'AS-001', 'V1', '2022-01-01T00:00:00'),
+    ])
+    client('subscriptions').requests.filter(
+        **{
+            'asset.params.id': 'param_name',
+            'asset.params.value__in': ['V1', 'V2', 'V3'],
+            'events.created.at__lt': '2022-01-31T23:59:59',
+            'events.created.at__gt': '2022-01-01T00:00:00',
+        },
+    ).order_by('events.created.at').mock(return_value=[
+        billing_request('BR-001', 'AS-001', 'V1', '2022-01-05T00:00:00'),
+        billing_request('BR-002', 'AS-001', 'V1', '2022-01-15T00:00:00'),
+        billing_request('BR-003', 'AS-002', 'V2', '2022-01-25T00:00:00'),
+    ])
+    client.requests.filter(
+        **{
+            'status': 'approved',
+            'updated__gt': '2022-01-10T00:00:00',
+            'updated__lt': '2022-01-25T00:00:00',
+        },
+    ).select(
+        '-activation_key',
+        '-template',
+    ).mock(return_value=[
+        {'id': 'PR-010', 'updated': '2022-01-22T00:00:00'},
+        {'id': 'PR-009', 'updated': '2022-01-21T00:00:00'},
+        {'id': 'PR-008', 'updated': '2022-01-12T00:00:00'},
+    ])
+
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.installation_client = async_connect_client
+    app.transformation_request = {
+        'batch': {
+            'context': {
+                'period': {
+                    'start': '2022-01-01T00:00:00',
+                    'end': '2022-01-31T23:59:59',
+                },
+            },
+        },
+        'transformation': {
+            'settings': {
+                'item': {'id': 'mpn', 'name': 'Item MPN'},
+                'parameter': {'id': 'PRM-000-048-001-0003', 'name': 'param_name'},
+                'asset_type': None,
+                'asset_column': None,
+                'item_column': 'ItemMPN',
+                'output_config': {
+                    'Request': {'attribute': 'id'},
+                    'Old Quantity': {'attribute': 'items.old_quantity'},
+                },
+                'parameter_column': 'ParamName',
+                'action_if_multiple': 'fail',
+                'action_if_not_found': 'fail',
+            },
+            'columns': {
+                'input': [
+                    {'name': 'ParamName', 'nullable': True},
+                    {'name': 'ItemMPN', 'nullable': False},
+                ],
+                'output': [{'name': 'Request'}, {'name': 'Old Quantity'}],
+            },
+        },
+    }
+
+    responses = await app.lookup_billing_request_rows([
+        {'ParamName': 'V1', 'ItemMPN': 'm1'},
+        {'ParamName': 'V2', 'ItemMPN': 'm1'},
+        {'ParamName': 'V3', 'ItemMPN': 'm1'},
+        {'ParamName': 'V1', 'ItemMPN': 'm1'},
+        {'ParamName': None, 'ItemMPN': 'm1'},
+    ])
+
+    assert [response.status for response in responses] == [
+        ResultType.SUCCESS,
+        ResultType.FAIL,
+        ResultType.FAIL,
+        ResultType.SUCCESS,
+        ResultType.SKIP,
+    ]
+    assert responses[0].transformed_row == {'Request': 'BR-002', 'Old Quantity': '10'}
+    assert responses[1].output == (
+        "No result found for the filter {'asset.params.id': 'param_name', "
+        "'asset.params.value': 'V2'}"
+    )
+    assert responses[2].output == (
+        "No result found for the filter {'asset.params.id': 'param_name', "
+        "'asset.params.value': 'V3'}"
+    )
+
+
+def test_count_updated_between():
+    updated_values = [
+        '2022-01-10T00:00:00',
+        '2022-01-11T00:00:00',
+        '2022-01-12T00:00:00',
+        '2022-01-20T00:00:00',
+        '2022-01-21T00:00:00',
+    ]
+
+    assert count_updated_between(
+        updated_values,
+        {'updated': '2022-01-10T00:00:00'},
+        {'events': {'created': {'at': '2022-01-20T00:00:00'}}},
+    ) == 2
+    assert count_updated_between(
+        updated_values,
+        {'updated': '2022-01-22T00:00:00'},
+        {'events': {'created': {'at': '2022-01-05T00:00:00'}}},
+    ) == 0
@@ -615,3 +615,108 @@ async def test_lookup_ff_request_multiple_skip(
         'Param A': 'PAR-111',
     })
     assert response.status == ResultType.SKIP
+
+
+@pytest.mark.asyncio
+async def test_lookup_ff_request_prefetch(
+    mocker,
+    async_connect_client,
+    async_client_mocker_factory,
+):
+    client = async_client_mocker_factory(base_url=async_connect_client.endpoint)
+
+    client.requests.filter(
+        **FF_REQ_COMMON_FILTERS,
+        **{
+            'asset.params.name': 'param_name',
+            'updated__lt': '2022-01-31T23:59:59',
+            'asset.product.id__in': ['PRD-001'],
+        },
+    ).select(
+        *FF_REQ_SELECT,
+    ).order_by('-updated').mock(return_value=[
+        {
+            'id': 'PR-001',
+            'status': 'approved',
+            'asset': {
+                'id': 'AS-001',
+                'params': [
+                    {'name': 'param_name', 'value': 'Value1'},
+                    {'name': 'other_param', 'value': 'Other'},
+                ],
+                'items': [{'id': 'i1', 'mpn': 'm1', 'quantity': 2, 'old_quantity': 1}],
+            },
+        },
+        {
+            'id': 'PR-002',
+            'status': 'approved',
+            'asset': {
+                'id': 'AS-002',
+                'params': [{'name': 'param_name', 'value': 'Value2'}],
+                'items': [{'id': 'i1', 'mpn': 'm1', 'quantity': 5, 'old_quantity': 0}],
+            },
+        },
+    ])
+
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.installation_client = async_connect_client
+    app.transformation_request = {
+        'stream': {'context': {'product': {'id': 'PRD-001'}}},
+        'batch': {
+            'context': {
+                'period': {
+                    'start': '2022-01-01T00:00:00',
+                    'end': '2022-01-31T23:59:59',
+                },
+            },
+        },
+        'transformation': {
+            'settings': {
+                'item': {'id': 'mpn', 'name': 'Item MPN'},
+                'parameter': {'id': 'PRM-001', 'name': 'param_name'},
+                'asset_type': 'id',
+                'asset_column': 'AssetID',
+                'item_column': 'ItemMPN',
+                'output_config': {
+                    'ID': {'attribute': 'id'},
+                    'Quantity': {'attribute': 'asset.items.quantity'},
+                },
+                'parameter_column': 'ParamName',
+                'action_if_multiple': 'fail',
+                'action_if_not_found': 'fail',
+                'prefetch_requests': True,
+            },
+            'columns': {
+                'input': [
+                    {'name': 'AssetID', 'nullable': False},
+                    {'name': 'ParamName', 'nullable': False},
+                    {'name': 'ItemMPN', 'nullable': False},
+                ],
+                'output': [{'name': 'ID'}, {'name': 'Quantity'}],
+            },
+        },
+    }
+    load_index = mocker.spy(app, 'load_ff_requests_index')
+
+    response = await app.lookup_ff_request({
+        'AssetID': 'AS-001', 'ParamName': 'Value1', 'ItemMPN': 'm1',
+    })
+    assert response.status == ResultType.SUCCESS, response.output
+    assert response.transformed_row == {'ID': 'PR-001', 'Quantity': '2'}
+
+    response = await app.lookup_ff_request({
+        'AssetID': 'AS-002', 'ParamName': 'Value2', 'ItemMPN': 'm1',
+    })
+    assert response.status == ResultType.SUCCESS, response.output
+    assert response.transformed_row == {'ID': 'PR-002', 'Quantity': '5'}
+
+    response = await app.lookup_ff_request({
+        'AssetID': 'AS-001', 'ParamName': 'Value2', 'ItemMPN': 'm1',
+    })
+    assert response.status == ResultType.FAIL
+    assert load_index.call_count == 1
+    assert set(app.ff_requests_index) == {
+        ('param_name', 'Value1', 'AS-001'),
+        ('param_name', 'Value2', 'AS-002'),
+    }
@@ -4,6 +4,7 @@
 # All rights reserved.
 #
 import pytest
+from connect.client import ClientError
 from connect.eaas.core.enums import ResultType
 
 from connect_transformations.transformations import StandardTransformationsApplication
@@ -80,17 +81,23 @@ async def test_lookup_product_item_cached(mocker):
             },
         },
     }
-    app._cache['PRD-000-000-001-id-PRD-000-000-001-0001'] = {
-        'product': {'id': 'PRD-000-000-001', 'name': 'Google Apps'},
-        'id': 'PRD-000-000-001-0001',
-        'name': 'Prd 000 000 001 0001',
-        'unit': {"name": "Gb"},
-        'period': 'monthly',
-        'mpn': 'MPN-A',
-    }
-    app._cache['PRD-000-000-001'] = {
-        'id': 'PRD-000-000-001', 'name': 'Google Apps',
-    }
+    app.cache_put(
+        'PRD-000-000-001-id-PRD-000-000-001-0001',
+        {
+            'product': {'id': 'PRD-000-000-001', 'name': 'Google Apps'},
+            'id': 'PRD-000-000-001-0001',
+            'name': 'Prd 000 000 001 0001',
+            'unit': {"name": "Gb"},
+            'period': 'monthly',
+            'mpn': 'MPN-A',
+        },
+        'product_items',
+    )
+    app.cache_put(
+        'PRD-000-000-001',
+        {'id': 'PRD-000-000-001', 'name': 'Google Apps'},
+        'products',
+    )
     response = await app.lookup_product_items({
         'ColumnA': 'PRD-000-000-001-0001',
     })
@@ -126,9 +133,11 @@ async def test_lookup_product_item_unknown_lookup(mocker):
             },
         },
     }
-    app._cache['PRD-000-000-001'] = {
-        'id': 'PRD-000-000-001', 'name': 'Google Apps',
-    }
+    app.cache_put(
+        'PRD-000-000-001',
+        {'id': 'PRD-000-000-001', 'name': 'Google Apps'},
+        'products',
+    )
     response = await app.lookup_product_items({
         'ColumnA': 'PRD-000-000-001-0001',
     })
@@ -502,3 +511,176 @@ async def test_lookup_product_item_product_column(
         'PREFIX.item.commitment': None,
     }
     assert response.output is None
+
+
+@pytest.mark.asyncio
+async def test_lookup_product_item_by_mpn_too_much_cached(
+        mocker,
+        async_connect_client,
+        async_client_mocker_factory,
+):
+    client = async_client_mocker_factory(base_url=async_connect_client.endpoint)
+    client.products['PRD-000-000-001'].get(return_value={
+        'id': 'PRD-000-000-001',
+        'name': 'Google Apps',
+    })
+    client.products['PRD-000-000-001'].items.filter("eq(mpn,MPN-A)").count(return_value=2)
+
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.installation_client = async_connect_client
+    app.transformation_request = {
+        'transformation': {
+            'settings': {
+                'product_id': 'PRD-000-000-001',
+                'lookup_type': 'mpn',
+                'from': 'ColumnA',
+                'prefix': 'PREFIX',
+                'action_if_not_found': 'fail',
+            },
+            'columns': {
+                'input': [{'name': 'ColumnA', 'nullable': False}],
+            },
+        },
+    }
+    filter_spy = mocker.spy(app, 'get_product_item_by_filter')
+    for _ in range(2):
+        response = await app.lookup_product_items({
+            'ColumnA': 'MPN-A',
+        })
+        assert response.status == ResultType.FAIL
+        assert response.output == 'Multiple results found for the filter: MPN-A'
+
+    filter_spy.assert_called_once()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ('status_code', 'requests_count'),
+    (
+        (404, 1),
+        (500, 2),
+    ),
+)
+async def test_lookup_product_item_by_id_not_found_cached(
+        mocker,
+        status_code,
+        requests_count,
+):
+    client = mocker.MagicMock()
+    client.products['PRD-000-000-001'].get = mocker.AsyncMock(return_value={
+        'id': 'PRD-000-000-001',
+        'name': 'Google Apps',
+    })
+    get_item_m = mocker.AsyncMock(side_effect=ClientError(status_code=status_code))
+    client.products['PRD-000-000-001'].items['PRD-000-000-001-0001'].get = get_item_m
+
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.installation_client = client
+    app.transformation_request = {
+        'transformation': {
+            'settings': {
+                'product_id': 'PRD-000-000-001',
+                'lookup_type': 'id',
+                'from': 'ColumnA',
+                'prefix': 'PREFIX',
+                'action_if_not_found': 'leave_empty',
+            },
+            'columns': {
+                'input': [{'name': 'ColumnA', 'nullable': False}],
+            },
+        },
+    }
+    for _ in range(2):
+        response = await app.lookup_product_items({
+            'ColumnA': 'PRD-000-000-001-0001',
+        })
+        assert response.status == ResultType.SKIP
+
+    assert get_item_m.await_count == requests_count
+
+
+@pytest.mark.asyncio
+async def test_lookup_product_item_prefetch_items(
+        mocker,
+        async_connect_client,
+        async_client_mocker_factory,
+):
+    client = async_client_mocker_factory(base_url=async_connect_client.endpoint)
+    for product_id in ('PRD-000-000-001', 'PRD-000-000-002'):
+        client.products[product_id].get(return_value={
+            'id': product_id,
+            'name': f'Product {product_id}',
+        })
+        client.products[product_id].items.all().mock(return_value=[
+            {
+                'id': f'{product_id}-0001',
+                'name': 'Item 1',
+                'unit': {'name': 'Gb'},
+                'period': 'monthly',
+                'mpn': 'MPN-A',
+            },
+            {
+                'id': f'{product_id}-0002',
+                'name': 'Item 2',
+                'unit': {'name': 'Gb'},
+                'period': 'monthly',
+                'mpn': 'MPN-B',
+            },
+            {
+                'id': f'{product_id}-0003',
+                'name': 'Item 3',
+                'unit': {'name': 'Gb'},
+                'period': 'yearly',
+                'mpn': 'MPN-B',
+            },
+        ])
+
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.installation_client = async_connect_client
+    app.transformation_request = {
+        'transformation': {
+            'settings': {
+                'product_id': '',
+                'product_column': 'Product ID',
+                'lookup_type': 'mpn',
+                'from': 'ColumnA',
+                'prefix': 'PREFIX',
+                'action_if_not_found': 'fail',
+                'product_lookup_mode': 'column',
+                'prefetch_items': True,
+            },
+            'columns': {
+                'input': [
+                    {'name': 'ColumnA', 'nullable': False},
+                    {'name': 'Product ID', 'nullable': False},
+                ],
+            },
+        },
+    }
+    fetch_spy = mocker.spy(app, 'fetch_product_items_catalogue')
+
+    rows = [
+        {'ColumnA': 'MPN-A', 'Product ID': 'PRD-000-000-001'},
+        {'ColumnA': 'MPN-A', 'Product ID': 'PRD-000-000-002'},
+        {'ColumnA': 'MPN-B', 'Product ID': 'PRD-000-000-001'},
+        {'ColumnA': 'MPN-C', 'Product ID': 'PRD-000-000-002'},
+    ]
+    responses = [await app.lookup_product_items(row) for row in rows]
+
+    assert responses[0].status == ResultType.SUCCESS
+    assert responses[0].transformed_row['PREFIX.item.id'] == 'PRD-000-000-001-0001'
+    assert responses[0].transformed_row['PREFIX.product.name'] == 'Product PRD-000-000-001'
+    assert responses[1].status == ResultType.SUCCESS
+    assert responses[1].transformed_row['PREFIX.item.id'] == 'PRD-000-000-002-0001'
+    assert responses[2].status == ResultType.FAIL
+    assert responses[2].output == 'Multiple results found for the filter: MPN-B'
+    assert responses[3].status == ResultType.FAIL
+    assert responses[3].output == 'Product not found'
+    assert fetch_spy.call_count == 2
+    assert set(app.product_items_catalogues) == {'PRD-000-000-001', 'PRD-000-000-002'}
+    catalogue = await app.get_product_items_catalogue('PRD-000-000-001')
+    assert catalogue['id']['PRD-000-000-001-0003']['mpn'] == 'MPN-B'
+    assert fetch_spy.call_count == 2
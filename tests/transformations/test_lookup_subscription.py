@@ -3,10 +3,13 @@
 # Copyright (c) 2023, CloudBlue LLC
 # All rights reserved.
 #
+import asyncio
+
 import pytest
 from connect.client import ClientError
 from connect.eaas.core.enums import ResultType
 
+from connect_transformations.lookup_subscription.exceptions import SubscriptionLookupError
 from connect_transformations.transformations import StandardTransformationsApplication
 
 
@@ -259,14 +262,18 @@ async def test_lookup_subscription_cached(mocker):
             },
         },
     }
-    app._cache['id-SubscriptionID'] = {
-        'product': {'id': 'product.id', 'name': 'product.name'},
-        'marketplace': {'id': 'marketplace.id', 'name': 'marketplace.name'},
-        'connection': {'vendor': {'id': 'vendor.id', 'name': 'vendor.name'}},
-        'id': 'subscription.id',
-        'external_id': 'subscription.external_id',
-        'status': 'terminated',
-    }
+    app.cache_put(
+        'id-SubscriptionID',
+        {
+            'product': {'id': 'product.id', 'name': 'product.name'},
+            'marketplace': {'id': 'marketplace.id', 'name': 'marketplace.name'},
+            'connection': {'vendor': {'id': 'vendor.id', 'name': 'vendor.name'}},
+            'id': 'subscription.id',
+            'external_id': 'subscription.external_id',
+            'status': 'terminated',
+        },
+        'subscriptions',
+    )
     response = await app.lookup_subscription({
         'ColumnA': 'SubscriptionID',
     })
@@ -316,6 +323,39 @@ async def test_lookup_subscription_not_found(
     assert "No result found for the filter {'id': 'SubscriptionID'}" in response.output
 
 
+@pytest.mark.asyncio
+async def test_lookup_subscription_not_found_cached(mocker):
+    retrieve_m = mocker.patch(
+        'connect_transformations.lookup_subscription.mixins.'
+        'LookupSubscriptionTransformationMixin.retrieve_subscription',
+        side_effect=SubscriptionLookupError("No result found for the filter {'id': 'Missing'}"),
+    )
+
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.transformation_request = {
+        'transformation': {
+            'settings': {
+                'lookup_type': 'id',
+                'from': 'ColumnA',
+                'action_if_not_found': 'fail',
+                'output_config': {'A': {'attribute': 'id'}},
+            },
+            'columns': {
+                'input': [{'name': 'ColumnA', 'nullable': False}],
+                'output': [{'name': 'A'}],
+            },
+        },
+    }
+
+    for _ in range(3):
+        response = await app.lookup_subscription({'ColumnA': 'Missing'})
+        assert response.status == ResultType.FAIL
+        assert response.output == "No result found for the filter {'id': 'Missing'}"
+
+    retrieve_m.assert_called_once()
+
+
 @pytest.mark.asyncio
 async def test_lookup_subscription_not_found_leave_empty(
     mocker,
@@ -668,3 +708,194 @@ async def test_lookup_subscription_params_value(
     assert response.transformed_row == {
         'A': 'subscription.id',
     }
+
+
+@pytest.mark.asyncio
+async def test_lookup_subscription_rows(
+    mocker,
+    async_connect_client,
+    async_client_mocker_factory,
+):
+    client = async_client_mocker_factory(base_url=async_connect_client.endpoint)
+    client('subscriptions').assets.filter(
+        **COMMON_FILTERS,
+        id__in=['AS-001', 'AS-002', 'AS-003'],
+    ).order_by('-events.created.at').mock(return_value=[
+        {'id': 'AS-001', 'status': 'active'},
+        {'id': 'AS-002', 'status': 'terminated'},
+        {'id': 'AS-002', 'status': 'active'},
+    ])
+
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.installation_client = async_connect_client
+    app.transformation_request = {
+        'transformation': {
+            'settings': {
+                'lookup_type': 'id',
+                'from': 'ColumnA',
+                'action_if_not_found': 'leave_empty',
+                'action_if_multiple': 'use_most_actual',
+                'output_config': {
+                    'A': {'attribute': 'id'},
+                    'B': {'attribute': 'status'},
+                },
+            },
+            'columns': {
+                'input': [{'name': 'ColumnA', 'nullable': True}],
+                'output': [{'name': 'A'}, {'name': 'B'}],
+            },
+        },
+    }
+    responses = await app.lookup_subscription_rows([
+        {'ColumnA': 'AS-001'},
+        {'ColumnA': 'AS-002'},
+        {'ColumnA': 'AS-001'},
+        {'ColumnA': 'AS-003'},
+        {'ColumnA': None},
+    ])
+
+    assert [response.status for response in responses] == [
+        ResultType.SUCCESS,
+        ResultType.SUCCESS,
+        ResultType.SUCCESS,
+        ResultType.SKIP,
+        ResultType.SKIP,
+    ]
+    assert responses[0].transformed_row == {'A': 'AS-001', 'B': 'active'}
+    assert responses[1].transformed_row == {'A': 'AS-002', 'B': 'active'}
+
+
+@pytest.mark.asyncio
+async def test_lookup_subscription_rows_params_value(
+    mocker,
+    async_connect_client,
+    async_client_mocker_factory,
+):
+    client = async_client_mocker_factory(base_url=async_connect_client.endpoint)
+    client('subscriptions').assets.filter(
+        **COMMON_FILTERS,
+        **{'params.name': 'param_a', 'params.value__in': ['v1', 'v2']},
+    ).order_by('-events.created.at').mock(return_value=[
+        {
+            'id': 'AS-001',
+            'params': [
+                {'name': 'param_a', 'value': 'v1'},
+                {'name': 'param_b', 'value': 'v2'},
+            ],
+        },
+    ])
+
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.installation_client = async_connect_client
+    app.transformation_request = {
+        'transformation': {
+            'settings': {
+                'lookup_type': 'params__value',
+                'from': 'ColumnA',
+                'action_if_not_found': 'leave_empty',
+                'action_if_multiple': 'fail',
+                'parameter': {'id': 'PRM-123', 'name': 'param_a'},
+                'output_config': {'A': {'attribute': 'id'}},
+            },
+            'columns': {
+                'input': [{'name': 'ColumnA', 'nullable': False}],
+                'output': [{'name': 'A'}],
+            },
+        },
+    }
+    responses = await app.lookup_subscription_rows([
+        {'ColumnA': 'v1'},
+        {'ColumnA': 'v2'},
+    ])
+
+    assert responses[0].status == ResultType.SUCCESS
+    assert responses[0].transformed_row == {'A': 'AS-001'}
+    assert responses[1].status == ResultType.SKIP
+
+
+@pytest.mark.asyncio
+async def test_lookup_subscription_rows_multiple_fail(
+    mocker,
+    async_connect_client,
+    async_client_mocker_factory,
+):
+    client = async_client_mocker_factory(base_url=async_connect_client.endpoint)
+    client('subscriptions').assets.filter(
+        **COMMON_FILTERS,
+        external_id__in=['EXT-1'],
+    ).order_by('-events.created.at').mock(return_value=[
+        {'id': 'AS-001', 'external_id': 'EXT-1'},
+        {'id': 'AS-002', 'external_id': 'EXT-1'},
+    ])
+    client('subscriptions').assets.filter(
+        **COMMON_FILTERS,
+        external_id='EXT-1',
+    ).order_by('-events.created.at').mock(return_value=[
+        {'id': 'AS-001', 'external_id': 'EXT-1'},
+        {'id': 'AS-002', 'external_id': 'EXT-1'},
+    ])
+
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.installation_client = async_connect_client
+    app.transformation_request = {
+        'transformation': {
+            'settings': {
+                'lookup_type': 'external_id',
+                'from': 'ColumnA',
+                'action_if_not_found': 'fail',
+                'action_if_multiple': 'fail',
+                'output_config': {'A': {'attribute': 'id'}},
+            },
+            'columns': {
+                'input': [{'name': 'ColumnA', 'nullable': False}],
+                'output': [{'name': 'A'}],
+            },
+        },
+    }
+    responses = await app.lookup_subscription_rows([{'ColumnA': 'EXT-1'}])
+
+    assert responses[0].status == ResultType.FAIL
+    assert 'Many results found for the filter' in responses[0].output
+
+
+@pytest.mark.asyncio
+async def test_lookup_subscription_concurrent_rows_coalesced(mocker):
+    async def retrieve_mock(lookup):
+        await asyncio.sleep(0)
+        return {'id': lookup['id'], 'status': 'active'}
+
+    retrieve_m = mocker.patch(
+        'connect_transformations.lookup_subscription.mixins.'
+        'LookupSubscriptionTransformationMixin.retrieve_subscription',
+        side_effect=retrieve_mock,
+    )
+
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.transformation_request = {
+        'transformation': {
+            'settings': {
+                'lookup_type': 'id',
+                'from': 'ColumnA',
+                'action_if_not_found': 'leave_empty',
+                'action_if_multiple': 'fail',
+                'output_config': {'A': {'attribute': 'id'}},
+            },
+            'columns': {
+                'input': [{'name': 'ColumnA', 'nullable': False}],
+                'output': [{'name': 'A'}],
+            },
+        },
+    }
+
+    responses = await asyncio.gather(*[
+        app.lookup_subscription({'ColumnA': 'AS-001'})
+        for _ in range(10)
+    ])
+
+    assert [response.transformed_row for response in responses] == [{'A': 'AS-001'}] * 10
+    retrieve_m.assert_called_once()
+    assert app._cache.stats()['subscriptions']['coalesced'] == 9
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2023, CloudBlue LLC
+# All rights reserved.
+#
+import pytest
+
+from connect_transformations.exceptions import BaseTransformationException
+from connect_transformations.plan import ExecutionPlan
+from connect_transformations.transformations import StandardTransformationsApplication
+
+
+def test_execution_plan():
+    plan = ExecutionPlan({
+        'settings': {'map_by': {'input_column': 'id', 'attachment_column': 'id'}},
+        'columns': {
+            'input': [
+                {'id': 'COL-1', 'name': 'id', 'nullable': False},
+                {'id': 'COL-2', 'name': 'price', 'nullable': True},
+            ],
+            'output': [{'name': 'total', 'type': 'decimal'}],
+        },
+    })
+
+    assert plan.settings_list == [plan.settings]
+    assert plan.map_by == [{'input_column': 'id', 'attachment_column': 'id'}]
+    assert plan.input_columns_by_id['COL-2']['name'] == 'price'
+    assert plan.output_columns_by_name['total']['type'] == 'decimal'
+    assert plan.is_nullable('price') is True
+    assert plan.is_nullable('id') is False
+    with pytest.raises(BaseTransformationException):
+        plan.is_nullable('missing')
+
+
+def test_execution_plan_list_settings():
+    plan = ExecutionPlan({'settings': [{'from': 'a', 'to': 'b'}]})
+
+    assert plan.settings_list == [{'from': 'a', 'to': 'b'}]
+    assert plan.map_by is None
+    assert plan.input_columns == []
+
+
+def test_application_plan(mocker):
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.transformation_request = {'transformation': {'settings': {'from': 'a'}}}
+
+    plan = app.plan
+    assert app.plan is plan
+    assert plan.settings == {'from': 'a'}
+
+    app.transformation_request = {'transformation': {'settings': {'from': 'b'}}}
+    assert app.plan is not plan
+    assert app.plan.settings == {'from': 'b'}
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2023, CloudBlue LLC
+# All rights reserved.
+#
+import pytest
+from connect.eaas.core.enums import ResultType
+
+from connect_transformations.transformations import StandardTransformationsApplication
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('batch', (True, False))
+async def test_process_rows_copy_columns(mocker, batch):
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.transformation_request = {
+        'transformation': {
+            'settings': [
+                {'from': 'A', 'to': 'B'},
+                {'from': 'C', 'to': 'D'},
+            ],
+        },
+    }
+    rows = [{'A': index, 'C': f'value {index}'} for index in range(3)]
+
+    responses = await app.process_rows('copy_columns', rows, batch=batch)
+
+    assert [response.status for response in responses] == [ResultType.SUCCESS] * 3
+    assert [response.transformed_row for response in responses] == [
+        {'B': index, 'D': f'value {index}'} for index in range(3)
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('batch', (True, False))
+async def test_process_rows_copy_columns_styles(mocker, batch):
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.transformation_request = {
+        'transformation': {
+            'settings': [
+                {'from': 'A', 'to': 'B'},
+                {'from': 'C', 'to': 'D'},
+            ],
+        },
+    }
+    rows = [{'A': 1, 'C': 'value'}, {'A': 2, 'C': 'other'}]
+    rows_styles = [{'A': 'bold', 'C': 'italic'}, None]
+
+    responses = await app.process_rows(
+        'copy_columns', rows, batch=batch, rows_styles=rows_styles,
+    )
+
+    expected = [app.copy_columns(row, styles) for row, styles in zip(rows, rows_styles)]
+    assert [response.transformed_row_styles for response in responses] == [
+        {'B': 'bold', 'D': 'italic'},
+        {},
+    ]
+    assert [
+        (response.transformed_row, response.transformed_row_styles) for response in responses
+    ] == [(response.transformed_row, response.transformed_row_styles) for response in expected]
+
+
+@pytest.mark.asyncio
+async def test_process_rows_per_row_fallback(mocker):
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.transformation_request = {
+        'transformation': {
+            'settings': {
+                'from': 'country',
+                'to': 'VAT',
+                'action_if_not_found': 'leave_empty',
+            },
+            'columns': {'input': [{'name': 'country', 'nullable': True}]},
+        },
+    }
+    app.eu_vat_rates = {'ES': 21}
+
+    responses = await app.process_rows('get_vat_rate', [{'country': 'ES'}, {'country': None}])
+
+    assert [response.status for response in responses] == [ResultType.SUCCESS, ResultType.SKIP]
+    assert responses[0].transformed_row == {'VAT': 21}
+
+
+@pytest.mark.asyncio
+async def test_process_rows_async(mocker):
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.lookup_subscription_rows = mocker.AsyncMock(return_value=['response'])
+
+    assert await app.process_rows('lookup_subscription', [{}]) == ['response']
+    app.lookup_subscription_rows.assert_awaited_once_with([{}])
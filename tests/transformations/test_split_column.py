@@ -3,6 +3,7 @@
 # Copyright (c) 2023, CloudBlue LLC
 # All rights reserved.
 #
+import re
 from datetime import datetime
 from decimal import Decimal
 
@@ -416,3 +417,56 @@ def test_split_column_old_config(mocker):
         'First Name': 'Name',
         'Last Name': 'Surname',
     }
+
+
+def test_split_column_rows(mocker):
+    m = mocker.MagicMock()
+    app = StandardTransformationsApplication(m, m, m)
+    app.transformation_request = {
+        'transformation': {
+            'settings': {
+                'from': 'column',
+                'regex': {
+                    'pattern': r'(\w+)-(\d+)(?:\.(\d+))?',
+                    'groups': {
+                        '1': {'name': 'Code'},
+                        '2': {'name': 'Number'},
+                        '3': {'name': 'Fraction'},
+                    },
+                },
+            },
+            'columns': {
+                'output': [
+                    {'id': 'COL-1', 'name': 'Code', 'type': 'string'},
+                    {'id': 'COL-2', 'name': 'Number', 'type': 'integer'},
+                    {
+                        'id': 'COL-3',
+                        'name': 'Fraction',
+                        'type': 'decimal',
+                        'constraints': {'precision': 2},
+                    },
+                ],
+            },
+        },
+    }
+    compile_pattern = mocker.spy(re, 'compile')
+
+    rows = [
+        {'column': 'ABC-12.5'},
+        {'column': 'DEF-3'},
+        {'column': None},
+        {'column': 'no match'},
+    ]
+    responses = app.split_column_rows(rows)
+
+    assert [response.status for response in responses] == [ResultType.SUCCESS] * 4
+    assert [response.transformed_row for response in responses] == [
+        {'Code': 'ABC', 'Number': 12, 'Fraction': Decimal('5.00')},
+        {'Code': 'DEF', 'Number': 3, 'Fraction': None},
+        {'Code': None, 'Number': None, 'Fraction': None},
+        {'Code': None, 'Number': None, 'Fraction': None},
+    ]
+    assert [response.transformed_row for response in responses] == [
+        app.split_column(row).transformed_row for row in rows
+    ]
+    compile_pattern.assert_called_once_with(r'(\w+)-(\d+)(?:\.(\d+))?')
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2023, CloudBlue LLC
+# All rights reserved.
+#
+import os
+import stat
+
+from connect_transformations.storage import PersistentStore, get_persistent_store
+
+
+def test_persistent_store(tmp_path):
+    path = str(tmp_path / 'storage.sqlite3')
+    store = PersistentStore(path)
+    store.put('rates', 'USD:2022-01-31', {'base': 'USD', 'rates': {'EUR': '0.89'}})
+    store.put('rates', 'USD:2022-01-31', {'base': 'USD', 'rates': {'EUR': '0.9'}})
+
+    assert PersistentStore(path).get('rates', 'USD:2022-01-31') == {
+        'base': 'USD',
+        'rates': {'EUR': '0.9'},
+    }
+    assert store.get('rates', 'missing') is None
+    assert store.get('other', 'USD:2022-01-31') is None
+
+
+def test_persistent_store_max_age(mocker, tmp_path):
+    store = PersistentStore(str(tmp_path / 'storage.sqlite3'))
+    mocker.patch('connect_transformations.storage.time.time', return_value=1000)
+    store.put('snapshots', 'key', [1, 2])
+
+    mocker.patch('connect_transformations.storage.time.time', return_value=1059)
+    assert store.get('snapshots', 'key', max_age=60) == [1, 2]
+    mocker.patch('connect_transformations.storage.time.time', return_value=1060)
+    assert store.get('snapshots', 'key', max_age=60) is None
+    assert store.get('snapshots', 'key') == [1, 2]
+
+
+def test_persistent_store_error(mocker, tmp_path):
+    logger = mocker.MagicMock()
+    store = PersistentStore(str(tmp_path / 'missing' / 'storage.sqlite3'), logger=logger)
+
+    store.put('rates', 'key', 1)
+
+    assert store.get('rates', 'key') is None
+    assert logger.warning.call_count == 2
+
+
+def test_get_persistent_store(tmp_path):
+    config = {'STORAGE_PATH': str(tmp_path / 'storage.sqlite3')}
+
+    assert get_persistent_store(config) is get_persistent_store(config)
+    assert get_persistent_store(config).path == config['STORAGE_PATH']
+
+
+def test_persistent_store_permissions(mocker, tmp_path):
+    path = str(tmp_path / 'private' / 'storage.sqlite3')
+    mocker.patch('connect_transformations.storage.DEFAULT_STORAGE_PATH', path)
+
+    get_persistent_store({}).put('snapshots', 'key', 1)
+
+    assert stat.S_IMODE(os.stat(os.path.dirname(path)).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
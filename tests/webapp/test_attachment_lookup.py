@@ -10,14 +10,18 @@ from connect_transformations.webapp import TransformationsWebApplication
 
 @pytest.mark.asyncio
 async def test_get_excel_attachments(
+        mocker,
         test_client_factory,
         async_connect_client,
         async_client_mocker_factory,
 ):
+    mocker.patch('connect_transformations.attachment_lookup.utils.pq')
     query = (
-        "((ilike(mime_type,*vnd.openxmlformats-officedocument.spreadsheetml.sheet*)"
+        "(((ilike(mime_type,*vnd.openxmlformats-officedocument.spreadsheetml.sheet*)"
         "|ilike(mime_type,*vnd.ms-excel*));"
         "ilike(mime_type,*application*))"
+        "|ilike(mime_type,*text/csv*)"
+        "|ilike(mime_type,*parquet*))"
     )
 
     client = async_client_mocker_factory(base_url=async_connect_client.endpoint)
@@ -72,6 +76,33 @@ async def test_get_excel_attachments(
     } in data, data
 
 
+@pytest.mark.asyncio
+async def test_get_excel_attachments_no_pyarrow(
+        mocker,
+        test_client_factory,
+        async_connect_client,
+        async_client_mocker_factory,
+):
+    mocker.patch('connect_transformations.attachment_lookup.utils.pq', None)
+    query = (
+        "(((ilike(mime_type,*vnd.openxmlformats-officedocument.spreadsheetml.sheet*)"
+        "|ilike(mime_type,*vnd.ms-excel*));"
+        "ilike(mime_type,*application*))"
+        "|ilike(mime_type,*text/csv*))"
+    )
+
+    client = async_client_mocker_factory(base_url=async_connect_client.endpoint)
+    client('media')('folders').collection(
+        'streams_attachments',
+    )['stream_id'].files.filter(query).mock(return_value=[])
+
+    client = test_client_factory(TransformationsWebApplication)
+    response = client.get('/api/attachment_lookup/stream_id')
+
+    assert response.status_code == 200
+    assert response.json() == []
+
+
 def test_validate_attachment_lookup_invalid_data(test_client_factory):
     data = {
         'settings': {
@@ -230,3 +230,77 @@ def test_get_available_rates_code_exception(
     assert response.status_code == 200
     data = response.json()
     assert data == []
+
+
+def test_validate_currency_conversion_rate_date(test_client_factory):
+    data = {
+        'settings': [
+            {
+                'from': {'column': 'COL-123', 'currency': 'USD'},
+                'to': {'column': 'col1_eur', 'currency': 'EUR'},
+                'rate_date': {'source': 'period_end'},
+            },
+            {
+                'from': {'column': 'COL-123', 'currency': 'USD'},
+                'to': {'column': 'col1_gbp', 'currency': 'GBP'},
+                'rate_date': {'source': 'column', 'column': 'COL-234'},
+            },
+        ],
+        'columns': {
+            'input': [
+                {'id': 'COL-123', 'name': 'col1'},
+                {'id': 'COL-234', 'name': 'date'},
+            ],
+            'output': [],
+        },
+    }
+
+    client = test_client_factory(TransformationsWebApplication)
+    response = client.post('/api/currency_conversion/validate', json=data)
+
+    assert response.status_code == 200, response.content
+    assert response.json() == {
+        'overview': (
+            'From: col1 (USD)\n'
+            'To: col1_eur (EUR)\n'
+            'Rate date: period end\n'
+            '\n'
+            'From: col1 (USD)\n'
+            'To: col1_gbp (GBP)\n'
+            'Rate date: column date\n'
+        ),
+    }
+
+
+@pytest.mark.parametrize(
+    'rate_date,error',
+    (
+        (
+            {'source': 'yesterday'},
+            'The `rate_date` source must be one of: latest, period_start, period_end, column',
+        ),
+        (
+            {'source': 'column', 'column': 'COL-999'},
+            'The settings contains an invalid `rate_date` column name "COL-999" that '
+            'does not exist on columns.input',
+        ),
+    ),
+)
+def test_validate_currency_conversion_invalid_rate_date(test_client_factory, rate_date, error):
+    data = {
+        'settings': [{
+            'from': {'column': 'COL-123', 'currency': 'USD'},
+            'to': {'column': 'col1_eur', 'currency': 'EUR'},
+            'rate_date': rate_date,
+        }],
+        'columns': {
+            'input': [{'id': 'COL-123', 'name': 'col1'}],
+            'output': [],
+        },
+    }
+
+    client = test_client_factory(TransformationsWebApplication)
+    response = client.post('/api/currency_conversion/validate', json=data)
+
+    assert response.status_code == 400
+    assert response.json() == {'error': error}
@@ -149,3 +149,85 @@ def test_validate_filter_row_invalid_additional_value(test_client_factory):
     assert response.json() == {
         'error': 'The settings must have a valid `from` column name',
     }
+
+
+def test_validate_filter_row_conditions(test_client_factory):
+    data = {
+        'settings': {
+            'conditions': {
+                'operator': 'and',
+                'conditions': [
+                    {'column': 'Price', 'operator': 'between', 'value': [10, 20]},
+                    {
+                        'operator': 'or',
+                        'conditions': [
+                            {'column': 'SKU', 'operator': 'not_in', 'value': ['A', 'B']},
+                            {'column': 'Reseller', 'operator': 'is_not_null'},
+                        ],
+                    },
+                ],
+            },
+        },
+        'columns': {
+            'input': [
+                {'name': 'Price'},
+                {'name': 'SKU'},
+                {'name': 'Reseller'},
+            ],
+        },
+    }
+
+    client = test_client_factory(TransformationsWebApplication)
+
+    response = client.post('/api/filter_row/validate', json=data)
+    assert response.status_code == 200
+    assert response.json() == {
+        'overview': (
+            'We Keep Row If "Price" between 10 and 20 AND '
+            '("SKU" not in ["A", "B"] OR "Reseller" is not null)'
+        ),
+    }
+
+
+@pytest.mark.parametrize(
+    'conditions,error',
+    (
+        (
+            {'column': 'Price', 'operator': 'like', 'value': 1},
+            'Unknown condition operator `like`.',
+        ),
+        (
+            {'column': 'Price', 'operator': '>', 'value': 'abc'},
+            'The `>` condition on column "Price" requires a numeric value.',
+        ),
+        (
+            {'column': 'Price', 'operator': 'between', 'value': [20, 10]},
+            'The `between` condition on column "Price" requires a list with '
+            'the lower and the upper numeric bounds.',
+        ),
+        (
+            {'column': 'Price', 'operator': 'regex', 'value': '('},
+            'The `regex` condition on column "Price" has an invalid regular expression: '
+            'missing ), unterminated subpattern at position 0.',
+        ),
+        (
+            {'operator': 'or', 'conditions': []},
+            'The `or` condition requires a non empty list of `conditions`.',
+        ),
+        (
+            {'column': 'Missing', 'operator': 'is_null'},
+            'The column "Missing" used in the conditions does not exist.',
+        ),
+    ),
+)
+def test_validate_filter_row_invalid_conditions(test_client_factory, conditions, error):
+    data = {
+        'settings': {'conditions': conditions},
+        'columns': {'input': [{'name': 'Price'}]},
+    }
+
+    client = test_client_factory(TransformationsWebApplication)
+
+    response = client.post('/api/filter_row/validate', json=data)
+    assert response.status_code == 400
+    assert response.json() == {'error': error}
@@ -57,6 +57,56 @@ def test_validate_ff_request_lookup(test_client_factory):
     }
 
 
+def test_validate_ff_request_lookup_prefetch(test_client_factory):
+    data = {
+        'settings': {
+            'item': {
+                'id': 'id',
+                'name': 'Item ID',
+            },
+            'item_column': 'Request ID',
+            'parameter': {
+                'id': 'PRM-0001',
+                'name': 'param_a',
+            },
+            'parameter_column': 'Param A',
+            'asset_type': None,
+            'asset_column': None,
+            'output_config': {
+                'abc': {
+                    'attribute': 'id',
+                },
+            },
+            'action_if_multiple': 'use_most_actual',
+            'action_if_not_found': 'leave_empty',
+            'prefetch_requests': True,
+        },
+        'columns': {
+            'input': [
+                {'name': 'Request ID'},
+                {'name': 'Param A'},
+            ],
+            'output': [
+                {'name': 'abc'},
+            ],
+        },
+    }
+
+    client = test_client_factory(TransformationsWebApplication)
+    response = client.post('/api/lookup_ff_request/validate', json=data)
+
+    assert response.status_code == 200, response.content
+    assert response.json() == {
+        'overview': (
+            'Match by parameter "param_a"\n'
+            'If not found = Leave empty\n'
+            'If multiple found = Use most actual\n'
+            'Prefetch all approved requests = Yes\n'
+            'And populate 1 column'
+        ),
+    }
+
+
 def test_validate_ff_request_lookup_with_asset(test_client_factory):
     data = {
         'settings': {
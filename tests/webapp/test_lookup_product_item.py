@@ -295,3 +295,35 @@ def test_validate_lookup_product_item_no_required_column(test_client_factory):
         'The settings must have `lookup_type`, `from`, `prefix` and '
         '`action_if_not_found` fields'
     )}
+
+
+def test_validate_lookup_product_item_prefetch_items(test_client_factory):
+    data = {
+        'settings': {
+            'product_id': 'PRD-000-000-001',
+            'lookup_type': 'mpn',
+            'from': 'column',
+            'prefix': 'PREFIX',
+            'action_if_not_found': 'leave_empty',
+            'product_lookup_mode': 'id',
+            'prefetch_items': True,
+        },
+        'columns': {
+            'input': [
+                {'name': 'column'},
+            ],
+            'output': [],
+        },
+    }
+
+    client = test_client_factory(TransformationsWebApplication)
+    response = client.post('/api/lookup_product_item/validate', json=data)
+
+    assert response.status_code == 200
+    assert response.json() == {
+        'overview': (
+            'Criteria = "CloudBlue Item MPN"\nIn product = '
+            '"PRD-000-000-001"\nPrefix = "PREFIX"\nIf not found = Leave Empty\n'
+            'Prefetch all product items = Yes\n'
+        ),
+    }